@@ -1,12 +1,23 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session
+from flask import Flask, render_template, request, jsonify, redirect, url_for, session, g, Response
+import io
 import os
-import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, wait
 import hashlib
-from werkzeug.utils import secure_filename
+import time
 from functools import wraps
 from blockchain.contract_manager import ContractManager
 from blockchain.ipfs_simulator import IPFSSimulator
-from utils.model_loader import ModelLoader
+from blockchain.record_submitter import RecordSubmitter
+from blockchain.ticket_store import TicketStore
+from blockchain.merkle_batcher import MerkleBatcher, MerkleTicketStore
+from blockchain.record_indexer import RecordIndexer
+from utils.model_loader import ModelLoader, TABULAR_LABELS
+from utils.batch_scheduler import BatchScheduler, wait_or_cancel
+from utils.bulk_scoring import FEATURE_COLUMNS, score_to_records
+from utils.upload_buffer import UploadBuffer
+from utils.prediction_cache import PredictionCache
+from utils.password_hasher import HasherBusy
+from utils import metrics
 import auth
 import config
 
@@ -18,12 +29,129 @@ app.config['SECRET_KEY'] = config.SECRET_KEY
 auth.init_db()
 
 contract_manager = ContractManager()
-ipfs_simulator = IPFSSimulator()
-model_loader = ModelLoader()
+# Registry/CONTRACT_ADDRESS only: no compilation and no RPC at import, so every gunicorn worker has the contract
+contract_manager.load_deployment()
+ipfs_simulator = IPFSSimulator(
+    store_dir=config.IPFS_STORE_DIR,
+    max_bytes=config.IPFS_STORE_MAX_MB * 1024 * 1024
+)
+if config.CHAIN_WRITE_MODE == 'merkle':
+    record_submitter = MerkleBatcher(
+        contract_manager,
+        MerkleTicketStore(config.RECORD_TICKET_DB, lease=config.RECORD_TICKET_LEASE),
+        max_batch_size=config.MERKLE_BATCH_SIZE,
+        max_wait=config.MERKLE_BATCH_WINDOW,
+        poll_interval=config.RECEIPT_POLL_INTERVAL,
+        max_tickets=config.RECORD_TICKET_RETENTION
+    )
+else:
+    record_submitter = RecordSubmitter(
+        contract_manager,
+        TicketStore(config.RECORD_TICKET_DB, lease=config.RECORD_TICKET_LEASE),
+        poll_interval=config.RECEIPT_POLL_INTERVAL,
+        max_tickets=config.RECORD_TICKET_RETENTION
+    )
+record_indexer = RecordIndexer(
+    contract_manager,
+    db_path=config.RECORD_INDEX_DB,
+    poll_interval=config.RECORD_INDEX_POLL_INTERVAL,
+    chunk_size=config.RECORD_INDEX_BLOCK_CHUNK,
+    confirmations=config.RECORD_INDEX_CONFIRMATIONS,
+    lease=config.RECORD_INDEX_LEASE
+)
+model_loader = ModelLoader(
+    model_dir=config.MODEL_DIR,
+    fast_decode=config.IMAGE_FAST_DECODE,
+    decode_workers=config.IMAGE_DECODE_WORKERS,
+    image_backend=config.IMAGE_MODEL_BACKEND,
+    mmap_weights=config.MODEL_MMAP_WEIGHTS,
+    memory_budget_mb=config.MODEL_MEMORY_BUDGET_MB,
+    prewarm=config.MODEL_PREWARM,
+    prewarm_interval=config.MODEL_PREWARM_INTERVAL,
+    tabular_engine=config.TABULAR_ENGINE
+)
+if config.PRELOAD_IMAGE_MODELS:
+    model_loader.preload_image_models()
+prediction_cache = PredictionCache(
+    max_entries=config.PREDICTION_CACHE_SIZE,
+    ttl=config.PREDICTION_CACHE_TTL,
+    db_path=config.PREDICTION_CACHE_DB or None
+)
+# Shared pool for per-request fan-out (content store writes run beside inference)
+request_pool = ThreadPoolExecutor(max_workers=config.REQUEST_POOL_WORKERS, thread_name_prefix='request')
+image_scheduler = BatchScheduler(
+    model_loader,
+    max_batch_size=config.BATCH_MAX_SIZE,
+    max_wait_ms=config.BATCH_MAX_WAIT_MS,
+    request_timeout=config.BATCH_REQUEST_TIMEOUT
+)
+
+HTTP_REQUESTS = metrics.registry.counter('medblock_http_requests_total', 'HTTP requests served', ('endpoint', 'method', 'status'))
+HTTP_SECONDS = metrics.registry.histogram('medblock_http_request_duration_seconds', 'HTTP request latency', ('endpoint', 'method'))
+MODEL_STATE = metrics.registry.gauge('medblock_model_state', 'Current state of each model (1 for the active state)', ('model', 'state'))
+RESIDENT_BYTES = metrics.registry.gauge('medblock_model_resident_bytes', 'Memory held by loaded models')
+CACHE_ENTRIES = metrics.registry.gauge('medblock_prediction_cache_entries', 'Entries in the in-process prediction cache')
+CACHE_HIT_RATIO = metrics.registry.gauge('medblock_prediction_cache_hit_ratio', 'Prediction cache hits / lookups in this process')
+CHAIN_PENDING = metrics.registry.gauge('medblock_chain_writes_pending', 'Records waiting to be sent or confirmed')
+AUTH_IN_FLIGHT = metrics.registry.gauge('medblock_auth_hash_in_flight', 'bcrypt operations running or queued')
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in config.ALLOWED_EXTENSIONS
 
+_warmup_pid = None
+
+def start_warmup():
+    """Start per-worker background work: chain health probe, record pipeline, record indexing and model warmup (called after fork)"""
+    global _warmup_pid
+    contract_manager.start_health_probe(config.CHAIN_HEALTH_INTERVAL)
+    record_submitter.start()
+    record_indexer.start()
+    if not config.WARMUP_MODEL_KEYS or _warmup_pid == os.getpid():
+        return None
+    _warmup_pid = os.getpid()
+    return model_loader.start_warmup(config.WARMUP_MODEL_KEYS, config.WARMUP_RETRY_DELAY, config.WARMUP_RETRY_MAX_DELAY)
+
+def settle(*futures):
+    """Cancel futures that have not started and wait for the rest, so none still reads an upload being closed"""
+    running = [future for future in futures if future is not None and not future.cancel()]
+    if running:
+        wait(running)
+
+def image_timeout_response():
+    message = f'Image analysis did not finish within {image_scheduler.request_timeout:g}s, please retry'
+    return jsonify({'error': message}), 504
+
+def cached_prediction(cache_key, patient_id):
+    """Return a cached result with its blockchain status refreshed, or None.
+
+    A record whose ticket failed, or vanished before it was confirmed (the
+    ticket store was reset), is submitted again so a cache hit never leaves
+    the prediction off-chain.
+    """
+    result = prediction_cache.get(cache_key)
+    if result is None:
+        return None
+
+    status = record_submitter.status(result.get('record_ticket'))
+    if (status is None and result.get('blockchain_status') != 'confirmed') or (status and status['status'] == 'failed'):
+        result['record_ticket'] = record_submitter.submit(
+            patient_id,
+            result['disease'],
+            result['prediction'],
+            result['data_hash'],
+            result['image_hash']
+        )
+        result['blockchain_tx'] = None
+        result['blockchain_status'] = 'queued'
+        prediction_cache.put(cache_key, result)
+    elif status and status['status'] != result.get('blockchain_status'):
+        result['blockchain_tx'] = status['tx_hash']
+        result['blockchain_status'] = status['status']
+        prediction_cache.put(cache_key, result)
+
+    result['cached'] = True
+    return result
+
 def login_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
@@ -32,6 +160,61 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+@app.before_request
+def start_request_timing():
+    g.request_started = time.perf_counter()
+    g.spans = metrics.start_request()
+
+@app.after_request
+def record_request_timing(response):
+    started = g.get('request_started')
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    HTTP_SECONDS.observe(elapsed, endpoint=endpoint, method=request.method)
+    HTTP_REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+    if config.SERVER_TIMING:
+        response.headers['Server-Timing'] = metrics.server_timing(g.spans, total=elapsed)
+    return response
+
+@app.route('/metrics')
+def metrics_endpoint():
+    for key, state in model_loader.model_states.items():
+        for known in ('unloaded', 'loading', 'loaded', 'ready', 'evicted', 'failed'):
+            MODEL_STATE.set(1 if state == known else 0, model=key, state=known)
+    RESIDENT_BYTES.set(model_loader.residency.resident_bytes)
+    cache_stats = prediction_cache.stats()
+    CACHE_ENTRIES.set(cache_stats['entries'])
+    CACHE_HIT_RATIO.set(cache_stats['hit_rate'])
+    CHAIN_PENDING.set(record_submitter.pending_count())
+    AUTH_IN_FLIGHT.set(auth.hasher.stats()['in_flight'])
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/healthz')
+def healthz():
+    return jsonify({
+        'status': 'ok',
+        'pid': os.getpid(),
+        'models': model_loader.model_states,
+        'errors': model_loader.model_errors,
+        'auth': auth.hasher.stats(),
+        'chain': contract_manager.health,
+        'rpc': contract_manager.rpc_stats(),
+        'record_index': record_indexer.stats()
+    })
+
+@app.route('/readyz')
+def readyz():
+    ready = model_loader.is_ready()
+    targets = {key: model_loader.model_states.get(key, 'unknown') for key in model_loader.warmup_targets}
+    errors = {key: model_loader.model_errors[key] for key in targets if key in model_loader.model_errors}
+    return jsonify({'ready': ready, 'models': targets, 'errors': errors}), 200 if ready else 503
+
+@app.errorhandler(HasherBusy)
+def auth_busy(e):
+    return jsonify({'success': False, 'message': 'Too many login attempts right now, please retry shortly'}), 429, {'Retry-After': '1'}
+
 @app.route('/')
 def landing():
     if 'user_id' in session:
@@ -95,6 +278,7 @@ def heart():
 @app.route('/predict/diabetes', methods=['POST'])
 @login_required
 def predict_diabetes():
+    upload = image_future = hash_future = None
     try:
         image_file = request.files.get('image_file')
         patient_id = request.form.get('patient_id', 'PATIENT_001')
@@ -113,22 +297,33 @@ def predict_diabetes():
         if not image_file:
             return jsonify({'error': 'Image file is required'}), 400
         
-        image_path = os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(image_file.filename))
-        image_file.save(image_path)
+        # Read the upload once: hashed while buffered, decoded straight from memory
+        with metrics.span('upload_save'):
+            upload = UploadBuffer(image_file.stream, app.config['UPLOAD_FOLDER'], config.UPLOAD_SPOOL_THRESHOLD)
+        
+        csv_data = ','.join(map(str, tabular_data))
+        csv_hash = hashlib.sha256(csv_data.encode()).hexdigest()
+        
+        cache_key = PredictionCache.make_key('Diabetes', patient_id, csv_hash, upload.sha256, model_loader.model_version)
+        cached = cached_prediction(cache_key, patient_id)
+        if cached is not None:
+            return jsonify(cached)
         
+        # Image inference (batch scheduler), content store write (pool) and tabular
+        # inference (this thread) are independent; torch and XGBoost release the GIL
+        image = upload.open()
+        image_future = image_scheduler.submit('diabetes_retinal', image)
+        image_future.add_done_callback(lambda _: image.close())
+        hash_future = request_pool.submit(metrics.bind(ipfs_simulator.add_upload), upload)
         tabular_result = model_loader.predict_diabetes_tabular(tabular_data)
-        image_result = model_loader.predict_diabetes_image(image_path)
+        image_result = wait_or_cancel(image_future, image_scheduler.request_timeout)
+        image_hash = hash_future.result()
         
         final_prediction = 'Positive' if 'Positive' in tabular_result['prediction'] or 'Retinopathy' in image_result['prediction'] else 'Negative'
         final_confidence = (tabular_result['confidence'] + image_result['confidence']) / 2
         final_risk = 'High' if final_confidence >= 80 else 'Medium' if final_confidence >= 50 else 'Low'
         
-        csv_data = ','.join(map(str, tabular_data))
-        csv_hash = hashlib.sha256(csv_data.encode()).hexdigest()
-        
-        image_hash = ipfs_simulator.add_file(image_path)
-        
-        tx_hash = contract_manager.add_record(
+        record_ticket = record_submitter.submit(
             patient_id,
             'Diabetes',
             final_prediction,
@@ -143,21 +338,29 @@ def predict_diabetes():
             'risk_level': final_risk,
             'tabular_result': tabular_result,
             'image_result': image_result,
-            'blockchain_tx': tx_hash,
+            'blockchain_tx': None,
+            'blockchain_status': 'queued',
+            'record_ticket': record_ticket,
             'data_hash': csv_hash,
             'image_hash': image_hash
         }
-        
-        os.remove(image_path)
+        prediction_cache.put(cache_key, result)
         
         return jsonify(result)
     
+    except TimeoutError:
+        return image_timeout_response()
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+    finally:
+        settle(image_future, hash_future)
+        if upload is not None:
+            upload.close()
 
 @app.route('/predict/heart', methods=['POST'])
 @login_required
 def predict_heart():
+    upload = image_future = hash_future = None
     try:
         image_file = request.files.get('image_file')
         patient_id = request.form.get('patient_id', 'PATIENT_001')
@@ -181,22 +384,33 @@ def predict_heart():
         if not image_file:
             return jsonify({'error': 'Image file is required'}), 400
         
-        image_path = os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(image_file.filename))
-        image_file.save(image_path)
+        # Read the upload once: hashed while buffered, decoded straight from memory
+        with metrics.span('upload_save'):
+            upload = UploadBuffer(image_file.stream, app.config['UPLOAD_FOLDER'], config.UPLOAD_SPOOL_THRESHOLD)
         
+        csv_data = ','.join(map(str, tabular_data))
+        csv_hash = hashlib.sha256(csv_data.encode()).hexdigest()
+        
+        cache_key = PredictionCache.make_key('Heart Disease', patient_id, csv_hash, upload.sha256, model_loader.model_version)
+        cached = cached_prediction(cache_key, patient_id)
+        if cached is not None:
+            return jsonify(cached)
+        
+        # Image inference (batch scheduler), content store write (pool) and tabular
+        # inference (this thread) are independent; torch and XGBoost release the GIL
+        image = upload.open()
+        image_future = image_scheduler.submit('heart_ecg', image)
+        image_future.add_done_callback(lambda _: image.close())
+        hash_future = request_pool.submit(metrics.bind(ipfs_simulator.add_upload), upload)
         tabular_result = model_loader.predict_heart_tabular(tabular_data)
-        image_result = model_loader.predict_heart_image(image_path)
+        image_result = wait_or_cancel(image_future, image_scheduler.request_timeout)
+        image_hash = hash_future.result()
         
         final_prediction = 'Positive' if 'Disease' in tabular_result['prediction'] or 'Disease' in image_result['prediction'] else 'Negative'
         final_confidence = (tabular_result['confidence'] + image_result['confidence']) / 2
         final_risk = 'High' if final_confidence >= 80 else 'Medium' if final_confidence >= 50 else 'Low'
         
-        csv_data = ','.join(map(str, tabular_data))
-        csv_hash = hashlib.sha256(csv_data.encode()).hexdigest()
-        
-        image_hash = ipfs_simulator.add_file(image_path)
-        
-        tx_hash = contract_manager.add_record(
+        record_ticket = record_submitter.submit(
             patient_id,
             'Heart Disease',
             final_prediction,
@@ -211,31 +425,115 @@ def predict_heart():
             'risk_level': final_risk,
             'tabular_result': tabular_result,
             'image_result': image_result,
-            'blockchain_tx': tx_hash,
+            'blockchain_tx': None,
+            'blockchain_status': 'queued',
+            'record_ticket': record_ticket,
             'data_hash': csv_hash,
             'image_hash': image_hash
         }
-        
-        os.remove(image_path)
+        prediction_cache.put(cache_key, result)
         
         return jsonify(result)
     
+    except TimeoutError:
+        return image_timeout_response()
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        settle(image_future, hash_future)
+        if upload is not None:
+            upload.close()
+
+@app.route('/records/<ticket>/status')
+@login_required
+def record_status(ticket):
+    status = record_submitter.status(ticket)
+    if status is None:
+        return jsonify({'error': 'Unknown record ticket'}), 404
+    return jsonify(status)
+
+@app.route('/records/proofs/<record_hash>')
+@login_required
+def record_proof(record_hash):
+    if not isinstance(record_submitter, MerkleBatcher):
+        return jsonify({'error': 'Records are not anchored in Merkle batches'}), 404
+    proof = record_submitter.proof(record_hash)
+    if proof is None:
+        return jsonify({'error': 'No anchored batch contains this record'}), 404
+    return jsonify(proof)
+
+@app.route('/records')
+@login_required
+def list_records():
+    try:
+        limit = min(max(int(request.args.get('limit', 50)), 1), 200)
+        page = record_indexer.query(
+            patient_id=request.args.get('patient_id'),
+            disease_type=request.args.get('disease'),
+            since=request.args.get('since'),
+            until=request.args.get('until'),
+            limit=limit,
+            cursor=request.args.get('cursor')
+        )
+        page['indexed_block'] = record_indexer.stats()['last_block']
+        return jsonify(page)
+    except ValueError as e:
+        return jsonify({'error': f'Invalid query: {e}'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/records/<int:record_id>')
+@login_required
+def get_record(record_id):
+    try:
+        record = record_indexer.get(record_id)
+        if record is None:
+            return jsonify({'error': 'Record not found in the index'}), 404
+        return jsonify(record)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/predict/<disease>/batch', methods=['POST'])
+@login_required
+def predict_batch(disease):
+    try:
+        if disease not in FEATURE_COLUMNS:
+            return jsonify({'error': f'Unknown disease: {disease}'}), 404
+
+        csv_file = request.files.get('csv_file')
+        if not csv_file:
+            return jsonify({'error': 'CSV file is required'}), 400
+
+        text_stream = io.TextIOWrapper(csv_file.stream, encoding='utf-8-sig', newline='')
+        records = score_to_records(model_loader, disease, text_stream)
+
+        positive_label = TABULAR_LABELS[disease][0]
+        positives = sum(1 for record in records if record['prediction'] == positive_label)
+
+        return jsonify({
+            'disease': disease,
+            'count': len(records),
+            'positive_count': positives,
+            'negative_count': len(records) - positives,
+            'results': records
+        })
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 if __name__ == '__main__':
     try:
-        if config.CONTRACT_ADDRESS is None:
+        if contract_manager.contract is None:
+            # Nothing registered for this network yet (or the source changed): deploy once and record it
             print("Deploying smart contract...")
             contract_manager.compile_and_deploy()
             print(f"Contract deployed at: {config.CONTRACT_ADDRESS}")
-        else:
-            contract_manager.load_contract(config.CONTRACT_ADDRESS, config.CONTRACT_ABI)
-            print("Contract loaded from config")
     except Exception as e:
         print(f"Error with contract: {e}")
-        print("Attempting to deploy new contract...")
-        contract_manager.compile_and_deploy()
+
+    start_warmup()
 
     # Get port from environment variable for Render deployment
     port = int(os.getenv('PORT', 5000))
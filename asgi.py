@@ -0,0 +1,191 @@
+"""
+ASGI serving mode for the prediction API.
+
+Run with:
+    gunicorn asgi:app -k uvicorn.workers.UvicornWorker --bind 0.0.0.0:$PORT --workers ${WEB_CONCURRENCY:-1}
+    uvicorn asgi:app --port 5000                                   # local development
+
+Every route from app.py is served unchanged: each request runs the Flask view
+in a bounded thread pool (ASGI_THREADS), where inference keeps using the batch
+scheduler and request pool. What changes is waiting on the chain:
+
+- In record mode, each record's receipt is awaited in its own coroutine
+  (AsyncRecordSubmitter) instead of a polling thread. Transactions still go
+  through the ContractManager, so they share its nonce allocator and RPC
+  failover, and tickets are kept in the shared ticket store, so every worker
+  can answer for them and they outlive the worker that accepted them.
+- GET /records/<ticket>/status?wait=<seconds>&status=<last seen status>
+  long-polls on the event loop until the ticket changes. Hundreds of clients
+  can wait for confirmations while only the pool threads run views.
+"""
+
+import asyncio
+import io
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+import app as flask_app
+import config
+from blockchain.async_submitter import AsyncRecordSubmitter
+from blockchain.ticket_store import TicketStore
+
+RECORD_STATUS_PATH = re.compile(r'^/records/([0-9a-f]{32})/status$')
+
+
+class AsgiApp:
+    """Runs the Flask WSGI app on a bounded executor behind an ASGI event loop"""
+
+    def __init__(self, wsgi_app, threads=8, max_body=None, record_wait_max=30.0):
+        self.wsgi_app = wsgi_app
+        self.threads = threads
+        self.max_body = max_body
+        self.record_wait_max = record_wait_max
+        self.executor = None
+        self.submitter = None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+
+    async def startup(self):
+        loop = asyncio.get_running_loop()
+        # Per worker process, after fork
+        self.executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='asgi-view')
+        if isinstance(flask_app.record_submitter, AsyncRecordSubmitter):
+            self.submitter = flask_app.record_submitter
+            self.submitter.start(loop)
+        flask_app.start_warmup()
+
+    async def shutdown(self):
+        if self.submitter is not None:
+            await self.submitter.aclose()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    await self.startup()
+                except Exception as e:
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _http(self, scope, receive, send):
+        body = await self._read_body(receive)
+        if body is None:
+            await self._respond(send, '413 Request Entity Too Large', [('Content-Type', 'text/plain')], b'Request too large')
+            return
+
+        match = RECORD_STATUS_PATH.match(scope['path'])
+        if match and scope['method'] == 'GET' and self.submitter is not None:
+            query = parse_qs(scope.get('query_string', b'').decode('latin1'))
+            if 'wait' in query:
+                # Wait on the event loop, then let the Flask view (and its login check) answer
+                try:
+                    timeout = min(float(query['wait'][0]), self.record_wait_max)
+                except ValueError:
+                    timeout = 0.0
+                await self.submitter.wait(match.group(1), timeout, query.get('status', [None])[0])
+
+        environ = self._environ(scope, body)
+        loop = asyncio.get_running_loop()
+        status, headers, payload = await loop.run_in_executor(self.executor, self._run_wsgi, environ)
+        await self._respond(send, status, headers, payload)
+
+    async def _read_body(self, receive):
+        chunks = []
+        size = 0
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                break
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if self.max_body is not None and size > self.max_body:
+                return None
+            chunks.append(chunk)
+            if not message.get('more_body', False):
+                break
+        return b''.join(chunks)
+
+    def _environ(self, scope, body):
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client')
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin1'),
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': client[0] if client else '',
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False
+        }
+        for raw_name, raw_value in scope.get('headers', []):
+            name = raw_name.decode('latin1').upper().replace('-', '_')
+            value = raw_value.decode('latin1')
+            if name == 'CONTENT_TYPE':
+                environ['CONTENT_TYPE'] = value
+            elif name != 'CONTENT_LENGTH':
+                key = f'HTTP_{name}'
+                environ[key] = f'{environ[key]},{value}' if key in environ else value
+        return environ
+
+    def _run_wsgi(self, environ):
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = status
+            response['headers'] = headers
+            return lambda data: None
+
+        result = self.wsgi_app(environ, start_response)
+        try:
+            payload = b''.join(result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return response['status'], response['headers'], payload
+
+    async def _respond(self, send, status, headers, payload):
+        await send({
+            'type': 'http.response.start',
+            'status': int(status.split(' ', 1)[0]),
+            'headers': [(name.lower().encode('latin1'), value.encode('latin1')) for name, value in headers]
+        })
+        await send({'type': 'http.response.body', 'body': payload})
+
+
+if config.CHAIN_WRITE_MODE == 'record':
+    # Swapped in at import, before gunicorn's post_worker_init can start the threaded submitter
+    flask_app.record_submitter = AsyncRecordSubmitter(
+        flask_app.contract_manager,
+        TicketStore(config.RECORD_TICKET_DB, lease=config.RECORD_TICKET_LEASE),
+        poll_interval=config.RECEIPT_POLL_INTERVAL,
+        max_tickets=config.RECORD_TICKET_RETENTION
+    )
+
+app = AsgiApp(
+    flask_app.app,
+    threads=config.ASGI_THREADS,
+    max_body=flask_app.app.config['MAX_CONTENT_LENGTH'],
+    record_wait_max=config.RECORD_WAIT_MAX
+)
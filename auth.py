@@ -1,12 +1,62 @@
+import os
 import sqlite3
-import bcrypt
+import threading
 from datetime import datetime
 import config
+from utils.password_hasher import PasswordHasher
+
+# SQL kept as module constants so each pooled connection's statement cache
+# reuses the prepared statements instead of re-parsing them per call
+INSERT_USER = 'INSERT INTO users (name, email, password) VALUES (?, ?, ?)'
+SELECT_USER_BY_EMAIL = 'SELECT id, name, email, password FROM users WHERE email = ?'
+SELECT_USER_BY_ID = 'SELECT id, name, email FROM users WHERE id = ?'
+
+PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA cache_size=-8000',
+    'PRAGMA mmap_size=67108864'
+)
+
+_local = threading.local()
+
+# bcrypt runs on its own bounded pool so login bursts cannot starve inference;
+# raises HasherBusy when the queue is full or a hash outlives AUTH_HASH_TIMEOUT
+hasher = PasswordHasher(
+    rounds=config.BCRYPT_ROUNDS,
+    workers=config.AUTH_HASH_WORKERS,
+    max_pending=config.AUTH_HASH_QUEUE,
+    timeout=config.AUTH_HASH_TIMEOUT
+)
+
+def _connect():
+    conn = sqlite3.connect(
+        config.DATABASE_PATH,
+        timeout=config.DATABASE_BUSY_TIMEOUT,
+        cached_statements=64
+    )
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+def get_connection():
+    """Return this thread's cached connection, opening one on first use.
+
+    Connections are per thread (sqlite3 objects are not shared across threads)
+    and per process, so a connection opened before gunicorn forks is never
+    reused by a worker.
+    """
+    key = (os.getpid(), config.DATABASE_PATH)
+    if getattr(_local, 'key', None) != key:
+        _local.conn = _connect()
+        _local.key = key
+    return _local.conn
 
 def init_db():
-    conn = sqlite3.connect(config.DATABASE_PATH)
+    conn = get_connection()
     cursor = conn.cursor()
-    
+
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS users (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -16,48 +66,48 @@ def init_db():
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     ''')
-    
     conn.commit()
-    conn.close()
+    ensure_email_index(conn)
+
+def ensure_email_index(conn):
+    """Make sure login lookups by email use an index rather than a table scan.
+
+    The UNIQUE constraint normally provides one; databases created by older
+    schemas without it get an explicit index.
+    """
+    plan = conn.execute('EXPLAIN QUERY PLAN ' + SELECT_USER_BY_EMAIL, ('',)).fetchall()
+    if any('USING INDEX' in row[-1] or 'USING COVERING INDEX' in row[-1] for row in plan):
+        return True
+
+    print("users.email is not indexed, creating idx_users_email")
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_users_email ON users (email)')
+    conn.commit()
+    return False
 
 def create_user(name, email, password):
-    conn = sqlite3.connect(config.DATABASE_PATH)
-    cursor = conn.cursor()
-    
-    hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
-    
+    conn = get_connection()
+
+    hashed_password = hasher.hash(password)
+
     try:
-        cursor.execute(
-            'INSERT INTO users (name, email, password) VALUES (?, ?, ?)',
-            (name, email, hashed_password)
-        )
-        conn.commit()
-        conn.close()
+        with conn:
+            conn.execute(INSERT_USER, (name, email, hashed_password))
         return True
     except sqlite3.IntegrityError:
-        conn.close()
         return False
 
 def verify_user(email, password):
-    conn = sqlite3.connect(config.DATABASE_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT id, name, email, password FROM users WHERE email = ?', (email,))
-    user = cursor.fetchone()
-    conn.close()
-    
-    if user and bcrypt.checkpw(password.encode('utf-8'), user[3]):
+    conn = get_connection()
+    user = conn.execute(SELECT_USER_BY_EMAIL, (email,)).fetchone()
+
+    if user and hasher.check(password, user[3]):
         return {'id': user[0], 'name': user[1], 'email': user[2]}
     return None
 
 def get_user_by_id(user_id):
-    conn = sqlite3.connect(config.DATABASE_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT id, name, email FROM users WHERE id = ?', (user_id,))
-    user = cursor.fetchone()
-    conn.close()
-    
+    conn = get_connection()
+    user = conn.execute(SELECT_USER_BY_ID, (user_id,)).fetchone()
+
     if user:
         return {'id': user[0], 'name': user[1], 'email': user[2]}
-    return None
\ No newline at end of file
+    return None
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Benchmark login throughput against the users database.
+
+Usage:
+    python auth_benchmark.py                          # 8 threads, 2000 logins per mode
+    python auth_benchmark.py --threads 16 --logins 5000
+    python auth_benchmark.py --rounds 12 --logins 200 # production bcrypt cost
+
+Compares the previous access pattern (a fresh sqlite3 connection per call,
+rollback journal) with the pooled per-thread connections in auth.py (WAL,
+tuned pragmas, cached statements). Users are seeded with a low bcrypt cost by
+default so the numbers show the database layer rather than password hashing;
+pass --rounds 12 to see end-to-end login throughput.
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+import bcrypt
+import config
+import auth
+
+
+def legacy_verify_user(email, password):
+    """verify_user as it was before the connection pool"""
+    conn = sqlite3.connect(config.DATABASE_PATH)
+    cursor = conn.cursor()
+
+    cursor.execute('SELECT id, name, email, password FROM users WHERE email = ?', (email,))
+    user = cursor.fetchone()
+    conn.close()
+
+    if user and bcrypt.checkpw(password.encode('utf-8'), user[3]):
+        return {'id': user[0], 'name': user[1], 'email': user[2]}
+    return None
+
+
+def legacy_get_user_by_id(user_id):
+    conn = sqlite3.connect(config.DATABASE_PATH)
+    cursor = conn.cursor()
+
+    cursor.execute('SELECT id, name, email FROM users WHERE id = ?', (user_id,))
+    user = cursor.fetchone()
+    conn.close()
+    return user
+
+
+def seed(path, users, rounds, journal_mode):
+    conn = sqlite3.connect(path)
+    conn.execute(f'PRAGMA journal_mode={journal_mode}')
+    conn.execute('''
+        CREATE TABLE users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    hashed = bcrypt.hashpw(b'password', bcrypt.gensalt(rounds=rounds))
+    conn.executemany(
+        'INSERT INTO users (name, email, password) VALUES (?, ?, ?)',
+        ((f'User {i}', f'user{i}@example.com', hashed) for i in range(users))
+    )
+    conn.commit()
+    conn.close()
+
+
+def run(verify, lookup, users, threads, logins):
+    """Each login is verify_user followed by the get_user_by_id the next page load does"""
+    per_thread = logins // threads
+    errors = []
+
+    def worker():
+        rng = random.Random()
+        try:
+            for _ in range(per_thread):
+                user = verify(f'user{rng.randrange(users)}@example.com', 'password')
+                lookup(user['id'])
+        except Exception as e:
+            errors.append(e)
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    if errors:
+        raise errors[0]
+    return round(per_thread * threads / elapsed, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure logins/sec before and after the auth connection pool")
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--logins', type=int, default=2000)
+    parser.add_argument('--rounds', type=int, default=4, help="bcrypt cost of the seeded passwords")
+    parser.add_argument('--output', help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    result = {'users': args.users, 'threads': args.threads, 'logins': args.logins, 'bcrypt_rounds': args.rounds}
+    with tempfile.TemporaryDirectory() as tmp:
+        config.DATABASE_PATH = os.path.join(tmp, 'legacy.db')
+        seed(config.DATABASE_PATH, args.users, args.rounds, 'DELETE')
+        result['legacy_logins_per_sec'] = run(legacy_verify_user, legacy_get_user_by_id, args.users, args.threads, args.logins)
+
+        config.DATABASE_PATH = os.path.join(tmp, 'pooled.db')
+        seed(config.DATABASE_PATH, args.users, args.rounds, 'WAL')
+        auth.init_db()
+        result['pooled_logins_per_sec'] = run(auth.verify_user, auth.get_user_by_id, args.users, args.threads, args.logins)
+
+    result['speedup'] = round(result['pooled_logins_per_sec'] / result['legacy_logins_per_sec'], 2)
+    print(f"Legacy (connection per call): {result['legacy_logins_per_sec']} logins/sec")
+    print(f"Pooled (WAL, per-thread):     {result['pooled_logins_per_sec']} logins/sec ({result['speedup']}x)")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
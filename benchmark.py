@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+End-to-end load test of the prediction API against an in-process chain.
+
+Usage:
+    python benchmark.py                                       # 200 requests per disease, 8 clients
+    python benchmark.py --requests 500 --concurrency 16 --output bench.json
+    python benchmark.py --output new.json --baseline bench.json   # compare with an earlier run
+    python benchmark.py --chain none                          # skip the chain, measure inference only
+
+The Flask app is imported with a throwaway database, content store and upload
+folder, and its ContractManager is pointed at an eth-tester chain (install it
+with: pip install "eth-tester[py-evm]"). Concurrent clients then post synthetic
+retinal / ECG images with tabular rows drawn from diabetes.csv and heart.csv.
+
+The JSON report has, per phase (startup, chain_setup, warmup, predict_<disease>,
+chain_drain): wall time, peak RSS, request throughput and latency percentiles,
+and percentiles for every stage span the app records (upload_save,
+scaler_transform, xgboost, cnn_preprocess, cnn_forward, ipfs_hash, nonce_fetch,
+tx_send, receipt_wait, ...). Batched stages are counted once per batch.
+"""
+
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter
+from blockchain.ticket_store import OPEN_STATUSES
+
+FORM_FIELDS = {
+    'diabetes': ['pregnancies', 'glucose', 'blood_pressure', 'skin_thickness', 'insulin', 'bmi', 'diabetes_pedigree', 'age'],
+    'heart': ['age', 'sex', 'cp', 'trestbps', 'chol', 'fbs', 'restecg', 'thalach', 'exang', 'oldpeak', 'slope', 'ca', 'thal']
+}
+DATASETS = {'diabetes': 'diabetes.csv', 'heart': 'heart.csv'}
+PERCENTILES = (50, 90, 95, 99)
+
+
+def current_rss_mb():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def summarize(samples, scale=1000.0):
+    """Percentiles of samples (seconds) in milliseconds"""
+    if not samples:
+        return {'count': 0}
+    ordered = np.sort(np.asarray(samples)) * scale
+    summary = {'count': len(ordered), 'mean': round(float(ordered.mean()), 3)}
+    for p in PERCENTILES:
+        summary[f'p{p}'] = round(float(np.percentile(ordered, p)), 3)
+    summary['max'] = round(float(ordered[-1]), 3)
+    return summary
+
+
+class Recorder:
+    """Tracks the current phase, its peak RSS and every stage span recorded during it"""
+
+    def __init__(self, sample_interval=0.05):
+        self.phases = {}
+        self.current = None
+        self.stage_samples = {}
+        self.sample_interval = sample_interval
+        self._lock = threading.Lock()
+        threading.Thread(target=self._sample_rss, name='rss-sampler', daemon=True).start()
+
+    def on_span(self, stage, seconds):
+        with self._lock:
+            if self.current is not None:
+                self.stage_samples[self.current].setdefault(stage, []).append(seconds)
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        with self._lock:
+            self.current = name
+            self.stage_samples[name] = {}
+            self.phases[name] = {'peak_rss_mb': current_rss_mb()}
+        print(f"== {name}", file=sys.stderr)
+        started = time.perf_counter()
+        try:
+            yield self.phases[name]
+        finally:
+            with self._lock:
+                entry = self.phases[name]
+                entry['seconds'] = round(time.perf_counter() - started, 3)
+                entry['peak_rss_mb'] = round(max(entry['peak_rss_mb'], current_rss_mb()), 1)
+                entry['stages'] = {stage: summarize(values) for stage, values in self.stage_samples[name].items()}
+                self.current = None
+
+    def _sample_rss(self):
+        while True:
+            time.sleep(self.sample_interval)
+            rss = current_rss_mb()
+            with self._lock:
+                if self.current is not None:
+                    entry = self.phases[self.current]
+                    entry['peak_rss_mb'] = max(entry['peak_rss_mb'], rss)
+
+
+def retinal_image(rng, size):
+    """Fundus-like image: dark background, orange disc, optic disc, vessels and lesions"""
+    img = Image.new('RGB', (size, size), (0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    margin = size // 16
+    base = (rng.randint(150, 220), rng.randint(60, 110), rng.randint(20, 50))
+    draw.ellipse([margin, margin, size - margin, size - margin], fill=base)
+    cx, cy = rng.randint(size // 3, 2 * size // 3), rng.randint(size // 3, 2 * size // 3)
+    for _ in range(12):
+        points = [(cx, cy)]
+        for _ in range(6):
+            points.append((points[-1][0] + rng.randint(-size // 8, size // 8), points[-1][1] + rng.randint(-size // 8, size // 8)))
+        draw.line(points, fill=(120, 20, 15), width=max(2, size // 200))
+    radius = size // 14
+    draw.ellipse([cx - radius, cy - radius, cx + radius, cy + radius], fill=(250, 220, 150))
+    for _ in range(rng.randint(0, 40)):
+        x, y, r = rng.randint(size // 5, 4 * size // 5), rng.randint(size // 5, 4 * size // 5), rng.randint(2, size // 80 + 3)
+        draw.ellipse([x - r, y - r, x + r, y + r], fill=rng.choice([(90, 10, 10), (250, 240, 170)]))
+    return img.filter(ImageFilter.GaussianBlur(size / 400))
+
+
+def ecg_image(rng, size):
+    """ECG-strip-like image: pink grid with twelve noisy PQRST traces"""
+    width, height = size, int(size * 0.75)
+    img = Image.new('RGB', (width, height), (255, 240, 240))
+    draw = ImageDraw.Draw(img)
+    step = max(4, width // 100)
+    for x in range(0, width, step):
+        draw.line([(x, 0), (x, height)], fill=(245, 190, 190) if x % (step * 5) else (235, 150, 150))
+    for y in range(0, height, step):
+        draw.line([(0, y), (width, y)], fill=(245, 190, 190) if y % (step * 5) else (235, 150, 150))
+
+    beat = rng.uniform(0.8, 1.2) * width / 6
+    lead_height = height / 12
+    for lead in range(12):
+        baseline = lead_height * (lead + 0.5)
+        points = []
+        for x in range(width):
+            phase = (x % beat) / beat
+            y = 0.1 * np.sin(2 * np.pi * phase)
+            if 0.40 < phase < 0.43:
+                y += rng.uniform(0.8, 1.2) * np.sin((phase - 0.40) / 0.03 * np.pi)
+            elif 0.6 < phase < 0.75:
+                y += 0.25 * np.sin((phase - 0.6) / 0.15 * np.pi)
+            points.append((x, baseline - y * lead_height * 0.4 + rng.gauss(0, 0.6)))
+        draw.line(points, fill=(20, 20, 20), width=max(1, size // 500))
+    return img
+
+
+def encode(img, rng):
+    buffer = io.BytesIO()
+    img.save(buffer, format='JPEG', quality=rng.randint(80, 95))
+    return buffer.getvalue()
+
+
+def build_images(disease, count, size, seed):
+    rng = random.Random(seed)
+    make = retinal_image if disease == 'diabetes' else ecg_image
+    return [encode(make(rng, size), rng) for _ in range(count)]
+
+
+def load_rows(disease):
+    from utils.bulk_scoring import FEATURE_COLUMNS
+
+    with open(DATASETS[disease], newline='') as f:
+        reader = csv.reader(f)
+        header = [name.strip().lower() for name in next(reader)]
+        indexes = [header.index(name.lower()) for name in FEATURE_COLUMNS[disease]]
+        return [[row[i] for i in indexes] for row in reader if row]
+
+
+def start_chain():
+    """In-process eth-tester chain; returns (w3, account, private key)"""
+    from web3 import Web3, EthereumTesterProvider
+    from eth_tester import EthereumTester
+
+    tester = EthereumTester()
+    w3 = Web3(EthereumTesterProvider(tester))
+    return w3, w3.eth.accounts[0], tester.backend.account_keys[0].to_hex()
+
+
+def run_load(app_module, disease, rows, images, args, phase):
+    """Fire args.requests predictions from args.concurrency logged-in clients"""
+    local = threading.local()
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    counter = iter(range(args.requests))
+
+    def client():
+        if getattr(local, 'client', None) is None:
+            local.client = app_module.app.test_client()
+            local.client.post('/login', json={'email': args.email, 'password': args.password})
+            local.rng = random.Random()
+        return local.client
+
+    def one(i):
+        c = client()
+        row = local.rng.choice(rows)
+        form = dict(zip(FORM_FIELDS[disease], row))
+        form['patient_id'] = f'BENCH_{disease}_{i}'
+        form['image_file'] = (io.BytesIO(local.rng.choice(images)), f'{disease}.jpg')
+        started = time.perf_counter()
+        response = c.post(f'/predict/{disease}', data=form, content_type='multipart/form-data')
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            if response.status_code != 200 and statuses[response.status_code] == 1:
+                print(f"  {response.status_code}: {response.get_data(as_text=True)[:200]}", file=sys.stderr)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(one, counter))
+    wall = time.perf_counter() - started
+
+    phase['requests'] = len(latencies)
+    phase['status_codes'] = {str(code): count for code, count in sorted(statuses.items())}
+    phase['errors'] = sum(count for code, count in statuses.items() if code != 200)
+    phase['throughput_rps'] = round(len(latencies) / wall, 2)
+    phase['latency_ms'] = summarize(latencies)
+
+
+def drain_chain(app_module, timeout, phase):
+    deadline = time.monotonic() + timeout
+    submitter = app_module.record_submitter
+    if hasattr(submitter, 'flush'):
+        submitter.flush()
+    # Tickets are counted from the store, which is updated after a record leaves pending_count()
+    counts = submitter.store.status_counts()
+    while any(status in OPEN_STATUSES for status in counts) and time.monotonic() < deadline:
+        time.sleep(0.2)
+        counts = submitter.store.status_counts()
+
+    phase['tickets'] = counts
+    phase['pending'] = submitter.pending_count()
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(result, baseline):
+    """Print throughput and latency deltas against an earlier report"""
+    print(f"\nAgainst baseline {baseline['meta'].get('git_commit')}:", file=sys.stderr)
+    for name, phase in result['phases'].items():
+        old = baseline['phases'].get(name)
+        if not old:
+            continue
+        rows = []
+        if 'throughput_rps' in phase and 'throughput_rps' in old:
+            rows.append(('throughput_rps', old['throughput_rps'], phase['throughput_rps']))
+        for key in ('p50', 'p95'):
+            if key in phase.get('latency_ms', {}) and key in old.get('latency_ms', {}):
+                rows.append((f'latency {key} ms', old['latency_ms'][key], phase['latency_ms'][key]))
+        for stage, stats in phase.get('stages', {}).items():
+            if 'p50' in stats and 'p50' in old.get('stages', {}).get(stage, {}):
+                rows.append((f'{stage} p50 ms', old['stages'][stage]['p50'], stats['p50']))
+        rows.append(('peak_rss_mb', old['peak_rss_mb'], phase['peak_rss_mb']))
+        print(f"  {name}", file=sys.stderr)
+        for label, before, after in rows:
+            change = f"{(after - before) / before * 100:+.1f}%" if before else 'n/a'
+            print(f"    {label:<28}{before:>12}{after:>12}  {change}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the prediction API with synthetic inputs")
+    parser.add_argument('--disease', choices=sorted(FORM_FIELDS), action='append', help="Disease to load-test (default: both)")
+    parser.add_argument('--requests', type=int, default=200, help="Requests per disease")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--image-size', type=int, default=1024, help="Edge length of the synthetic images")
+    parser.add_argument('--image-variants', type=int, default=16, help="Distinct images per disease")
+    parser.add_argument('--chain', choices=['tester', 'none'], default='tester')
+    parser.add_argument('--drain-timeout', type=float, default=120.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Write the JSON report to this file")
+    parser.add_argument('--baseline', help="Earlier JSON report to compare against")
+    parser.add_argument('--email', default='bench@example.com')
+    parser.add_argument('--password', default='benchmark')
+    args = parser.parse_args()
+
+    diseases = args.disease or sorted(FORM_FIELDS)
+    random.seed(args.seed)
+    workdir = tempfile.mkdtemp(prefix='medblock-bench-')
+    # Isolated state, no cross-run cache hits, and never the configured remote node
+    os.environ.update({
+        'DATABASE_PATH': os.path.join(workdir, 'users.db'),
+        'IPFS_STORE_DIR': os.path.join(workdir, 'ipfs_store'),
+        'UPLOAD_FOLDER': os.path.join(workdir, 'uploads'),
+        'PREDICTION_CACHE_DB': '',
+        'RECORD_TICKET_DB': os.path.join(workdir, 'record_tickets.db'),
+        'RECORD_INDEX_DB': os.path.join(workdir, 'record_index.db'),
+        'NONCE_DB': os.path.join(workdir, 'nonces.db'),
+        'DEPLOYMENT_REGISTRY': os.path.join(workdir, 'deployments.json'),
+        'ALCHEMY_API_KEY': '',
+        'GANACHE_URL': 'http://127.0.0.1:9'
+    })
+    os.environ.setdefault('RECEIPT_POLL_INTERVAL', '0.2')
+    os.environ.setdefault('WARMUP_MODELS', 'none')
+
+    from utils import metrics
+    recorder = Recorder()
+    metrics.listeners.append(recorder.on_span)
+
+    # App and model loader logging goes to stderr so stdout stays valid JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        with recorder.phase('startup'):
+            import app as app_module
+            import auth
+            import config
+
+        with recorder.phase('chain_setup'):
+            if args.chain == 'tester':
+                from blockchain.contract_manager import ContractManager
+                w3, account, private_key = start_chain()
+                contract_manager = ContractManager(w3=w3, account=account, private_key=private_key)
+                contract_manager.compile_and_deploy()
+                app_module.contract_manager = contract_manager
+                app_module.record_submitter.contract_manager = contract_manager
+
+        with recorder.phase('warmup'):
+            app_module.model_loader.warmup()
+            auth.create_user('Benchmark', args.email, args.password)
+
+        for disease in diseases:
+            images = build_images(disease, args.image_variants, args.image_size, args.seed)
+            rows = load_rows(disease)
+            with recorder.phase(f'predict_{disease}') as phase:
+                run_load(app_module, disease, rows, images, args, phase)
+            print(f"  {phase['throughput_rps']} req/s, p50 {phase['latency_ms'].get('p50')} ms, "
+                  f"p95 {phase['latency_ms'].get('p95')} ms, errors {phase['errors']}", file=sys.stderr)
+
+        if args.chain == 'tester':
+            with recorder.phase('chain_drain') as phase:
+                drain_chain(app_module, args.drain_timeout, phase)
+
+    import torch
+    result = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'git_commit': git_commit(),
+            'python': platform.python_version(),
+            'torch': torch.__version__,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'args': {key: value for key, value in vars(args).items() if key != 'password'},
+            'config': {
+                name: getattr(config, name) for name in (
+                    'IMAGE_MODEL_BACKEND', 'IMAGE_FAST_DECODE', 'IMAGE_DECODE_WORKERS', 'BATCH_MAX_SIZE',
+                    'BATCH_MAX_WAIT_MS', 'REQUEST_POOL_WORKERS', 'CHAIN_WRITE_MODE', 'MODEL_MMAP_WEIGHTS',
+                    'BCRYPT_ROUNDS'
+                )
+            }
+        },
+        'phases': recorder.phases
+    }
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(result, json.load(f))
+
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
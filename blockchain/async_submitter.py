@@ -0,0 +1,210 @@
+import asyncio
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+class AsyncRecordSubmitter:
+    """Record pipeline for the ASGI server, with one coroutine per record.
+
+    Same submit() / status() / pending_count() interface as RecordSubmitter,
+    so the Flask views call it unchanged from their executor threads.
+    Tickets live in the same TicketStore as RecordSubmitter's, so status()
+    answers for tickets queued by any worker, and the tickets of a worker
+    that exits or dies are adopted by one that is still running.
+    Transactions are still signed and sent by the ContractManager, on a
+    single sender thread: they share its nonce allocator, gas price cache and
+    failover-aware RPC pool with every other writer in the process. Each
+    transaction then waits for its receipt in its own coroutine, borrowing a
+    lookup thread only for the duration of each poll, so hundreds of records
+    can be awaiting confirmation without a thread each. wait() lets a request
+    long-poll a ticket the same way.
+    """
+
+    TERMINAL = ('confirmed', 'failed')
+
+    def __init__(self, contract_manager, store, poll_interval=2.0, max_tickets=10000, receipt_timeout=600.0, lookup_threads=4):
+        self.contract_manager = contract_manager
+        self.store = store
+        self.poll_interval = poll_interval
+        self.max_tickets = max_tickets
+        self.receipt_timeout = receipt_timeout
+        self.lookup_threads = lookup_threads
+        self.loop = None
+        self._closed = False
+        self._submitted = 0
+        self._sending = set()
+        self._confirming = set()
+        self._changed = {}
+        self._sender = None
+        self._lookups = None
+        self._maintenance = None
+
+    def start(self, loop=None):
+        """Bind to the server's event loop (called from the ASGI lifespan startup).
+
+        start_warmup() also calls start() without a loop, before the lifespan
+        runs; there is nothing to start until the loop exists.
+        """
+        if loop is None or self.loop is not None:
+            return
+        # One sender thread keeps transactions in nonce order
+        self._sender = ThreadPoolExecutor(max_workers=1, thread_name_prefix='record-sender')
+        self._lookups = ThreadPoolExecutor(max_workers=self.lookup_threads, thread_name_prefix='receipt-lookup')
+        self.loop = loop
+        self.store.heartbeat()
+        self._adopt(self.store.adopt())
+        self._maintenance = loop.create_task(self._maintain())
+
+    def submit(self, patient_id, disease_type, prediction, data_hash, image_hash):
+        """Queue a record for the chain and return its ticket id (safe to call from any thread)"""
+        if self.loop is None:
+            raise RuntimeError("AsyncRecordSubmitter has not been started")
+        ticket = uuid.uuid4().hex
+        record = (patient_id, disease_type, prediction, data_hash, image_hash)
+        self.store.create(ticket, record)
+        self._submitted += 1
+        if self._submitted % 100 == 0:
+            self.store.trim(self.max_tickets)
+        self.loop.call_soon_threadsafe(self._spawn, self._send(ticket, record), self._sending)
+        return ticket
+
+    def status(self, ticket):
+        return self.store.get(ticket)
+
+    def pending_count(self):
+        return len(self._sending) + len(self._confirming)
+
+    async def wait(self, ticket, timeout, status=None):
+        """Wait until the ticket moves past status (default: its current one) or timeout passes.
+
+        Changes made in this worker wake the wait at once; tickets handled by
+        another worker are re-read from the store every poll_interval.
+        """
+        deadline = self.loop.time() + timeout
+        entry = await self._read(ticket)
+        if status is None and entry is not None:
+            status = entry['status']
+        while entry is not None and entry['status'] == status and entry['status'] not in self.TERMINAL:
+            remaining = deadline - self.loop.time()
+            if remaining <= 0:
+                break
+            event = self._changed.setdefault(ticket, asyncio.Event())
+            try:
+                await asyncio.wait_for(event.wait(), min(remaining, self.poll_interval))
+            except asyncio.TimeoutError:
+                pass
+            entry = await self._read(ticket)
+        return entry
+
+    def shutdown(self, wait=True, timeout=None):
+        """Nothing to drain here: aclose() already ran at lifespan shutdown"""
+
+    async def aclose(self, timeout=None):
+        """Send every queued record, then hand the unconfirmed ones to the other workers.
+
+        Records that are still queued were already acknowledged to clients, so
+        they are sent before the worker exits. Tickets waiting for a receipt
+        stay submitted in the store; releasing this worker's lease lets
+        another worker adopt and confirm them right away.
+        """
+        if self.loop is None:
+            return
+        if self._maintenance is not None:
+            self._maintenance.cancel()
+        deadline = None if timeout is None else self.loop.time() + timeout
+        # Let submits already handed to the loop spawn their sends first
+        await asyncio.sleep(0)
+        while self._sending:
+            remaining = None if deadline is None else deadline - self.loop.time()
+            if remaining is not None and remaining <= 0:
+                break
+            await asyncio.wait(set(self._sending), timeout=remaining)
+        self._closed = True
+        for task in list(self._confirming):
+            task.cancel()
+        if not self._sending:
+            # A record still being sent must not be adopted (and sent again) by another worker
+            await self.loop.run_in_executor(self._lookups, self.store.release)
+        self._sender.shutdown(wait=False)
+        self._lookups.shutdown(wait=False)
+
+    def _spawn(self, coroutine, tasks):
+        if self._closed:
+            # Submitted during shutdown: the ticket stays queued in the store for another worker to adopt
+            coroutine.close()
+            return
+        task = self.loop.create_task(coroutine)
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    def _adopt(self, adopted):
+        for ticket, status, record, tx_hash in adopted:
+            if status == 'queued':
+                self._spawn(self._send(ticket, record), self._sending)
+            else:
+                self._spawn(self._confirm(ticket, tx_hash), self._confirming)
+        if adopted:
+            print(f"Resuming {len(adopted)} record tickets left by another worker")
+
+    async def _maintain(self):
+        # Keep this worker's lease alive and pick up the tickets of workers that died
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self.loop.run_in_executor(self._lookups, self.store.heartbeat)
+                self._adopt(await self.loop.run_in_executor(self._lookups, self.store.adopt))
+            except Exception as e:
+                print(f"Record ticket store unavailable: {e}")
+
+    async def _read(self, ticket):
+        return await self.loop.run_in_executor(self._lookups, self.store.get, ticket)
+
+    async def _send(self, ticket, record):
+        try:
+            tx_hash = await self.loop.run_in_executor(self._sender, lambda: self.contract_manager.send_record(*record))
+        except Exception as e:
+            print(f"Record submission failed for ticket {ticket}: {e}")
+            await self._update(ticket, status='failed', error=str(e))
+            return
+
+        await self._update(ticket, status='submitted', tx_hash=tx_hash)
+        self._spawn(self._confirm(ticket, tx_hash), self._confirming)
+
+    async def _confirm(self, ticket, tx_hash):
+        receipt = await self._wait_for_receipt(tx_hash)
+        if receipt is None:
+            await self._update(ticket, status='failed', error='Timed out waiting for the receipt')
+            return
+
+        if receipt.status == 1:
+            await self._update(ticket, status='confirmed', block_number=receipt.blockNumber, gas_used=receipt.gasUsed)
+        else:
+            await self._update(
+                ticket,
+                status='failed',
+                block_number=receipt.blockNumber,
+                gas_used=receipt.gasUsed,
+                error='Transaction reverted'
+            )
+
+    async def _wait_for_receipt(self, tx_hash):
+        deadline = self.loop.time() + self.receipt_timeout
+        while self.loop.time() < deadline:
+            try:
+                receipt = await self.loop.run_in_executor(self._lookups, self.contract_manager.get_receipt, tx_hash)
+            except Exception as e:
+                print(f"Receipt lookup failed for {tx_hash}: {e}")
+            else:
+                if receipt is not None:
+                    return receipt
+            await asyncio.sleep(self.poll_interval)
+        return None
+
+    async def _update(self, ticket, **fields):
+        try:
+            await self.loop.run_in_executor(self._lookups, lambda: self.store.update(ticket, **fields))
+        except Exception as e:
+            print(f"Could not update record ticket {ticket}: {e}")
+        event = self._changed.pop(ticket, None)
+        if event is not None:
+            event.set()
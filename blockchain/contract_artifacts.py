@@ -0,0 +1,143 @@
+"""Compiled contract artifacts and the per-network deployment registry.
+
+Usage:
+    python -m blockchain.contract_artifacts build            # compile once (build step)
+    python -m blockchain.contract_artifacts deploy           # deploy and register for BLOCKCHAIN_NETWORK
+    python -m blockchain.contract_artifacts show
+
+Artifacts are written to CONTRACT_ARTIFACT_DIR as <Name>.<source hash>.json,
+keyed by the SHA-256 of the Solidity source and compiler version, so the
+compiler only runs when the contract actually changes. The registry
+(DEPLOYMENT_REGISTRY) maps each network to its deployed address and ABI;
+the app loads it at startup and restarts neither compile nor deploy.
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+
+SOLC_VERSION = '0.8.0'
+
+
+def source_hash(source_path, solc_version=SOLC_VERSION):
+    digest = hashlib.sha256()
+    with open(source_path, 'rb') as f:
+        digest.update(f.read())
+    digest.update(solc_version.encode())
+    return digest.hexdigest()
+
+
+def artifact_path(source_path, artifact_dir, digest):
+    name = os.path.splitext(os.path.basename(source_path))[0]
+    return os.path.join(artifact_dir, f'{name}.{digest[:16]}.json')
+
+
+def load_artifact(source_path, artifact_dir, solc_version=SOLC_VERSION):
+    """Return the cached artifact for the current source, or None if it has not been built"""
+    digest = source_hash(source_path, solc_version)
+    path = artifact_path(source_path, artifact_dir, digest)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        artifact = json.load(f)
+    return artifact if artifact.get('source_hash') == digest else None
+
+
+def build_artifact(source_path, artifact_dir, solc_version=SOLC_VERSION):
+    """Return the artifact for the current source, compiling only on a cache miss"""
+    artifact = load_artifact(source_path, artifact_dir, solc_version)
+    if artifact is not None:
+        return artifact
+
+    # py-solc-x and the compiler download are only needed on a cache miss
+    from solcx import compile_source, install_solc, set_solc_version
+    try:
+        install_solc(solc_version, show_progress=True)
+        set_solc_version(solc_version)
+    except Exception as e:
+        print(f"Solc installation warning: {e}")
+
+    with open(source_path, 'r') as f:
+        contract_source = f.read()
+
+    print(f"Compiling {source_path}...")
+    compiled_sol = compile_source(contract_source, output_values=['abi', 'bin'], solc_version=solc_version)
+    contract_id, contract_interface = compiled_sol.popitem()
+    digest = source_hash(source_path, solc_version)
+    artifact = {
+        'contract': contract_id.split(':')[-1],
+        'source': source_path,
+        'source_hash': digest,
+        'solc_version': solc_version,
+        'abi': contract_interface['abi'],
+        'bytecode': contract_interface['bin'],
+        'compiled_at': int(time.time())
+    }
+    _write_json(artifact_path(source_path, artifact_dir, digest), artifact)
+    print(f"✓ Artifact written to {artifact_path(source_path, artifact_dir, digest)}")
+    return artifact
+
+
+class DeploymentRegistry:
+    """JSON file of deployments, one entry per network name"""
+
+    def __init__(self, path='deployments.json'):
+        self.path = path
+
+    def get(self, network):
+        return self._read().get(network)
+
+    def record(self, network, entry):
+        deployments = self._read()
+        deployments[network] = entry
+        _write_json(self.path, deployments)
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path) as f:
+            return json.load(f)
+
+
+def _write_json(path, data):
+    # Write then rename, so a worker reading at startup never sees a partial file
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(temp_path, path)
+
+
+def main():
+    import config
+
+    parser = argparse.ArgumentParser(description="Build contract artifacts and manage deployments")
+    parser.add_argument('command', choices=['build', 'deploy', 'show'])
+    parser.add_argument('--force', action='store_true', help="deploy: deploy even if the registry has a current deployment")
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        artifact = build_artifact(config.CONTRACT_SOURCE, config.CONTRACT_ARTIFACT_DIR)
+        print(f"{artifact['contract']} {artifact['source_hash'][:16]} (solc {artifact['solc_version']})")
+    elif args.command == 'deploy':
+        from blockchain.contract_manager import ContractManager
+        contract_manager = ContractManager()
+        if contract_manager.load_deployment() and not args.force:
+            print(f"Already deployed on {config.BLOCKCHAIN_NETWORK} at {contract_manager.contract_address} (use --force to redeploy)")
+            return
+        contract_manager.compile_and_deploy()
+    else:
+        registry = DeploymentRegistry(config.DEPLOYMENT_REGISTRY)
+        print(json.dumps({
+            'network': config.BLOCKCHAIN_NETWORK,
+            'source_hash': source_hash(config.CONTRACT_SOURCE),
+            'artifact_built': load_artifact(config.CONTRACT_SOURCE, config.CONTRACT_ARTIFACT_DIR) is not None,
+            'deployment': {k: v for k, v in (registry.get(config.BLOCKCHAIN_NETWORK) or {}).items() if k != 'abi'}
+        }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,40 +1,183 @@
-from web3 import Web3
-from solcx import compile_source, install_solc, set_solc_version
+from blockchain.nonce_manager import NonceManager, GasPriceCache
+from blockchain.contract_artifacts import DeploymentRegistry, build_artifact, load_artifact, source_hash
+from blockchain import record_codec
 import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import ExitStack
+from utils import metrics
 import config
 
-try:
-    install_solc('0.8.0')
-    set_solc_version('0.8.0')
-except Exception as e:
-    print(f"Solc installation warning: {e}")
+# How nodes reject a raw transaction they already hold (geth, erigon/nethermind, parity/besu)
+ALREADY_KNOWN = ('already known', 'known transaction', 'already imported')
 
 class ContractManager:
-    def __init__(self):
-        self.w3 = Web3(Web3.HTTPProvider(config.GANACHE_URL))
-        self.account = config.ACCOUNT_ADDRESS
-        self.private_key = config.PRIVATE_KEY
-        self.contract = None
+    def __init__(self, w3=None, account=None, private_key=None, nonce_db=None):
+        # w3/account/private_key override the configured node, e.g. an in-process eth-tester chain.
+        # Such a chain belongs to this process, so its nonces are only shared when nonce_db is given
+        if nonce_db is None and w3 is None:
+            nonce_db = config.NONCE_DB
+        self.account = account or config.ACCOUNT_ADDRESS
+        self.private_key = private_key or config.PRIVATE_KEY
         self.contract_address = None
+        self.contract_abi = None
+        # True for MedicalRecordV2: records are sent as bytes32 hashes and uint8 enum codes
+        self.compact = False
+        # web3 takes most of the app's import time, so the client for the configured node,
+        # and everything built on it, is created on first use (a background thread or the
+        # first request) rather than when a worker imports the app
+        self._w3 = None
+        self._nonce_db = nonce_db
+        self._nonces = None
+        self._gas_prices = None
+        self._contract = None
+        self._connect_lock = threading.Lock()
+        if w3 is not None:
+            self._attach(w3)
+        self.registry = DeploymentRegistry(config.DEPLOYMENT_REGISTRY)
+        self._chain_id = None
+        # Send time per tx hash, so the first receipt lookup that finds it can record receipt_wait
+        self._sent_at = OrderedDict()
+        # Filled in by check_health(); no RPC calls here so the server binds without waiting on the node
+        self.health = {'connected': None, 'balance_eth': None, 'checked_at': None, 'error': None}
+        self._health_lock = threading.Lock()
+        self._probe_pid = None
 
-        # Test connection
-        if not self.w3.is_connected():
-            print(f"WARNING: Cannot connect to blockchain at {config.GANACHE_URL}")
-            print("Please check your network configuration.")
-        else:
+    @property
+    def w3(self):
+        if self._w3 is None:
+            self._connect()
+        return self._w3
+
+    @property
+    def nonces(self):
+        if self._w3 is None:
+            self._connect()
+        return self._nonces
+
+    @property
+    def gas_prices(self):
+        if self._w3 is None:
+            self._connect()
+        return self._gas_prices
+
+    @property
+    def contract(self):
+        """The loaded contract, or None before load_contract()"""
+        if self._contract is None and self.contract_abi is not None:
+            w3 = self.w3
+            with self._connect_lock:
+                if self._contract is None:
+                    self._contract = w3.eth.contract(address=self.contract_address, abi=self.contract_abi)
+        return self._contract
+
+    def _connect(self):
+        with self._connect_lock:
+            if self._w3 is not None:
+                return
+            from web3 import Web3
+            from blockchain.rpc_provider import PooledHTTPProvider
+            self._attach(Web3(PooledHTTPProvider(
+                config.RPC_ENDPOINTS,
+                pool_size=config.RPC_POOL_SIZE,
+                timeout=config.RPC_TIMEOUT,
+                retries=config.RPC_RETRIES,
+                backoff=config.RPC_BACKOFF,
+                backoff_max=config.RPC_BACKOFF_MAX,
+                failure_threshold=config.RPC_FAILURE_THRESHOLD,
+                cooldown=config.RPC_FAILOVER_COOLDOWN
+            )))
+
+    def _attach(self, w3):
+        self._nonces = NonceManager(w3, self.account, db_path=self._nonce_db)
+        self._gas_prices = GasPriceCache(w3, ttl=config.GAS_PRICE_TTL)
+        # Set last: a thread that sees the client also sees its nonce allocator and gas cache
+        self._w3 = w3
+
+    def check_health(self):
+        """Check connectivity and the account balance; returns the health dict"""
+        was_connected = self.health['connected']
+        try:
+            connected = self.w3.is_connected()
+            balance = self.w3.from_wei(self.w3.eth.get_balance(self.account), 'ether') if connected else None
+            error = None if connected else f"Cannot connect to {config.GANACHE_URL}"
+            if connected and self.contract_address is not None and not self.w3.eth.get_code(self.contract_address):
+                error = f"No contract code at {self.contract_address}; redeploy with python -m blockchain.contract_artifacts deploy"
+        except Exception as e:
+            connected, balance, error = False, None, str(e)
+        self.health = {
+            'connected': connected,
+            'balance_eth': float(balance) if balance is not None else None,
+            'checked_at': time.time(),
+            'error': error
+        }
+
+        if connected and was_connected is not True:
             print(f"✓ Connected to blockchain network")
             print(f"  Network: {config.BLOCKCHAIN_NETWORK}")
             print(f"  Account: {self.account}")
-            balance = self.w3.eth.get_balance(self.account)
-            eth_balance = self.w3.from_wei(balance, 'ether')
-            print(f"  Balance: {eth_balance} ETH")
-        
+            print(f"  Balance: {balance} ETH")
+        elif not connected and was_connected is not False:
+            print(f"WARNING: Cannot connect to blockchain at {config.GANACHE_URL}")
+            print("Please check your network configuration.")
+        return self.health
+
+    def start_health_probe(self, interval=30.0):
+        """Run check_health() now and every interval seconds in the background (per worker, after fork)"""
+        if self._probe_pid == os.getpid():
+            return
+        with self._health_lock:
+            if self._probe_pid != os.getpid():
+                self._probe_pid = os.getpid()
+                threading.Thread(target=self._probe, args=(interval,), name='chain-health', daemon=True).start()
+
+    def _probe(self, interval):
+        while True:
+            self.check_health()
+            time.sleep(interval)
+
+    def load_deployment(self):
+        """Load the contract for this network from CONTRACT_ADDRESS or the deployment registry.
+
+        Makes no RPC calls and never compiles, so it is safe at import time in
+        every worker. Returns False when there is nothing current to load: no
+        deployment yet, or the contract source changed since it was deployed.
+        """
+        if config.CONTRACT_ADDRESS:
+            abi = config.CONTRACT_ABI
+            if abi is None:
+                artifact = load_artifact(config.CONTRACT_SOURCE, config.CONTRACT_ARTIFACT_DIR)
+                if artifact is None:
+                    print("WARNING: CONTRACT_ADDRESS is set but no contract artifact is built "
+                          "(python -m blockchain.contract_artifacts build)")
+                    return False
+                abi = artifact['abi']
+            from eth_utils import to_checksum_address
+            self.load_contract(to_checksum_address(config.CONTRACT_ADDRESS), abi)
+            config.CONTRACT_ABI = abi
+            return True
+
+        deployment = self.registry.get(config.BLOCKCHAIN_NETWORK)
+        if deployment is None:
+            print(f"No contract deployment registered for {config.BLOCKCHAIN_NETWORK} "
+                  f"(python -m blockchain.contract_artifacts deploy)")
+            return False
+        if deployment['source_hash'] != source_hash(config.CONTRACT_SOURCE):
+            print(f"WARNING: {config.CONTRACT_SOURCE} changed since the {config.BLOCKCHAIN_NETWORK} deployment "
+                  f"at {deployment['address']}; redeploy it")
+            return False
+
+        self.load_contract(deployment['address'], deployment['abi'])
+        config.CONTRACT_ADDRESS = deployment['address']
+        config.CONTRACT_ABI = deployment['abi']
+        print(f"✓ Contract loaded from {self.registry.path} ({config.BLOCKCHAIN_NETWORK}: {deployment['address']})")
+        return True
+
     def compile_and_deploy(self):
-        try:
-            install_solc('0.8.0', show_progress=True)
-            set_solc_version('0.8.0')
-        except:
-            pass
+        # Compiles only when the source has no cached artifact yet
+        artifact = build_artifact(config.CONTRACT_SOURCE, config.CONTRACT_ARTIFACT_DIR)
 
         # Check balance before deployment
         balance = self.w3.eth.get_balance(self.account)
@@ -48,41 +191,36 @@ class ContractManager:
                 "For Sepolia testnet, get test ETH from: https://www.alchemy.com/faucets/ethereum-sepolia"
             )
 
-        with open('contracts/MedicalRecord.sol', 'r') as file:
-            contract_source = file.read()
-
-        print("Compiling smart contract...")
-        compiled_sol = compile_source(contract_source, output_values=['abi', 'bin'], solc_version='0.8.0')
-        contract_id, contract_interface = compiled_sol.popitem()
-
-        abi = contract_interface['abi']
-        bytecode = contract_interface['bin']
+        abi = artifact['abi']
+        bytecode = artifact['bytecode']
 
         MedicalRecord = self.w3.eth.contract(abi=abi, bytecode=bytecode)
 
-        nonce = self.w3.eth.get_transaction_count(self.account)
-
         print("Building deployment transaction...")
-        transaction = MedicalRecord.constructor().build_transaction({
-            'from': self.account,
-            'nonce': nonce,
-            'gas': 3000000,
-            'gasPrice': self.w3.eth.gas_price
-        })
+        transaction = MedicalRecord.constructor().build_transaction(self._tx_params(3000000))
 
         print("Signing and sending transaction...")
-        signed_txn = self.w3.eth.account.sign_transaction(transaction, private_key=self.private_key)
-        tx_hash = self.w3.eth.send_raw_transaction(signed_txn.rawTransaction)
+        tx_hash = self._sign_and_send(transaction)
 
         print(f"Transaction hash: {tx_hash.hex()}")
         print("Waiting for confirmation...")
         tx_receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
 
-        self.contract_address = tx_receipt.contractAddress
-        self.contract = self.w3.eth.contract(address=self.contract_address, abi=abi)
+        self.load_contract(tx_receipt.contractAddress, abi)
 
         config.CONTRACT_ADDRESS = self.contract_address
         config.CONTRACT_ABI = abi
+        self.registry.record(config.BLOCKCHAIN_NETWORK, {
+            'address': self.contract_address,
+            'chain_id': self.w3.eth.chain_id,
+            'contract': artifact['contract'],
+            'source_hash': artifact['source_hash'],
+            'solc_version': artifact['solc_version'],
+            'block_number': tx_receipt.blockNumber,
+            'tx_hash': tx_hash.hex(),
+            'deployed_at': int(time.time()),
+            'abi': abi
+        })
 
         print(f"✓ Contract deployed successfully!")
         print(f"  Contract address: {self.contract_address}")
@@ -99,33 +237,198 @@ class ContractManager:
         return self.contract_address, abi
     
     def load_contract(self, address, abi):
+        """Use the contract at address; its web3 object is built on first use"""
         self.contract_address = address
-        self.contract = self.w3.eth.contract(address=address, abi=abi)
+        self.contract_abi = abi
+        self._contract = None
+        self.compact = record_codec.is_compact(abi)
+
+    def record_args(self, patient_id, disease_type, prediction, data_hash, image_hash):
+        """addRecord arguments in the loaded contract's encoding"""
+        if self.compact:
+            return record_codec.encode_record(
+                patient_id, disease_type, prediction, data_hash, image_hash, salt=config.PATIENT_ID_SALT
+            )
+        return (patient_id, disease_type, prediction, data_hash, image_hash)
+
+    def patient_key(self, patient_id):
+        """How patient_id appears in RecordAdded events (hashed for the compact contract)"""
+        if self.compact:
+            return '0x' + record_codec.patient_hash(patient_id, config.PATIENT_ID_SALT).hex()
+        return patient_id
+
+    def record_event(self, args):
+        """RecordAdded event args as recordId/patientId/diseaseType/prediction/timestamp"""
+        if self.compact:
+            return record_codec.decode_event(args)
+        return {
+            'recordId': args['recordId'],
+            'patientId': args['patientId'],
+            'diseaseType': args['diseaseType'],
+            'prediction': args['prediction'],
+            'timestamp': args['timestamp']
+        }
         
     def add_record(self, patient_id, disease_type, prediction, data_hash, image_hash):
-        nonce = self.w3.eth.get_transaction_count(self.account)
+        tx_hash = self.send_record(patient_id, disease_type, prediction, data_hash, image_hash)
+        self._sent_at.pop(tx_hash, None)
+        with metrics.span('receipt_wait'):
+            self.w3.eth.wait_for_transaction_receipt(tx_hash)
         
+        return tx_hash
+
+    def send_record(self, patient_id, disease_type, prediction, data_hash, image_hash):
+        """Sign and broadcast addRecord without waiting for the receipt"""
         transaction = self.contract.functions.addRecord(
-            patient_id,
-            disease_type,
-            prediction,
-            data_hash,
-            image_hash
-        ).build_transaction({
-            'from': self.account,
-            'nonce': nonce,
-            'gas': 500000,
-            'gasPrice': self.w3.eth.gas_price
-        })
+            *self.record_args(patient_id, disease_type, prediction, data_hash, image_hash)
+        ).build_transaction(self._tx_params(500000))
         
-        signed_txn = self.w3.eth.account.sign_transaction(transaction, private_key=self.private_key)
-        tx_hash = self.w3.eth.send_raw_transaction(signed_txn.rawTransaction)
-        tx_receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
+        return self._sign_and_send(transaction).hex()
+
+    def send_batch_root(self, merkle_root, record_count):
+        """Anchor a Merkle root covering record_count records; returns the tx hash"""
+        transaction = self.contract.functions.anchorBatch(
+            merkle_root,
+            record_count
+        ).build_transaction(self._tx_params(150000))
         
-        return tx_hash.hex()
+        return self._sign_and_send(transaction).hex()
+
+    def batch_id_from_receipt(self, receipt):
+        events = self.contract.events.BatchAnchored().process_receipt(receipt)
+        return events[0]['args']['batchId'] if events else None
+
+    def get_batch(self, batch_id):
+        batch = self.contract.functions.getBatch(batch_id).call()
+        return {
+            'merkleRoot': '0x' + batch[0].hex(),
+            'recordCount': batch[1],
+            'timestamp': batch[2],
+            'hospital': batch[3]
+        }
+
+    def verify_record(self, batch_id, record_hash, proof):
+        """Check a Merkle inclusion proof for a record hash against the anchored root on-chain"""
+        return self.contract.functions.verifyRecord(batch_id, record_hash, proof).call()
+
+    def shutdown(self):
+        """Stop background gas price polling (the worker is about to exit)"""
+        if self._gas_prices is not None:
+            self._gas_prices.shutdown()
+
+    def rpc_stats(self):
+        """Per-endpoint health and latency, when using the pooled provider (None until the client is built)"""
+        if self._w3 is None:
+            return None
+        from blockchain.rpc_provider import PooledHTTPProvider
+        provider = self._w3.provider
+        return provider.stats() if isinstance(provider, PooledHTTPProvider) else None
+
+    def _prefetch_tx_state(self):
+        # Fill whichever of chain id, pending nonce and gas price are missing in one batch request
+        calls = []
+        if self._chain_id is None:
+            calls.append(('eth_chainId', []))
+        if self.nonces.next_nonce is None:
+            calls.append(('eth_getTransactionCount', [self.account, 'pending']))
+        if self.gas_prices.stale():
+            calls.append(('eth_gasPrice', []))
+        if len(calls) < 2:
+            return
+        results = dict(zip((method for method, _ in calls), self.w3.provider.batch(calls)))
+        if 'eth_chainId' in results:
+            self._chain_id = int(results['eth_chainId'], 16)
+        if 'eth_getTransactionCount' in results:
+            self.nonces.seed(int(results['eth_getTransactionCount'], 16))
+        if 'eth_gasPrice' in results:
+            self.gas_prices.seed(int(results['eth_gasPrice'], 16))
+
+    def _tx_params(self, gas):
+        # Gas price and chain id come from local caches, so building a transaction
+        # makes no RPC calls in the common case. The nonce is added by _sign_and_send,
+        # only once the transaction has been built
+        from blockchain.rpc_provider import PooledHTTPProvider
+        if isinstance(self.w3.provider, PooledHTTPProvider):
+            try:
+                self._prefetch_tx_state()
+            except Exception as e:
+                # Fall back to the individual calls below
+                print(f"Batched RPC prefetch failed: {e}")
+        if self._chain_id is None:
+            self._chain_id = self.w3.eth.chain_id
+        return {
+            'from': self.account,
+            'gas': gas,
+            'gasPrice': self.gas_prices.get(),
+            'chainId': self._chain_id
+        }
+
+    def _sign_and_send(self, transaction):
+        """Assign the next nonce to a built transaction, sign it and broadcast it.
+
+        The nonce is taken last, after gas estimation and encoding can no
+        longer fail, and any failure from here on resyncs the allocator, so a
+        nonce that never reached the node cannot leave a gap that every later
+        transaction queues behind. With a shared nonce database the nonce stays
+        reserved until the broadcast returns, so other workers wait their turn.
+        """
+        try:
+            with ExitStack() as reservation:
+                with metrics.span('nonce_fetch'):
+                    nonce = reservation.enter_context(self.nonces.reserve())
+                signed_txn = self.w3.eth.account.sign_transaction(
+                    dict(transaction, nonce=nonce), private_key=self.private_key
+                )
+                with metrics.span('tx_send'):
+                    try:
+                        tx_hash = self.w3.eth.send_raw_transaction(signed_txn.rawTransaction)
+                    except Exception as e:
+                        if not self._already_sent(e, signed_txn.hash):
+                            raise
+                        tx_hash = signed_txn.hash
+        except Exception as e:
+            # The nonce may have drifted (e.g. "nonce too low"; the reservation resyncs it),
+            # or the cached gas price may be stale ("underpriced"): re-read both on the next send
+            print(f"Transaction send failed, resyncing nonce and gas price: {e}")
+            self.gas_prices.invalidate()
+            raise
+        self._sent_at[tx_hash.hex()] = time.monotonic()
+        while len(self._sent_at) > 10000:
+            self._sent_at.popitem(last=False)
+        return tx_hash
+
+    def _already_sent(self, error, tx_hash):
+        """True when a failed broadcast in fact reached the node.
+
+        Either the node says it already holds this exact transaction, or the
+        send failed ambiguously (e.g. the connection dropped after the request
+        went out) and the node can find the hash we computed locally.
+        """
+        if any(marker in str(error).lower() for marker in ALREADY_KNOWN):
+            return True
+        try:
+            self.w3.eth.get_transaction(tx_hash)
+        except Exception:
+            return False
+        print(f"Transaction {tx_hash.hex()} reached the node despite: {error}")
+        return True
+
+    def get_receipt(self, tx_hash):
+        """Return the receipt for tx_hash, or None while it is still pending"""
+        from web3.exceptions import TransactionNotFound
+        try:
+            receipt = self.w3.eth.get_transaction_receipt(tx_hash)
+        except TransactionNotFound:
+            return None
+        sent_at = self._sent_at.pop(tx_hash, None)
+        if sent_at is not None:
+            metrics.record_span('receipt_wait', time.monotonic() - sent_at)
+        return receipt
     
     def get_record(self, record_id):
         record = self.contract.functions.getRecord(record_id).call()
+        if self.compact:
+            return record_codec.decode_record(record)
         return {
             'patientId': record[0],
             'diseaseType': record[1],
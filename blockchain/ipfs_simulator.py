@@ -1,26 +1,204 @@
 import hashlib
+import io
 import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from utils import metrics
+
+CHUNK_SIZE = 1024 * 1024
+
+STORE_WRITES = metrics.registry.counter(
+    'medblock_content_store_writes_total',
+    'Content store writes, by whether the content was new or already stored',
+    ('result',)
+)
+
 
 class IPFSSimulator:
-    def __init__(self):
-        self.storage = {}
-    
+    """Disk-backed content-addressed blob store with an IPFS-style API.
+
+    Blobs live under <store_dir>/blobs/<aa>/<bb>/<sha256>, and an SQLite index
+    maps content ids to size, kind and last access time. Identical uploads are
+    stored once, content is hashed while it is copied in fixed-size chunks,
+    and the least recently used blobs are evicted once the store grows past
+    max_bytes. Everything survives a restart.
+    """
+
+    def __init__(self, store_dir='ipfs_store', max_bytes=512 * 1024 * 1024):
+        self.store_dir = store_dir
+        self.blob_dir = os.path.join(store_dir, 'blobs')
+        self.tmp_dir = os.path.join(store_dir, 'tmp')
+        self.max_bytes = max_bytes
+        os.makedirs(self.blob_dir, exist_ok=True)
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self.index_path = os.path.join(store_dir, 'index.db')
+        self._db_conn = self._connect()
+        self._db_pid = os.getpid()
+
+    @property
+    def db(self):
+        # SQLite connections must not cross fork (gunicorn --preload): each process opens its own
+        if self._db_pid != os.getpid():
+            self._db_conn = self._connect()
+            self._db_pid = os.getpid()
+        return self._db_conn
+
+    def _connect(self):
+        db = sqlite3.connect(self.index_path, check_same_thread=False)
+        db.execute('''
+            CREATE TABLE IF NOT EXISTS blobs (
+                hash TEXT PRIMARY KEY,
+                cid TEXT UNIQUE NOT NULL,
+                size INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                last_access REAL NOT NULL
+            )
+        ''')
+        db.execute('CREATE INDEX IF NOT EXISTS idx_blobs_last_access ON blobs (last_access)')
+        db.commit()
+        return db
+
+    def total_bytes(self):
+        """Bytes stored by every process sharing the index"""
+        with self._lock:
+            return self._stored_bytes()
+
+    def _stored_bytes(self):
+        return self.db.execute('SELECT COALESCE(SUM(size), 0) FROM blobs').fetchone()[0]
+
     def add_file(self, file_path):
         with open(file_path, 'rb') as f:
-            file_data = f.read()
-        
-        file_hash = hashlib.sha256(file_data).hexdigest()
-        self.storage[file_hash] = file_path
-        
-        return f"Qm{file_hash[:44]}"
-    
+            return self.add_stream(f)
+
+    def add_stream(self, stream, kind='file'):
+        """Hash and store a binary stream chunk by chunk; returns the content id"""
+        hasher = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        try:
+            with metrics.span('ipfs_hash'):
+                with os.fdopen(fd, 'wb') as tmp:
+                    for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                        hasher.update(chunk)
+                        tmp.write(chunk)
+                        size += len(chunk)
+                return self._commit(hasher.hexdigest(), tmp_path, size, kind)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def add_bytes(self, data, kind='file'):
+        return self._store(hashlib.sha256(data).hexdigest(), io.BytesIO(data), len(data), kind)
+
+    def add_upload(self, upload):
+        """Store an UploadBuffer, reusing the SHA-256 it computed while reading the request"""
+        with metrics.span('ipfs_hash'), upload.open() as source:
+            return self._store(upload.sha256, source, upload.size, 'file')
+
+    def _store(self, file_hash, source, size, kind):
+        # Known content costs one index update and no blob write
+        if self._touch(file_hash):
+            STORE_WRITES.inc(result='deduplicated')
+            return self._cid(file_hash)
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                shutil.copyfileobj(source, tmp, CHUNK_SIZE)
+            return self._commit(file_hash, tmp_path, size, kind)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
     def add_json(self, data):
         json_str = json.dumps(data, sort_keys=True)
-        data_hash = hashlib.sha256(json_str.encode()).hexdigest()
-        self.storage[data_hash] = data
-        
-        return f"Qm{data_hash[:44]}"
-    
+        return self.add_bytes(json_str.encode(), kind='json')
+
     def get_file(self, file_hash):
-        clean_hash = file_hash.replace('Qm', '')
-        return self.storage.get(clean_hash)
\ No newline at end of file
+        """Return the blob path for files, the decoded object for JSON, or None"""
+        clean_hash = file_hash[2:] if file_hash.startswith('Qm') else file_hash
+        with self._lock:
+            row = self.db.execute(
+                'SELECT hash, kind FROM blobs WHERE cid = ? OR hash = ?',
+                (clean_hash[:44], clean_hash)
+            ).fetchone()
+            if row is None:
+                return None
+            self.db.execute('UPDATE blobs SET last_access = ? WHERE hash = ?', (time.time(), row[0]))
+            self.db.commit()
+
+        path = self._blob_path(row[0])
+        if not os.path.exists(path):
+            return None
+        if row[1] == 'json':
+            with open(path, 'r') as f:
+                return json.load(f)
+        return path
+
+    def _cid(self, file_hash):
+        return f"Qm{file_hash[:44]}"
+
+    def _blob_path(self, file_hash):
+        return os.path.join(self.blob_dir, file_hash[:2], file_hash[2:4], file_hash)
+
+    def _touch(self, file_hash):
+        with self._lock:
+            updated = self.db.execute(
+                'UPDATE blobs SET last_access = ? WHERE hash = ?',
+                (time.time(), file_hash)
+            ).rowcount
+            self.db.commit()
+        return updated > 0
+
+    def _commit(self, file_hash, tmp_path, size, kind):
+        with self._lock:
+            now = time.time()
+            try:
+                # Another worker may store the same content between our _touch and here:
+                # the insert (which also takes the write lock) decides who keeps the blob
+                stored = self.db.execute(
+                    'INSERT OR IGNORE INTO blobs (hash, cid, size, kind, last_access) VALUES (?, ?, ?, ?, ?)',
+                    (file_hash, file_hash[:44], size, kind, now)
+                ).rowcount
+                if stored:
+                    path = self._blob_path(file_hash)
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    os.replace(tmp_path, path)
+                    self._evict(keep=file_hash)
+                else:
+                    self.db.execute('UPDATE blobs SET last_access = ? WHERE hash = ?', (now, file_hash))
+                self.db.commit()
+            except Exception:
+                self.db.rollback()
+                raise
+        STORE_WRITES.inc(result='stored' if stored else 'deduplicated')
+
+        return self._cid(file_hash)
+
+    def _evict(self, keep):
+        """Drop least recently used blobs until the store fits in max_bytes"""
+        if self.max_bytes is None:
+            return
+        # Sized from the shared index, so blobs added by other workers count too
+        total_bytes = self._stored_bytes()
+        while total_bytes > self.max_bytes:
+            rows = self.db.execute(
+                'SELECT hash, size FROM blobs WHERE hash != ? ORDER BY last_access LIMIT 64',
+                (keep,)
+            ).fetchall()
+            if not rows:
+                break
+            for file_hash, size in rows:
+                if total_bytes <= self.max_bytes:
+                    break
+                try:
+                    os.remove(self._blob_path(file_hash))
+                except FileNotFoundError:
+                    pass
+                self.db.execute('DELETE FROM blobs WHERE hash = ?', (file_hash,))
+                total_bytes -= size
@@ -0,0 +1,355 @@
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from eth_hash.auto import keccak
+from blockchain.ticket_store import TicketStore
+
+# Leaves and internal nodes are hashed in separate domains, so an internal
+# node can never be presented as a leaf (second preimage)
+LEAF_PREFIX = b'\x00'
+NODE_PREFIX = b'\x01'
+
+
+def record_hash(patient_id, disease_type, prediction, data_hash, image_hash):
+    """keccak256 of the canonical JSON encoding of a record (the value passed to verifyRecord)"""
+    payload = json.dumps({
+        'patientId': patient_id,
+        'diseaseType': disease_type,
+        'prediction': prediction,
+        'dataHash': data_hash,
+        'imageHash': image_hash
+    }, sort_keys=True, separators=(',', ':'))
+    return keccak(payload.encode('utf-8'))
+
+
+def leaf_hash(record):
+    """Tree leaf for a record hash: keccak256(0x00 || record hash)"""
+    return keccak(LEAF_PREFIX + record)
+
+
+def _hash_pair(a, b):
+    return keccak(NODE_PREFIX + a + b) if a <= b else keccak(NODE_PREFIX + b + a)
+
+
+def build_tree(leaves):
+    """Return every level of the Merkle tree, leaves first and root last.
+
+    Pairs are hashed in sorted order under the 0x01 node prefix (as in
+    MedicalRecord.verifyRecord), and an unpaired node at the end of a level
+    is carried up unchanged.
+    """
+    if not leaves:
+        raise ValueError("Cannot build a Merkle tree with no leaves")
+    levels = [list(leaves)]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        parents = [_hash_pair(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2 == 1:
+            parents.append(level[-1])
+        levels.append(parents)
+    return levels
+
+
+def merkle_proof(levels, index):
+    """Sibling hashes from leaf index up to the root"""
+    proof = []
+    for level in levels[:-1]:
+        sibling = index ^ 1
+        if sibling < len(level):
+            proof.append(level[sibling])
+        index //= 2
+    return proof
+
+
+def verify_proof(record, proof, root):
+    """Off-chain twin of verifyRecord: record is the record hash, not the leaf"""
+    computed = leaf_hash(record)
+    for sibling in proof:
+        computed = _hash_pair(computed, sibling)
+    return computed == root
+
+
+class MerkleTicketStore(TicketStore):
+    """TicketStore plus a table of every record's Merkle proof.
+
+    Proofs are kept when old tickets are trimmed: verifyRecord needs them for
+    as long as the anchored batch matters, and they can be looked up again
+    by record hash.
+    """
+
+    PROOF_FIELDS = ('record_hash', 'leaf', 'merkle_root', 'proof', 'batch_size', 'batch_id')
+
+    def _connect(self):
+        db = super()._connect()
+        db.execute('''
+            CREATE TABLE IF NOT EXISTS proofs (
+                ticket TEXT PRIMARY KEY,
+                record_hash TEXT NOT NULL,
+                leaf TEXT NOT NULL,
+                merkle_root TEXT,
+                proof TEXT,
+                leaf_index INTEGER,
+                batch_size INTEGER,
+                tx_hash TEXT,
+                batch_id INTEGER
+            )
+        ''')
+        db.execute('CREATE INDEX IF NOT EXISTS idx_proofs_record_hash ON proofs (record_hash)')
+        db.commit()
+        return db
+
+    def add_leaf(self, ticket, record, leaf):
+        with self._lock:
+            self.db.execute(
+                'INSERT OR REPLACE INTO proofs (ticket, record_hash, leaf) VALUES (?, ?, ?)',
+                (ticket, '0x' + record.hex(), '0x' + leaf.hex())
+            )
+            self.db.commit()
+
+    def save_batch(self, root, proofs):
+        """Store the root and each ticket's proof before the root is sent: [(ticket, proof)] in leaf order"""
+        with self._lock:
+            self.db.executemany(
+                '''UPDATE proofs SET merkle_root = ?, proof = ?, leaf_index = ?, batch_size = ?,
+                   tx_hash = NULL, batch_id = NULL WHERE ticket = ?''',
+                [
+                    ('0x' + root.hex(), json.dumps(['0x' + node.hex() for node in proof]), index, len(proofs), ticket)
+                    for index, (ticket, proof) in enumerate(proofs)
+                ]
+            )
+            self.db.commit()
+
+    def set_batch(self, tickets, **fields):
+        assignments = ', '.join(f'{name} = ?' for name in fields)
+        with self._lock:
+            self.db.executemany(
+                f'UPDATE proofs SET {assignments} WHERE ticket = ?',
+                [(*fields.values(), ticket) for ticket in tickets]
+            )
+            self.db.commit()
+
+    def get_proof(self, ticket):
+        with self._lock:
+            row = self.db.execute(
+                f'SELECT {", ".join(self.PROOF_FIELDS)} FROM proofs WHERE ticket = ?', (ticket,)
+            ).fetchone()
+        return self._proof_row(row) if row else None
+
+    def find_proof(self, record):
+        """Latest anchored proof for a record hash (0x hex), or None"""
+        with self._lock:
+            row = self.db.execute(
+                f'''SELECT {", ".join(self.PROOF_FIELDS)}, tx_hash FROM proofs
+                    WHERE record_hash = ? AND batch_id IS NOT NULL ORDER BY batch_id DESC LIMIT 1''',
+                (record.lower(),)
+            ).fetchone()
+        if row is None:
+            return None
+        proof = self._proof_row(row[:-1])
+        proof['tx_hash'] = row[-1]
+        return proof
+
+    def _proof_row(self, row):
+        proof = dict(zip(self.PROOF_FIELDS, row))
+        proof['proof'] = json.loads(proof['proof']) if proof['proof'] else None
+        return proof
+
+
+class MerkleBatcher:
+    """Anchors prediction records on-chain as Merkle roots instead of one tx each.
+
+    Exposes the same submit()/status()/start()/shutdown() interface as
+    RecordSubmitter. Records are buffered until max_batch_size leaves are
+    pending or max_wait seconds have passed since the oldest one; the batch
+    root is then sent through MedicalRecord.anchorBatch. Tickets, proofs and
+    batch ids live in a MerkleTicketStore, so proofs stay available after the
+    worker that built them is gone, and buffered records are adopted by
+    another worker if this one dies before anchoring them.
+    """
+
+    def __init__(self, contract_manager, store, max_batch_size=256, max_wait=30.0, poll_interval=2.0, max_tickets=10000):
+        self.contract_manager = contract_manager
+        self.store = store
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max_wait
+        self.poll_interval = poll_interval
+        self.max_tickets = max_tickets
+        self.buffer = []
+        self.buffer_started = None
+        self.awaiting_receipt = OrderedDict()
+        self._submitted = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+        self._pid = None
+        self._worker = None
+
+    def start(self):
+        """Start the batching thread in this worker and resume orphaned tickets (call per worker, after fork)"""
+        self._ensure_started()
+
+    def submit(self, patient_id, disease_type, prediction, data_hash, image_hash):
+        self._ensure_started()
+        ticket = uuid.uuid4().hex
+        record = (patient_id, disease_type, prediction, data_hash, image_hash)
+        self.store.create(ticket, record)
+        self._buffer(ticket, record)
+        self._submitted += 1
+        if self._submitted % 100 == 0:
+            self.store.trim(self.max_tickets)
+        return ticket
+
+    def status(self, ticket):
+        entry = self.store.get(ticket)
+        if entry is not None:
+            entry.update(self.store.get_proof(ticket) or {})
+        return entry
+
+    def proof(self, record):
+        """Anchored proof for a record hash (0x hex): merkle_root, proof, batch_id, tx_hash"""
+        return self.store.find_proof(record)
+
+    def pending_count(self):
+        with self._lock:
+            return len(self.buffer) + sum(len(tickets) for tickets in self.awaiting_receipt.values())
+
+    def flush(self):
+        """Anchor whatever is buffered right now"""
+        with self._lock:
+            batch = self.buffer
+            self.buffer = []
+            self.buffer_started = None
+        if batch:
+            self._anchor(batch)
+
+    def shutdown(self, wait=True, timeout=None):
+        """Stop after anchoring whatever is still buffered.
+
+        Batches still waiting for a receipt are released, so another worker
+        adopts and confirms them.
+        """
+        if self._pid != os.getpid():
+            return
+        self._stop.set()
+        self._wake.set()
+        if wait:
+            self._worker.join(timeout)
+        if not self._worker.is_alive():
+            self.store.release()
+
+    def _ensure_started(self):
+        # Started lazily so a gunicorn --preload master never owns the thread
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid != os.getpid():
+                self.store.heartbeat()
+                self._adopt()
+                self._worker = threading.Thread(target=self._run, name="merkle-batcher", daemon=True)
+                self._worker.start()
+                self._pid = os.getpid()
+
+    def _buffer(self, ticket, record):
+        record = record_hash(*record)
+        leaf = leaf_hash(record)
+        self.store.add_leaf(ticket, record, leaf)
+        with self._lock:
+            if not self.buffer:
+                self.buffer_started = time.monotonic()
+            self.buffer.append((ticket, leaf))
+            if len(self.buffer) >= self.max_batch_size:
+                self._wake.set()
+
+    def _adopt(self):
+        adopted = self.store.adopt()
+        for ticket, status, record, tx_hash in adopted:
+            if status == 'queued':
+                self._buffer(ticket, record)
+            else:
+                with self._lock:
+                    self.awaiting_receipt.setdefault(tx_hash, []).append(ticket)
+        if adopted:
+            print(f"Resuming {len(adopted)} Merkle batch tickets left by another worker")
+
+    def _update_many(self, tickets, **fields):
+        try:
+            self.store.update(tickets, **fields)
+        except Exception as e:
+            print(f"Could not update {len(tickets)} Merkle batch tickets: {e}")
+
+    def _anchor(self, batch):
+        tickets = [ticket for ticket, _ in batch]
+        levels = build_tree([leaf for _, leaf in batch])
+        root = levels[-1][0]
+
+        try:
+            # Proofs are stored before the root is sent, so an anchored batch always has them
+            self.store.save_batch(root, [(ticket, merkle_proof(levels, index)) for index, ticket in enumerate(tickets)])
+            tx_hash = self.contract_manager.send_batch_root(root, len(tickets))
+        except Exception as e:
+            print(f"Merkle batch anchoring failed ({len(tickets)} records): {e}")
+            self._update_many(tickets, status='failed', error=str(e))
+            return
+
+        self._update_many(tickets, status='submitted', tx_hash=tx_hash)
+        self.store.set_batch(tickets, tx_hash=tx_hash)
+        with self._lock:
+            self.awaiting_receipt[tx_hash] = tickets
+
+    def _check_receipts(self):
+        with self._lock:
+            pending = list(self.awaiting_receipt.items())
+
+        for tx_hash, tickets in pending:
+            try:
+                receipt = self.contract_manager.get_receipt(tx_hash)
+            except Exception as e:
+                print(f"Receipt lookup failed for {tx_hash}: {e}")
+                continue
+            if receipt is None:
+                continue
+
+            with self._lock:
+                self.awaiting_receipt.pop(tx_hash, None)
+            if receipt.status == 1:
+                batch_id = self.contract_manager.batch_id_from_receipt(receipt)
+                self.store.set_batch(tickets, tx_hash=tx_hash, batch_id=batch_id)
+                self._update_many(
+                    tickets,
+                    status='confirmed',
+                    block_number=receipt.blockNumber,
+                    gas_used=receipt.gasUsed
+                )
+            else:
+                self._update_many(
+                    tickets,
+                    status='failed',
+                    block_number=receipt.blockNumber,
+                    gas_used=receipt.gasUsed,
+                    error='Transaction reverted'
+                )
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            try:
+                self.store.heartbeat()
+                self._adopt()
+            except Exception as e:
+                print(f"Record ticket store unavailable: {e}")
+
+            with self._lock:
+                due = bool(self.buffer) and (
+                    len(self.buffer) >= self.max_batch_size
+                    or time.monotonic() - self.buffer_started >= self.max_wait
+                )
+            if due:
+                self.flush()
+            self._check_receipts()
+
+        self.flush()
@@ -0,0 +1,197 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+
+class NonceManager:
+    """Hands out transaction nonces for one account without an RPC per send.
+
+    The counter is seeded from the chain's pending transaction count on
+    first use and then incremented locally under a lock, so several threads
+    can sign transactions concurrently without colliding. Call resync()
+    after a failed send to re-read the count from the chain.
+
+    A local counter is only correct inside one process. With db_path, the
+    counter lives in a SQLite row shared by every worker instead, and
+    reserve() keeps that database write-locked from allocation until the
+    transaction has been sent: workers take turns sending, and never hand
+    out the same nonce.
+    """
+
+    def __init__(self, w3, account, db_path=None, busy_timeout=60.0):
+        self.w3 = w3
+        self.account = account
+        self.db_path = db_path
+        self.busy_timeout = busy_timeout
+        self._next_nonce = None
+        self._lock = threading.Lock()
+        self._db_conn = None
+        self._db_pid = None
+
+    @property
+    def db(self):
+        # SQLite connections must not cross fork (gunicorn --preload): each process opens its own
+        if self._db_pid != os.getpid():
+            self._db_conn = self._connect()
+            self._db_pid = os.getpid()
+        return self._db_conn
+
+    def _connect(self):
+        # Transactions are managed by hand (BEGIN IMMEDIATE in reserve)
+        db = sqlite3.connect(self.db_path, check_same_thread=False, timeout=self.busy_timeout, isolation_level=None)
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('CREATE TABLE IF NOT EXISTS nonces (account TEXT PRIMARY KEY, next_nonce INTEGER NOT NULL)')
+        return db
+
+    @property
+    def next_nonce(self):
+        """The nonce the next allocation will use, or None until seeded"""
+        if self.db_path is None:
+            return self._next_nonce
+        with self._lock:
+            row = self.db.execute('SELECT next_nonce FROM nonces WHERE account = ?', (self.account,)).fetchone()
+        return row[0] if row else None
+
+    def allocate(self):
+        """Take the next nonce from the in-process counter (see reserve() for shared counters)"""
+        with self._lock:
+            if self._next_nonce is None:
+                self._next_nonce = self.w3.eth.get_transaction_count(self.account, 'pending')
+            nonce = self._next_nonce
+            self._next_nonce += 1
+            return nonce
+
+    @contextmanager
+    def reserve(self):
+        """Yield the nonce for one send; the counter is resynced if the block raises.
+
+        With db_path, no other thread or process can allocate until the block
+        exits, so the transaction should be sent inside it.
+        """
+        if self.db_path is None:
+            nonce = self.allocate()
+            try:
+                yield nonce
+            except Exception:
+                self.resync()
+                raise
+            return
+
+        with self._lock:
+            db = self.db
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                row = db.execute('SELECT next_nonce FROM nonces WHERE account = ?', (self.account,)).fetchone()
+                nonce = row[0] if row else self.w3.eth.get_transaction_count(self.account, 'pending')
+                try:
+                    yield nonce
+                except Exception:
+                    db.execute('DELETE FROM nonces WHERE account = ?', (self.account,))
+                    raise
+                db.execute(
+                    'INSERT OR REPLACE INTO nonces (account, next_nonce) VALUES (?, ?)',
+                    (self.account, nonce + 1)
+                )
+            finally:
+                db.execute('COMMIT')
+
+    def seed(self, nonce):
+        """Use a pending transaction count fetched elsewhere (e.g. in a batch request), unless already seeded"""
+        with self._lock:
+            if self.db_path is None:
+                if self._next_nonce is None:
+                    self._next_nonce = nonce
+            else:
+                self.db.execute('INSERT OR IGNORE INTO nonces (account, next_nonce) VALUES (?, ?)', (self.account, nonce))
+
+    def resync(self):
+        """Drop the counter; the next allocation re-seeds it from the chain"""
+        with self._lock:
+            if self.db_path is None:
+                self._next_nonce = None
+            else:
+                self.db.execute('DELETE FROM nonces WHERE account = ?', (self.account,))
+
+
+class GasPriceCache:
+    """Caches eth_gasPrice for ttl seconds and refreshes it in the background.
+
+    The first get() fetches synchronously and starts a daemon thread that
+    refreshes the price every ttl / 2 seconds, so the send path normally
+    reads a warm value. The thread is started lazily in the process that
+    sends (never in a gunicorn --preload master), stops once the price has
+    not been read for idle_after seconds (the next get() restarts it), and
+    stops for good on shutdown().
+    """
+
+    def __init__(self, w3, ttl=30.0, idle_after=None):
+        self.w3 = w3
+        self.ttl = ttl
+        self.idle_after = idle_after if idle_after is not None else ttl * 10
+        self.gas_price = None
+        self.fetched_at = 0.0
+        self.used_at = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._refresher = None
+        self._refresher_pid = None
+
+    def get(self):
+        with self._lock:
+            self.used_at = time.monotonic()
+            if self.gas_price is not None and time.monotonic() - self.fetched_at < self.ttl:
+                price = self.gas_price
+            else:
+                price = None
+        if price is None:
+            price = self.refresh()
+        self._start_refresher()
+        return price
+
+    def refresh(self):
+        price = self.w3.eth.gas_price
+        with self._lock:
+            self.gas_price = price
+            self.fetched_at = time.monotonic()
+        return price
+
+    def stale(self):
+        with self._lock:
+            return self.gas_price is None or time.monotonic() - self.fetched_at >= self.ttl
+
+    def seed(self, price):
+        """Store a gas price fetched elsewhere (e.g. in a batch request)"""
+        with self._lock:
+            self.gas_price = price
+            self.fetched_at = time.monotonic()
+
+    def invalidate(self):
+        with self._lock:
+            self.gas_price = None
+
+    def shutdown(self):
+        self._stop.set()
+
+    def _start_refresher(self):
+        if self._stop.is_set():
+            return
+        if self._refresher_pid == os.getpid() and self._refresher.is_alive():
+            return
+        with self._lock:
+            # Threads do not survive fork: a refresher started before it is gone in the child
+            if self._refresher_pid != os.getpid() or not self._refresher.is_alive():
+                self._refresher = threading.Thread(target=self._refresh_loop, name="gas-price-refresh", daemon=True)
+                self._refresher.start()
+                self._refresher_pid = os.getpid()
+
+    def _refresh_loop(self):
+        while not self._stop.wait(max(self.ttl / 2, 1.0)):
+            if time.monotonic() - self.used_at > self.idle_after:
+                # Nobody is sending: stop polling the node until the next get()
+                return
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Gas price refresh failed: {e}")
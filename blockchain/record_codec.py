@@ -0,0 +1,83 @@
+import re
+from eth_hash.auto import keccak
+
+# Enum codes used by MedicalRecordV2 (0 is Unknown in both enums)
+DISEASE_CODES = {'Diabetes': 1, 'Heart Disease': 2}
+PREDICTION_CODES = {'Negative': 1, 'Positive': 2}
+DISEASE_NAMES = {code: name for name, code in DISEASE_CODES.items()}
+PREDICTION_NAMES = {code: name for name, code in PREDICTION_CODES.items()}
+
+HEX_DIGEST = re.compile(r'^(0x)?[0-9a-fA-F]{64}$')
+CONTENT_ID = re.compile(r'^Qm([0-9a-f]{1,64})$')
+
+
+def is_compact(abi):
+    """True for the MedicalRecordV2 ABI (addRecord takes bytes32 hashes and enum codes)"""
+    for entry in abi:
+        if entry.get('type') == 'function' and entry.get('name') == 'addRecord':
+            return entry['inputs'][0]['type'] == 'bytes32'
+    return False
+
+
+def patient_hash(patient_id, salt=''):
+    """keccak256 of the salted patient id; without a salt, ids are pseudonymous, not anonymous"""
+    return keccak(f'{salt}{patient_id}'.encode('utf-8'))
+
+
+def to_bytes32(value):
+    """Pack a hash as bytes32.
+
+    Hex SHA-256 digests are stored as their 32 raw bytes. Content store ids
+    ("Qm" + hex digest prefix) keep their hex bytes, zero padded, so
+    from_image_hash() gives the same id back. Anything else is keccak256 hashed.
+    """
+    if HEX_DIGEST.match(value):
+        return bytes.fromhex(value[-64:])
+    match = CONTENT_ID.match(value)
+    if match and len(match.group(1)) % 2 == 0:
+        return bytes.fromhex(match.group(1)).ljust(32, b'\0')
+    return keccak(value.encode('utf-8'))
+
+
+def from_image_hash(value, cid_length=44):
+    return f"Qm{bytes(value).hex()[:cid_length]}"
+
+
+def encode_record(patient_id, disease_type, prediction, data_hash, image_hash, salt=''):
+    """MedicalRecordV2.addRecord arguments for a record as the app produces it"""
+    if disease_type not in DISEASE_CODES:
+        raise ValueError(f"Unknown disease type: {disease_type}")
+    if prediction not in PREDICTION_CODES:
+        raise ValueError(f"Unknown prediction: {prediction}")
+    return (
+        patient_hash(patient_id, salt),
+        DISEASE_CODES[disease_type],
+        PREDICTION_CODES[prediction],
+        to_bytes32(data_hash),
+        to_bytes32(image_hash)
+    )
+
+
+def decode_record(record):
+    """getRecord() output from MedicalRecordV2, in the same shape as the v1 record dict"""
+    patient, disease, prediction, data_hash, image_hash, timestamp, hospital = record
+    return {
+        'patientId': '0x' + bytes(patient).hex(),
+        'diseaseType': DISEASE_NAMES.get(disease, 'Unknown'),
+        'prediction': PREDICTION_NAMES.get(prediction, 'Unknown'),
+        'dataHash': bytes(data_hash).hex(),
+        'imageHash': from_image_hash(image_hash),
+        'timestamp': timestamp,
+        'hospital': hospital
+    }
+
+
+def decode_event(args):
+    """RecordAdded args from MedicalRecordV2, with the v1 field names"""
+    return {
+        'recordId': args['recordId'],
+        'patientId': '0x' + bytes(args['patientHash']).hex(),
+        'diseaseType': DISEASE_NAMES.get(args['disease'], 'Unknown'),
+        'prediction': PREDICTION_NAMES.get(args['prediction'], 'Unknown'),
+        'timestamp': args['timestamp']
+    }
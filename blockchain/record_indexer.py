@@ -0,0 +1,254 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+
+class RecordIndexer:
+    """Local SQLite index of the contract's RecordAdded events.
+
+    A background thread tails the chain with eth_getLogs in block ranges of
+    chunk_size, resuming from the last indexed block stored in the index
+    itself, so a restart only fetches what it missed. On first run it finds
+    the contract's deployment block by binary search on eth_getCode instead
+    of scanning from genesis. Queries (by patient, disease and time, newest
+    first) are local index lookups with keyset pagination.
+
+    Every worker queries the same index file, but only one tails the chain:
+    the one holding the index's lease, renewed on every poll. Another worker
+    takes over once the holder has not renewed it for lease seconds. RPC
+    calls are made without holding the index lock, so queries never wait
+    on the node.
+    """
+
+    def __init__(self, contract_manager, db_path='record_index.db', poll_interval=5.0, chunk_size=2000, confirmations=0, lease=30.0):
+        self.contract_manager = contract_manager
+        self.db_path = db_path
+        self.poll_interval = poll_interval
+        self.chunk_size = chunk_size
+        self.confirmations = confirmations
+        self.lease = lease
+        self.last_error = None
+        self.tailing = False
+        self._lock = threading.Lock()
+        self._db_conn = None
+        self._db_pid = None
+        self._owner = None
+        self._thread_pid = None
+
+    @property
+    def db(self):
+        # SQLite connections must not cross fork (gunicorn --preload): each process opens its own
+        if self._db_pid != os.getpid():
+            self._db_conn = self._connect()
+            self._db_pid = os.getpid()
+            self._owner = f'{os.getpid()}-{uuid.uuid4().hex[:12]}'
+        return self._db_conn
+
+    def _connect(self):
+        db = sqlite3.connect(self.db_path, check_same_thread=False, timeout=10)
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('''
+            CREATE TABLE IF NOT EXISTS records (
+                record_id INTEGER PRIMARY KEY,
+                patient_id TEXT NOT NULL,
+                disease_type TEXT NOT NULL,
+                prediction TEXT NOT NULL,
+                timestamp INTEGER NOT NULL,
+                block_number INTEGER NOT NULL,
+                tx_hash TEXT NOT NULL,
+                log_index INTEGER NOT NULL
+            )
+        ''')
+        db.execute('CREATE INDEX IF NOT EXISTS idx_records_patient ON records (patient_id, timestamp DESC, record_id DESC)')
+        db.execute('CREATE INDEX IF NOT EXISTS idx_records_disease ON records (disease_type, timestamp DESC, record_id DESC)')
+        db.execute('CREATE INDEX IF NOT EXISTS idx_records_time ON records (timestamp DESC, record_id DESC)')
+        db.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+        db.execute('CREATE TABLE IF NOT EXISTS lease (id INTEGER PRIMARY KEY CHECK (id = 0), owner TEXT NOT NULL, heartbeat REAL NOT NULL)')
+        db.commit()
+        return db
+
+    def start(self):
+        """Start tailing in the background (call per worker, after fork)"""
+        if self._thread_pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread_pid != os.getpid():
+                self._thread_pid = os.getpid()
+                threading.Thread(target=self._run, name='record-indexer', daemon=True).start()
+
+    def poll(self):
+        """Renew or take the tailing lease and sync if this worker holds it; returns the number indexed"""
+        self.tailing = self._hold_lease()
+        return self.sync() if self.tailing else 0
+
+    def sync(self):
+        """Index every RecordAdded event up to the current safe head; returns the number indexed"""
+        contract = self.contract_manager.contract
+        if contract is None:
+            return 0
+
+        w3 = self.contract_manager.w3
+        with self._lock:
+            indexed_address = self._meta('contract_address')
+        if indexed_address != contract.address:
+            # New deployment: the old index describes a different contract
+            start_block = self._deployment_block(w3, contract.address)
+            with self._lock:
+                self.db.execute('DELETE FROM records')
+                self.db.execute('DELETE FROM meta')
+                self._set_meta('contract_address', contract.address)
+                self._set_meta('last_block', start_block - 1)
+                self.db.commit()
+        with self._lock:
+            last_block = int(self._meta('last_block'))
+
+        head = w3.eth.block_number - self.confirmations
+        indexed = 0
+        event = contract.events.RecordAdded()
+        while last_block < head:
+            to_block = min(last_block + self.chunk_size, head)
+            logs = event.get_logs(fromBlock=last_block + 1, toBlock=to_block)
+            rows = []
+            for log in logs:
+                # Decoded to the same fields for MedicalRecord and MedicalRecordV2 (hashed patient ids)
+                record = self.contract_manager.record_event(log['args'])
+                rows.append((
+                    record['recordId'],
+                    record['patientId'],
+                    record['diseaseType'],
+                    record['prediction'],
+                    record['timestamp'],
+                    log['blockNumber'],
+                    log['transactionHash'].hex(),
+                    log['logIndex']
+                ))
+            with self._lock:
+                self.db.executemany('INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+                self._set_meta('last_block', to_block)
+                self.db.commit()
+            indexed += len(rows)
+            last_block = to_block
+        return indexed
+
+    def query(self, patient_id=None, disease_type=None, since=None, until=None, limit=50, cursor=None):
+        """Newest-first page of records; pass the returned next_cursor to get the following page"""
+        clauses, params = [], []
+        if patient_id is not None:
+            clauses.append('patient_id = ?')
+            params.append(self.contract_manager.patient_key(patient_id))
+        if disease_type is not None:
+            clauses.append('disease_type = ?')
+            params.append(disease_type)
+        if since is not None:
+            clauses.append('timestamp >= ?')
+            params.append(int(since))
+        if until is not None:
+            clauses.append('timestamp <= ?')
+            params.append(int(until))
+        if cursor:
+            timestamp, record_id = (int(part) for part in cursor.split(':', 1))
+            clauses.append('(timestamp < ? OR (timestamp = ? AND record_id < ?))')
+            params.extend([timestamp, timestamp, record_id])
+
+        sql = 'SELECT * FROM records'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += ' ORDER BY timestamp DESC, record_id DESC LIMIT ?'
+        params.append(limit + 1)
+
+        with self._lock:
+            rows = self.db.execute(sql, params).fetchall()
+        records = [self._row_to_record(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            next_cursor = f"{records[-1]['timestamp']}:{records[-1]['recordId']}"
+        return {'records': records, 'next_cursor': next_cursor}
+
+    def get(self, record_id):
+        with self._lock:
+            row = self.db.execute('SELECT * FROM records WHERE record_id = ?', (record_id,)).fetchone()
+        return self._row_to_record(row) if row else None
+
+    def stats(self):
+        with self._lock:
+            count = self.db.execute('SELECT COUNT(*) FROM records').fetchone()[0]
+            last_block = self._meta('last_block')
+        return {
+            'records': count,
+            'last_block': int(last_block) if last_block is not None else None,
+            'tailing': self.tailing,
+            'last_error': self.last_error
+        }
+
+    def _run(self):
+        while True:
+            try:
+                self.poll()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Record indexing failed: {e}")
+            time.sleep(self.poll_interval)
+
+    def _deployment_block(self, w3, address):
+        """Lowest block at which the contract has code (binary search, O(log head) calls)"""
+        low, high = 0, w3.eth.block_number
+        try:
+            if not w3.eth.get_code(address, high):
+                return high
+            while low < high:
+                middle = (low + high) // 2
+                if w3.eth.get_code(address, middle):
+                    high = middle
+                else:
+                    low = middle + 1
+        except Exception as e:
+            # Historical state needs an archive node; without one only index from now on
+            print(f"Cannot locate deployment block ({e}), indexing from block {high}")
+            return high
+        return low
+
+    def release(self):
+        """Give up tailing now (the worker is exiting) instead of waiting out the lease"""
+        with self._lock:
+            self.db.execute('DELETE FROM lease WHERE owner = ?', (self._owner,))
+            self.db.commit()
+        self.tailing = False
+
+    def _hold_lease(self):
+        now = time.time()
+        with self._lock:
+            db = self.db
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                row = db.execute('SELECT owner, heartbeat FROM lease WHERE id = 0').fetchone()
+                held = row is None or row[0] == self._owner or row[1] < now - self.lease
+                if held:
+                    db.execute('INSERT OR REPLACE INTO lease (id, owner, heartbeat) VALUES (0, ?, ?)', (self._owner, now))
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+        return held
+
+    def _meta(self, key):
+        row = self.db.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        self.db.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, str(value)))
+
+    @staticmethod
+    def _row_to_record(row):
+        return {
+            'recordId': row[0],
+            'patientId': row[1],
+            'diseaseType': row[2],
+            'prediction': row[3],
+            'timestamp': row[4],
+            'blockNumber': row[5],
+            'txHash': row[6],
+            'logIndex': row[7]
+        }
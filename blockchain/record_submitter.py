@@ -0,0 +1,160 @@
+import os
+import queue
+import threading
+import uuid
+
+
+class RecordSubmitter:
+    """Background pipeline for writing prediction records to the chain.
+
+    submit() hands back a ticket immediately. A sender thread signs and
+    broadcasts the addRecord transactions in order, and a confirmation
+    thread polls for receipts, so request handlers never wait on block time.
+    Ticket states: queued -> submitted -> confirmed | failed.
+
+    Tickets are kept in a TicketStore shared by all workers, so status()
+    answers for tickets queued by any worker, and a record outlives the
+    worker that accepted it: shutdown() sends everything still queued
+    (gunicorn worker_exit), and start() adopts the unfinished tickets of
+    workers that exited or died.
+    """
+
+    def __init__(self, contract_manager, store, poll_interval=2.0, max_tickets=10000):
+        self.contract_manager = contract_manager
+        self.store = store
+        self.poll_interval = poll_interval
+        self.max_tickets = max_tickets
+        self.jobs = queue.Queue()
+        self.awaiting_receipt = {}
+        self._submitted = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+        self._pid = None
+        self._sender = None
+        self._confirmer = None
+
+    def start(self):
+        """Start the threads in this worker and resume orphaned tickets (call per worker, after fork)"""
+        self._ensure_started()
+
+    def submit(self, patient_id, disease_type, prediction, data_hash, image_hash):
+        """Queue a record for the chain and return its ticket id"""
+        self._ensure_started()
+        ticket = uuid.uuid4().hex
+        record = (patient_id, disease_type, prediction, data_hash, image_hash)
+        self.store.create(ticket, record)
+        self._submitted += 1
+        if self._submitted % 100 == 0:
+            self.store.trim(self.max_tickets)
+        self.jobs.put((ticket, record))
+        return ticket
+
+    def status(self, ticket):
+        return self.store.get(ticket)
+
+    def pending_count(self):
+        return self.jobs.qsize() + len(self.awaiting_receipt)
+
+    def shutdown(self, wait=True, timeout=None):
+        """Stop once every queued record has been sent.
+
+        Tickets still waiting for a receipt are released, so another worker
+        adopts and confirms them without waiting for this one's lease to run out.
+        """
+        if self._pid != os.getpid():
+            return
+        self._stop.set()
+        self.jobs.put(None)
+        if wait:
+            self._sender.join(timeout)
+            self._confirmer.join(timeout)
+        if not self._sender.is_alive():
+            self.store.release()
+
+    def _ensure_started(self):
+        # Threads do not survive fork, and gunicorn --preload builds this object in
+        # the master: start them lazily in the worker that actually submits
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid != os.getpid():
+                self.store.heartbeat()
+                self._adopt()
+                self._sender = threading.Thread(target=self._send_loop, name="record-sender", daemon=True)
+                self._confirmer = threading.Thread(target=self._confirm_loop, name="record-confirmer", daemon=True)
+                self._sender.start()
+                self._confirmer.start()
+                self._pid = os.getpid()
+
+    def _adopt(self):
+        adopted = self.store.adopt()
+        for ticket, status, record, tx_hash in adopted:
+            if status == 'queued':
+                self.jobs.put((ticket, record))
+            else:
+                with self._lock:
+                    self.awaiting_receipt[ticket] = tx_hash
+        if adopted:
+            print(f"Resuming {len(adopted)} record tickets left by another worker")
+
+    def _update(self, ticket, **fields):
+        try:
+            self.store.update(ticket, **fields)
+        except Exception as e:
+            print(f"Could not update record ticket {ticket}: {e}")
+
+    def _send_loop(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            ticket, record = job
+            try:
+                tx_hash = self.contract_manager.send_record(*record)
+            except Exception as e:
+                print(f"Record submission failed for ticket {ticket}: {e}")
+                self._update(ticket, status='failed', error=str(e))
+                continue
+
+            self._update(ticket, status='submitted', tx_hash=tx_hash)
+            with self._lock:
+                self.awaiting_receipt[ticket] = tx_hash
+
+    def _confirm_loop(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.store.heartbeat()
+                self._adopt()
+            except Exception as e:
+                print(f"Record ticket store unavailable: {e}")
+
+            with self._lock:
+                pending = list(self.awaiting_receipt.items())
+
+            for ticket, tx_hash in pending:
+                try:
+                    receipt = self.contract_manager.get_receipt(tx_hash)
+                except Exception as e:
+                    print(f"Receipt lookup failed for {tx_hash}: {e}")
+                    continue
+                if receipt is None:
+                    continue
+
+                with self._lock:
+                    self.awaiting_receipt.pop(ticket, None)
+                if receipt.status == 1:
+                    self._update(
+                        ticket,
+                        status='confirmed',
+                        block_number=receipt.blockNumber,
+                        gas_used=receipt.gasUsed
+                    )
+                else:
+                    self._update(
+                        ticket,
+                        status='failed',
+                        block_number=receipt.blockNumber,
+                        gas_used=receipt.gasUsed,
+                        error='Transaction reverted'
+                    )
@@ -0,0 +1,296 @@
+"""Pooled, failover-aware JSON-RPC provider for web3.
+
+Usage (self-check against local mock JSON-RPC servers, no chain needed):
+    python -m blockchain.rpc_provider
+    python -m blockchain.rpc_provider --requests 500
+
+The self-check starts one failing and one healthy mock endpoint, then sends
+single and batched calls through the provider and prints per-endpoint stats,
+showing the failover, batching and retry behaviour.
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+from web3.providers.base import JSONBaseProvider
+from utils import metrics
+
+RPC_SECONDS = metrics.registry.histogram('medblock_rpc_request_duration_seconds', 'JSON-RPC round trip per endpoint', ('endpoint',))
+RPC_REQUESTS = metrics.registry.counter('medblock_rpc_requests_total', 'JSON-RPC HTTP requests per endpoint', ('endpoint', 'outcome'))
+
+RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+# Calls that must not be repeated once a node may have received them: a second
+# broadcast after an ambiguous failure can surface as a spurious error
+NON_IDEMPOTENT = frozenset({'eth_sendRawTransaction', 'eth_sendTransaction'})
+
+
+class RetryableError(Exception):
+    """HTTP status that another attempt (or endpoint) may get past"""
+
+
+class Endpoint:
+    """One RPC URL with its own keep-alive session and health/latency record"""
+
+    def __init__(self, url, pool_size, window):
+        self.url = url
+        parsed = urlparse(url)
+        # Hosted node URLs carry the API key in the path; labels and stats only show the host
+        self.name = parsed.netloc or url
+        self.pool_size = pool_size
+        self.latency_ms = deque(maxlen=window)
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.down_until = 0.0
+        self.last_error = None
+        self._session = None
+        self._session_pid = None
+
+    @property
+    def session(self):
+        # Pooled sockets must not cross fork (gunicorn --preload): each process opens its own
+        if self._session_pid != os.getpid():
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0, pool_block=False)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers.update({'Content-Type': 'application/json'})
+            self._session = session
+            self._session_pid = os.getpid()
+        return self._session
+
+    def healthy(self, now):
+        return self.down_until <= now
+
+
+class PooledHTTPProvider(JSONBaseProvider):
+    """web3 provider over several endpoints with keep-alive pools, failover and retry.
+
+    Each endpoint has a requests session whose connection pool holds up to
+    pool_size keep-alive sockets. Calls go to the first healthy endpoint in
+    the configured order. After failure_threshold consecutive connection
+    errors, timeouts or 429/5xx responses, an endpoint is skipped for
+    cooldown seconds. A failed attempt is retried up to retries times, on
+    another endpoint when there is one, after a full-jitter exponential
+    backoff. JSON-RPC error responses are answers, not failures, and are
+    returned to web3 unchanged. batch() sends several calls in one JSON-RPC
+    batch request.
+
+    Transaction broadcasts (NON_IDEMPOTENT) are only retried or failed over
+    when the request provably never left this process (the connection could
+    not be opened, or a 429 rejected it). Any other failure is raised to the
+    caller, who knows the transaction hash and can check for it.
+    """
+
+    def __init__(self, endpoints, pool_size=16, timeout=10.0, retries=3, backoff=0.2, backoff_max=5.0,
+                 failure_threshold=2, cooldown=30.0, window=512):
+        super().__init__()
+        if isinstance(endpoints, str):
+            endpoints = [endpoints]
+        if not endpoints:
+            raise ValueError("At least one RPC endpoint is required")
+        self.endpoints = [Endpoint(url, pool_size, window) for url in endpoints]
+        for i, endpoint in enumerate(self.endpoints):
+            if any(other.name == endpoint.name for other in self.endpoints[:i]):
+                endpoint.name = f'{endpoint.name}#{i + 1}'
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+
+    def __str__(self):
+        return f"PooledHTTPProvider({', '.join(endpoint.name for endpoint in self.endpoints)})"
+
+    def make_request(self, method, params):
+        body = self.encode_rpc_request(method, params)
+        return self.decode_rpc_response(self._send(body, idempotent=method not in NON_IDEMPOTENT))
+
+    def batch(self, calls):
+        """Send [(method, params), ...] as one JSON-RPC batch; returns the results in order.
+
+        Raises ValueError if any call returned a JSON-RPC error.
+        """
+        ids = [next(self.request_counter) for _ in calls]
+        payload = [
+            {'jsonrpc': '2.0', 'method': method, 'params': list(params), 'id': request_id}
+            for request_id, (method, params) in zip(ids, calls)
+        ]
+        idempotent = not any(method in NON_IDEMPOTENT for method, _ in calls)
+        responses = json.loads(self._send(json.dumps(payload).encode('utf-8'), idempotent=idempotent))
+        if isinstance(responses, dict):
+            # Some nodes answer a whole batch with a single error object
+            raise ValueError(f"Batch request failed: {responses.get('error', responses)}")
+
+        by_id = {response.get('id'): response for response in responses}
+        results = []
+        for request_id, (method, _) in zip(ids, calls):
+            response = by_id.get(request_id)
+            if response is None:
+                raise ValueError(f"Batch response is missing {method}")
+            if 'error' in response:
+                raise ValueError(f"{method} failed: {response['error']}")
+            results.append(response['result'])
+        return results
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            return {
+                endpoint.name: {
+                    'healthy': endpoint.healthy(now),
+                    'requests': endpoint.requests,
+                    'failures': endpoint.failures,
+                    'consecutive_failures': endpoint.consecutive_failures,
+                    'last_error': endpoint.last_error,
+                    'latency_ms': metrics.summarize(endpoint.latency_ms)
+                }
+                for endpoint in self.endpoints
+            }
+
+    def _send(self, body, idempotent=True):
+        tried = set()
+        last_error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(random.uniform(0, min(self.backoff_max, self.backoff * 2 ** (attempt - 1))))
+            endpoint = self._choose(tried)
+            tried.add(endpoint)
+            started = time.perf_counter()
+            try:
+                response = endpoint.session.post(endpoint.url, data=body, timeout=self.timeout)
+                if response.status_code in RETRYABLE_STATUS:
+                    raise RetryableError(f"HTTP {response.status_code}")
+                response.raise_for_status()
+                content = response.content
+            except (requests.ConnectionError, requests.Timeout, RetryableError) as e:
+                self._record(endpoint, time.perf_counter() - started, error=e)
+                last_error = e
+                if not idempotent and not _never_sent(e):
+                    raise ConnectionError(f"RPC request to {endpoint.name} may have been received, not retrying: {e}") from e
+                continue
+            self._record(endpoint, time.perf_counter() - started)
+            return content
+        raise ConnectionError(f"All RPC attempts failed ({', '.join(sorted(e.name for e in tried))}): {last_error}")
+
+    def _choose(self, tried):
+        """First healthy endpoint not yet tried for this call, else the one that recovers soonest"""
+        now = time.monotonic()
+        with self._lock:
+            untried = [endpoint for endpoint in self.endpoints if endpoint not in tried] or self.endpoints
+            for endpoint in untried:
+                if endpoint.healthy(now):
+                    return endpoint
+            return min(untried, key=lambda endpoint: endpoint.down_until)
+
+    def _record(self, endpoint, seconds, error=None):
+        RPC_SECONDS.observe(seconds, endpoint=endpoint.name)
+        RPC_REQUESTS.inc(endpoint=endpoint.name, outcome='error' if error else 'ok')
+        with self._lock:
+            endpoint.requests += 1
+            if error is None:
+                endpoint.latency_ms.append(seconds * 1000)
+                endpoint.consecutive_failures = 0
+                endpoint.down_until = 0.0
+                return
+            endpoint.failures += 1
+            endpoint.consecutive_failures += 1
+            endpoint.last_error = str(error)
+            if endpoint.consecutive_failures >= self.failure_threshold:
+                if endpoint.healthy(time.monotonic()):
+                    print(f"RPC endpoint {endpoint.name} marked down for {self.cooldown}s: {error}")
+                endpoint.down_until = time.monotonic() + self.cooldown
+
+
+def _never_sent(error):
+    """True when a failed request certainly did not reach the node"""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    if isinstance(error, RetryableError):
+        return str(error) == 'HTTP 429'
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(error, requests.ConnectionError) and isinstance(reason, NewConnectionError)
+
+
+def _mock_server(fail=False):
+    """Local JSON-RPC server answering eth_chainId/eth_gasPrice/eth_getTransactionCount/web3_clientVersion"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    answers = {
+        'eth_chainId': '0x539',
+        'eth_gasPrice': hex(20 * 10 ** 9),
+        'eth_getTransactionCount': '0x7',
+        'web3_clientVersion': 'mock/1.0'
+    }
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers['Content-Length']))
+            if fail:
+                self.send_response(503)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            request = json.loads(body)
+
+            def answer(call):
+                if call['method'] not in answers:
+                    return {'jsonrpc': '2.0', 'id': call['id'], 'error': {'code': -32601, 'message': 'Method not found'}}
+                return {'jsonrpc': '2.0', 'id': call['id'], 'result': answers[call['method']]}
+
+            payload = json.dumps([answer(call) for call in request] if isinstance(request, list) else answer(request)).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_address[1]}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exercise PooledHTTPProvider against local mock JSON-RPC servers")
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+
+    from web3 import Web3
+
+    failing, healthy = _mock_server(fail=True), _mock_server()
+    provider = PooledHTTPProvider([failing, healthy], retries=2, backoff=0.01, cooldown=60.0)
+    w3 = Web3(provider)
+
+    started = time.perf_counter()
+    for _ in range(args.requests):
+        assert w3.eth.chain_id == 1337
+    single_ms = (time.perf_counter() - started) / args.requests * 1000
+
+    started = time.perf_counter()
+    for _ in range(args.requests):
+        provider.batch([('eth_chainId', []), ('eth_getTransactionCount', ['0x' + '00' * 20, 'pending']), ('eth_gasPrice', [])])
+    batch_ms = (time.perf_counter() - started) / args.requests * 1000
+
+    print(json.dumps({
+        'single_call_ms': round(single_ms, 3),
+        'batch_of_3_ms': round(batch_ms, 3),
+        'endpoints': provider.stats()
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
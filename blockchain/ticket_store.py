@@ -0,0 +1,169 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+# Statuses a ticket can still leave; anything else is final
+OPEN_STATUSES = ('queued', 'submitted')
+FIELDS = ('ticket', 'status', 'tx_hash', 'block_number', 'gas_used', 'error', 'created_at', 'updated_at')
+
+
+class TicketStore:
+    """SQLite table of record tickets shared by every worker process.
+
+    Each process registers itself as an owner and heartbeats while its
+    submitter threads run. A ticket belongs to the process that created it
+    until that owner stops heartbeating for lease seconds (killed, or
+    released after a clean shutdown); adopt() then moves its open tickets to
+    the calling process, so queued records get sent and submitted ones get
+    confirmed by whichever worker is still alive. status() reads the table,
+    so any worker can answer for any ticket.
+    """
+
+    def __init__(self, db_path='record_tickets.db', lease=30.0, busy_timeout=10.0):
+        self.db_path = db_path
+        self.lease = lease
+        self.busy_timeout = busy_timeout
+        self._lock = threading.Lock()
+        self._db_conn = None
+        self._db_pid = None
+        self._owner = None
+
+    @property
+    def db(self):
+        # SQLite connections must not cross fork (gunicorn --preload): each process opens its own
+        if self._db_pid != os.getpid():
+            self._db_conn = self._connect()
+            self._db_pid = os.getpid()
+            self._owner = f'{os.getpid()}-{uuid.uuid4().hex[:12]}'
+        return self._db_conn
+
+    @property
+    def owner(self):
+        """This process's owner id (a fresh one after fork)"""
+        if self._db_pid != os.getpid():
+            self.db  # opening the connection assigns the id
+        return self._owner
+
+    def _connect(self):
+        db = sqlite3.connect(self.db_path, check_same_thread=False, timeout=self.busy_timeout)
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('PRAGMA synchronous=NORMAL')
+        db.execute('''
+            CREATE TABLE IF NOT EXISTS tickets (
+                ticket TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                owner TEXT NOT NULL,
+                record TEXT NOT NULL,
+                tx_hash TEXT,
+                block_number INTEGER,
+                gas_used INTEGER,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        ''')
+        db.execute('CREATE INDEX IF NOT EXISTS idx_tickets_open ON tickets (status, owner)')
+        db.execute('CREATE INDEX IF NOT EXISTS idx_tickets_created ON tickets (created_at)')
+        db.execute('CREATE TABLE IF NOT EXISTS owners (owner TEXT PRIMARY KEY, heartbeat REAL NOT NULL)')
+        db.commit()
+        return db
+
+    def create(self, ticket, record):
+        """Insert a queued ticket for record (a JSON-serialisable tuple) owned by this process"""
+        now = time.time()
+        with self._lock:
+            self.db.execute(
+                'INSERT INTO tickets (ticket, status, owner, record, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)',
+                (ticket, 'queued', self.owner, json.dumps(list(record)), now, now)
+            )
+            self.db.commit()
+
+    def get(self, ticket):
+        with self._lock:
+            row = self.db.execute(f'SELECT {", ".join(FIELDS)} FROM tickets WHERE ticket = ?', (ticket,)).fetchone()
+        return dict(zip(FIELDS, row)) if row else None
+
+    def update(self, tickets, **fields):
+        if isinstance(tickets, str):
+            tickets = [tickets]
+        fields['updated_at'] = time.time()
+        assignments = ', '.join(f'{name} = ?' for name in fields)
+        with self._lock:
+            self.db.executemany(
+                f'UPDATE tickets SET {assignments} WHERE ticket = ?',
+                [(*fields.values(), ticket) for ticket in tickets]
+            )
+            self.db.commit()
+
+    def heartbeat(self):
+        with self._lock:
+            self.db.execute(
+                'INSERT OR REPLACE INTO owners (owner, heartbeat) VALUES (?, ?)',
+                (self.owner, time.time())
+            )
+            # An expired owner counts as gone whether or not its row is still there
+            self.db.execute('DELETE FROM owners WHERE heartbeat < ?', (time.time() - self.lease,))
+            self.db.commit()
+
+    def release(self):
+        """Give up ownership now (after a clean shutdown) instead of waiting out the lease"""
+        with self._lock:
+            self.db.execute('DELETE FROM owners WHERE owner = ?', (self.owner,))
+            self.db.commit()
+
+    def adopt(self):
+        """Claim the open tickets of owners whose lease ran out.
+
+        Returns [(ticket, status, record, tx_hash)] for the tickets taken over.
+        The claim runs in one write transaction, so two workers starting
+        together never both adopt the same ticket.
+        """
+        expired = time.time() - self.lease
+        query = f'''
+            SELECT ticket, status, record, tx_hash FROM tickets
+            WHERE status IN ({", ".join("?" for _ in OPEN_STATUSES)})
+              AND owner != ?
+              AND owner NOT IN (SELECT owner FROM owners WHERE heartbeat >= ?)
+            ORDER BY created_at
+        '''
+        params = (*OPEN_STATUSES, self.owner, expired)
+        with self._lock:
+            db = self.db
+            # Usually there is nothing to adopt: check before taking the write lock
+            if db.execute(query, params).fetchone() is None:
+                return []
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                rows = db.execute(query, params).fetchall()
+                db.executemany(
+                    'UPDATE tickets SET owner = ?, updated_at = ? WHERE ticket = ?',
+                    [(self.owner, time.time(), row[0]) for row in rows]
+                )
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+        return [(ticket, status, tuple(json.loads(record)), tx_hash) for ticket, status, record, tx_hash in rows]
+
+    def status_counts(self):
+        """Number of tickets in each status, across all workers"""
+        with self._lock:
+            return dict(self.db.execute('SELECT status, COUNT(*) FROM tickets GROUP BY status').fetchall())
+
+    def trim(self, max_tickets):
+        """Delete the oldest finished tickets beyond max_tickets"""
+        with self._lock:
+            self.db.execute(
+                f'''
+                DELETE FROM tickets WHERE ticket IN (
+                    SELECT ticket FROM tickets
+                    WHERE status NOT IN ({", ".join("?" for _ in OPEN_STATUSES)})
+                    ORDER BY created_at DESC LIMIT -1 OFFSET ?
+                )
+                ''',
+                (*OPEN_STATUSES, max_tickets)
+            )
+            self.db.commit()
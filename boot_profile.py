@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Profile application startup with python -X importtime.
+
+Usage:
+    python boot_profile.py                                    # import app, print report
+    python boot_profile.py --module asgi --runs 5
+    python boot_profile.py --output boot.json                 # save a baseline
+    python boot_profile.py --baseline boot.json               # compare against it
+
+Each run imports the module in a fresh interpreter, so the wall time includes
+everything a gunicorn worker pays before it can bind: interpreter start,
+imports and module-level setup (database init, client construction). The
+report lists the slowest top-level imports by cumulative time and flags heavy
+packages (torch, torchvision, pandas, solcx, web3) that should no longer load at boot.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HEAVY_PACKAGES = ('torch', 'torchvision', 'pandas', 'solcx', 'web3')
+
+
+def profile_once(module):
+    """Import module in a fresh interpreter; returns (wall seconds, {top-level import: cumulative us}, packages loaded)"""
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True
+    )
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    top_level = {}
+    children = {}
+    loaded = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        _, cumulative_us, raw_name = line.split('|')
+        name = raw_name.strip()
+        loaded.add(name.split('.')[0])
+        # Nesting adds two spaces per level after the one-space column gap, and a module is
+        # listed after its imports: the indent 3 lines just before the profiled module's own
+        # indent 1 line are the imports it makes itself (the interpreter's startup imports
+        # before that belong to other indent 1 modules such as encodings and site)
+        indent = len(raw_name) - len(raw_name.lstrip())
+        if indent == 3:
+            children[name] = int(cumulative_us)
+        elif indent == 1:
+            if name == module:
+                top_level = children
+            children = {}
+    return wall, top_level, loaded
+
+
+def build_report(module, runs, top):
+    walls = []
+    imports = {}
+    loaded = set()
+    for _ in range(runs):
+        wall, top_level, run_loaded = profile_once(module)
+        walls.append(wall)
+        loaded |= run_loaded
+        for name, cumulative in top_level.items():
+            imports.setdefault(name, []).append(cumulative)
+
+    slowest = sorted(
+        ((name, statistics.median(values) / 1000) for name, values in imports.items()),
+        key=lambda item: item[1],
+        reverse=True
+    )[:top]
+    return {
+        'module': module,
+        'runs': runs,
+        'python': sys.version.split()[0],
+        'wall_seconds': {
+            'median': round(statistics.median(walls), 3),
+            'min': round(min(walls), 3),
+            'max': round(max(walls), 3)
+        },
+        'import_ms': {name: round(ms, 1) for name, ms in slowest},
+        'heavy_packages_loaded': sorted(name for name in HEAVY_PACKAGES if name in loaded)
+    }
+
+
+def print_report(report, baseline=None):
+    wall = report['wall_seconds']['median']
+    print(f"import {report['module']}: {wall:.3f}s median over {report['runs']} runs")
+    if baseline is not None:
+        before = baseline['wall_seconds']['median']
+        print(f"  baseline: {before:.3f}s ({before / wall:.1f}x speedup)" if wall else f"  baseline: {before:.3f}s")
+    print(f"  heavy packages loaded: {', '.join(report['heavy_packages_loaded']) or 'none'}")
+    print("  slowest imports (cumulative ms):")
+    for name, ms in report['import_ms'].items():
+        line = f"    {name:<40} {ms:>9.1f}"
+        if baseline is not None and name in baseline['import_ms']:
+            line += f"   (was {baseline['import_ms'][name]:.1f})"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure application import/boot time with -X importtime")
+    parser.add_argument('--module', default='app', help="Module to import (app or asgi)")
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--top', type=int, default=15, help="Number of slowest imports to list")
+    parser.add_argument('--output', help="Write the JSON report to this file")
+    parser.add_argument('--baseline', help="Earlier JSON report to compare against")
+    args = parser.parse_args()
+
+    report = build_report(args.module, args.runs, args.top)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -25,16 +25,166 @@ PRIVATE_KEY = os.getenv("PRIVATE_KEY", "0xbb92e4d51d7947e632be0fb260f4dd9aba3e7b
 # Application Configuration
 MODEL_DIR = "models"
 UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER", "uploads")
+# Uploads up to this many bytes are processed in memory without a temp file
+UPLOAD_SPOOL_THRESHOLD = int(os.getenv("UPLOAD_SPOOL_THRESHOLD", str(4 * 1024 * 1024)))
+IPFS_STORE_DIR = os.getenv("IPFS_STORE_DIR", "ipfs_store")
+IPFS_STORE_MAX_MB = int(os.getenv("IPFS_STORE_MAX_MB", "512"))
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'csv'}
 
+# Model Memory Configuration
+# MODEL_MMAP_WEIGHTS memory-maps the .pth checkpoints so forked gunicorn workers share
+# one page-cache copy; PRELOAD_IMAGE_MODELS loads them at import (use with --preload)
+MODEL_MMAP_WEIGHTS = os.getenv("MODEL_MMAP_WEIGHTS", "true").lower() == "true"
+PRELOAD_IMAGE_MODELS = os.getenv("PRELOAD_IMAGE_MODELS", "false").lower() == "true"
+# Models are evicted least-recently-used first to stay under MODEL_MEMORY_BUDGET_MB (0 = no limit);
+# MODEL_PREWARM loads models that carry a large share of recent traffic in the background
+MODEL_MEMORY_BUDGET_MB = int(os.getenv("MODEL_MEMORY_BUDGET_MB", "0"))
+MODEL_PREWARM = os.getenv("MODEL_PREWARM", "false").lower() == "true"
+MODEL_PREWARM_INTERVAL = float(os.getenv("MODEL_PREWARM_INTERVAL", "30"))
+
+# Model Warmup Configuration
+# Comma-separated model keys (diabetes_xgb, diabetes_retinal, heart_xgb, heart_ecg),
+# "all" or "none". Each worker loads them in the background and /readyz reports 503
+# until they have run a first inference.
+WARMUP_MODELS = os.getenv("WARMUP_MODELS", "all")
+MODEL_KEYS = ('diabetes_xgb', 'diabetes_retinal', 'heart_xgb', 'heart_ecg')
+if WARMUP_MODELS.strip().lower() == 'all':
+    WARMUP_MODEL_KEYS = list(MODEL_KEYS)
+elif WARMUP_MODELS.strip().lower() == 'none':
+    WARMUP_MODEL_KEYS = []
+else:
+    WARMUP_MODEL_KEYS = [key.strip() for key in WARMUP_MODELS.split(',') if key.strip()]
+    _unknown = sorted(set(WARMUP_MODEL_KEYS) - set(MODEL_KEYS))
+    if _unknown:
+        raise ValueError(
+            f"WARMUP_MODELS has unknown model keys {', '.join(_unknown)}; "
+            f"use 'all', 'none' or a comma-separated list of {', '.join(MODEL_KEYS)}"
+        )
+# A model that fails to warm up is retried after WARMUP_RETRY_DELAY seconds, doubling
+# up to WARMUP_RETRY_MAX_DELAY, so the worker becomes ready once the cause clears (0 disables)
+WARMUP_RETRY_DELAY = float(os.getenv("WARMUP_RETRY_DELAY", "1"))
+WARMUP_RETRY_MAX_DELAY = float(os.getenv("WARMUP_RETRY_MAX_DELAY", "60"))
+
+# Image Model Backend
+# eager: FP32 state dicts (default); optimized: TorchScript/INT8 artifacts from
+# optimize_models.py; compile: torch.compile on top of the FP32 model
+IMAGE_MODEL_BACKEND = os.getenv("IMAGE_MODEL_BACKEND", "eager")
+
+# Tabular Model Engine
+# compiled: XGBoost trees flattened into NumPy arrays with the scaler folded into the
+# split thresholds, checked against predict_proba at load time (falls back on mismatch);
+# sklearn: scaler.transform + XGBClassifier.predict_proba
+TABULAR_ENGINE = os.getenv("TABULAR_ENGINE", "compiled")
+
+# Image Preprocessing Configuration
+# IMAGE_FAST_DECODE decodes JPEGs at reduced DCT scale and reduces large images on load.
+# Off by default: the models were trained on full decodes, and the reduced decode shifts
+# pixel values enough to move confidences. Enable only after checking predictions on
+# your own images: python -m utils.image_preprocessing <image dir> --model <key>
+IMAGE_FAST_DECODE = os.getenv("IMAGE_FAST_DECODE", "false").lower() == "true"
+IMAGE_DECODE_WORKERS = int(os.getenv("IMAGE_DECODE_WORKERS", "0"))
+
+# Inference Batching Configuration
+# Concurrent image predictions for the same model are grouped into one forward pass
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "8"))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "10"))
+BATCH_REQUEST_TIMEOUT = float(os.getenv("BATCH_REQUEST_TIMEOUT", "120"))
+
+# Blockchain Write Pipeline Configuration
+# Records are sent from a background thread; receipts are polled every RECEIPT_POLL_INTERVAL seconds
+RECEIPT_POLL_INTERVAL = float(os.getenv("RECEIPT_POLL_INTERVAL", "2"))
+RECORD_TICKET_RETENTION = int(os.getenv("RECORD_TICKET_RETENTION", "10000"))
+# Tickets and their records are kept in RECORD_TICKET_DB, shared by all workers: any worker
+# answers /records/<ticket>/status, and a worker adopts the unfinished tickets of one that
+# exited or stopped heartbeating for RECORD_TICKET_LEASE seconds
+RECORD_TICKET_DB = os.getenv("RECORD_TICKET_DB", "record_tickets.db")
+RECORD_TICKET_LEASE = float(os.getenv("RECORD_TICKET_LEASE", "30"))
+# The account's next nonce is kept in NONCE_DB, shared by all workers. A worker holds the
+# database's write lock from taking a nonce until its transaction is sent, so workers
+# never reuse a nonce. Kept apart from RECORD_TICKET_DB so ticket writes never wait on a send
+NONCE_DB = os.getenv("NONCE_DB", "nonces.db")
+GAS_PRICE_TTL = float(os.getenv("GAS_PRICE_TTL", "30"))
+# Connectivity and balance are checked in the background every CHAIN_HEALTH_INTERVAL
+# seconds (reported in /healthz) instead of blocking startup
+CHAIN_HEALTH_INTERVAL = float(os.getenv("CHAIN_HEALTH_INTERVAL", "30"))
+
+# RPC Provider Configuration
+# RPC_ENDPOINTS is a comma-separated failover list, tried in order (default: GANACHE_URL).
+# Each endpoint keeps up to RPC_POOL_SIZE keep-alive connections; failed calls are retried
+# RPC_RETRIES times with jittered exponential backoff (RPC_BACKOFF doubling up to
+# RPC_BACKOFF_MAX seconds), and an endpoint failing RPC_FAILURE_THRESHOLD times in a row
+# is skipped for RPC_FAILOVER_COOLDOWN seconds
+RPC_ENDPOINTS = [url.strip() for url in os.getenv("RPC_ENDPOINTS", GANACHE_URL).split(',') if url.strip()]
+RPC_POOL_SIZE = int(os.getenv("RPC_POOL_SIZE", "16"))
+RPC_TIMEOUT = float(os.getenv("RPC_TIMEOUT", "10"))
+RPC_RETRIES = int(os.getenv("RPC_RETRIES", "3"))
+RPC_BACKOFF = float(os.getenv("RPC_BACKOFF", "0.2"))
+RPC_BACKOFF_MAX = float(os.getenv("RPC_BACKOFF_MAX", "5"))
+RPC_FAILURE_THRESHOLD = int(os.getenv("RPC_FAILURE_THRESHOLD", "2"))
+RPC_FAILOVER_COOLDOWN = float(os.getenv("RPC_FAILOVER_COOLDOWN", "30"))
+
+# "record" sends one addRecord transaction per prediction; "merkle" buffers records
+# and anchors a single Merkle root per batch through anchorBatch
+CHAIN_WRITE_MODE = os.getenv("CHAIN_WRITE_MODE", "record")
+MERKLE_BATCH_SIZE = int(os.getenv("MERKLE_BATCH_SIZE", "256"))
+MERKLE_BATCH_WINDOW = float(os.getenv("MERKLE_BATCH_WINDOW", "30"))
+
+# Record Index Configuration
+# RecordAdded events are tailed into a local SQLite index that serves /records;
+# RECORD_INDEX_CONFIRMATIONS keeps the newest blocks out of the index until they settle
+RECORD_INDEX_DB = os.getenv("RECORD_INDEX_DB", "record_index.db")
+RECORD_INDEX_POLL_INTERVAL = float(os.getenv("RECORD_INDEX_POLL_INTERVAL", "5"))
+RECORD_INDEX_BLOCK_CHUNK = int(os.getenv("RECORD_INDEX_BLOCK_CHUNK", "2000"))
+RECORD_INDEX_CONFIRMATIONS = int(os.getenv("RECORD_INDEX_CONFIRMATIONS", "0"))
+# All workers query the index; one tails the chain, and another takes over once it has
+# not renewed its lease for RECORD_INDEX_LEASE seconds
+RECORD_INDEX_LEASE = float(os.getenv("RECORD_INDEX_LEASE", "30"))
+
+# Prediction Cache Configuration
+# Results are keyed by disease, patient, feature hash, image hash and model version.
+# Set PREDICTION_CACHE_DB to an empty string to keep the cache in memory only.
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "1024"))
+PREDICTION_CACHE_TTL = float(os.getenv("PREDICTION_CACHE_TTL", "3600"))
+PREDICTION_CACHE_DB = os.getenv("PREDICTION_CACHE_DB", "prediction_cache.db")
+
+# Threads shared by request handlers to run independent steps in parallel
+REQUEST_POOL_WORKERS = int(os.getenv("REQUEST_POOL_WORKERS", "4"))
+
+# ASGI Serving Configuration (asgi.py)
+# Threads running Flask views per worker, and the longest a record status request may long-poll
+ASGI_THREADS = int(os.getenv("ASGI_THREADS", "8"))
+RECORD_WAIT_MAX = float(os.getenv("RECORD_WAIT_MAX", "30"))
+
+# Metrics Configuration
+# Stage timings are always exported at /metrics; SERVER_TIMING also returns them
+# per request in a Server-Timing response header (visible in browser dev tools)
+SERVER_TIMING = os.getenv("SERVER_TIMING", "false").lower() == "true"
+
 # Security Configuration
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-this-in-production")
 DATABASE_PATH = os.getenv("DATABASE_PATH", "users.db")
+# Seconds a connection waits on a locked database before raising
+DATABASE_BUSY_TIMEOUT = float(os.getenv("DATABASE_BUSY_TIMEOUT", "5"))
+# bcrypt cost for new passwords and the pool that runs it; logins beyond
+# AUTH_HASH_WORKERS + AUTH_HASH_QUEUE in flight get HTTP 429
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+AUTH_HASH_WORKERS = int(os.getenv("AUTH_HASH_WORKERS", "2"))
+AUTH_HASH_QUEUE = int(os.getenv("AUTH_HASH_QUEUE", "16"))
+AUTH_HASH_TIMEOUT = float(os.getenv("AUTH_HASH_TIMEOUT", "10"))
 
 # Ensure required directories exist
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(MODEL_DIR, exist_ok=True)
 
 # Smart Contract Configuration
-CONTRACT_ADDRESS = None
+# The compiled ABI/bytecode is cached in CONTRACT_ARTIFACT_DIR keyed by the source hash,
+# and each network's deployment is kept in DEPLOYMENT_REGISTRY, which workers load at startup.
+# CONTRACT_ADDRESS overrides the registry (its ABI comes from the built artifact).
+CONTRACT_SOURCE = os.getenv("CONTRACT_SOURCE", "contracts/MedicalRecord.sol")
+CONTRACT_ARTIFACT_DIR = os.getenv("CONTRACT_ARTIFACT_DIR", "build/contracts")
+DEPLOYMENT_REGISTRY = os.getenv("DEPLOYMENT_REGISTRY", "deployments.json")
+CONTRACT_ADDRESS = os.getenv("CONTRACT_ADDRESS") or None
+# contracts/MedicalRecordV2.sol stores records compactly (bytes32 hashes, uint8 enums, packed
+# timestamp); its patient ids are keccak256(PATIENT_ID_SALT + id) on-chain
+PATIENT_ID_SALT = os.getenv("PATIENT_ID_SALT", "")
 CONTRACT_ABI = None
\ No newline at end of file
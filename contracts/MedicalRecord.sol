@@ -12,9 +12,19 @@ contract MedicalRecord {
         address hospital;
     }
     
+    struct Batch {
+        bytes32 merkleRoot;
+        uint256 recordCount;
+        uint256 timestamp;
+        address hospital;
+    }
+    
     mapping(uint256 => Record) public records;
     uint256 public recordCount;
     
+    mapping(uint256 => Batch) public batches;
+    uint256 public batchCount;
+    
     event RecordAdded(
         uint256 indexed recordId,
         string patientId,
@@ -23,6 +33,13 @@ contract MedicalRecord {
         uint256 timestamp
     );
     
+    event BatchAnchored(
+        uint256 indexed batchId,
+        bytes32 merkleRoot,
+        uint256 recordCount,
+        uint256 timestamp
+    );
+    
     function addRecord(
         string memory _patientId,
         string memory _diseaseType,
@@ -73,4 +90,59 @@ contract MedicalRecord {
             record.hospital
         );
     }
+    
+    function anchorBatch(bytes32 _merkleRoot, uint256 _recordCount) public returns (uint256) {
+        batchCount++;
+        
+        batches[batchCount] = Batch(
+            _merkleRoot,
+            _recordCount,
+            block.timestamp,
+            msg.sender
+        );
+        
+        emit BatchAnchored(
+            batchCount,
+            _merkleRoot,
+            _recordCount,
+            block.timestamp
+        );
+        
+        return batchCount;
+    }
+    
+    function getBatch(uint256 _batchId) public view returns (
+        bytes32 merkleRoot,
+        uint256 recordCount,
+        uint256 timestamp,
+        address hospital
+    ) {
+        Batch memory batch = batches[_batchId];
+        return (
+            batch.merkleRoot,
+            batch.recordCount,
+            batch.timestamp,
+            batch.hospital
+        );
+    }
+    
+    // Sorted-pair keccak256 Merkle proof, matching blockchain/merkle_batcher.py.
+    // Leaves are keccak256(0x00 || recordHash) and internal nodes
+    // keccak256(0x01 || a || b), so a node can never pass as a leaf.
+    function verifyRecord(
+        uint256 _batchId,
+        bytes32 _recordHash,
+        bytes32[] memory _proof
+    ) public view returns (bool) {
+        bytes32 computed = keccak256(abi.encodePacked(bytes1(0x00), _recordHash));
+        for (uint256 i = 0; i < _proof.length; i++) {
+            bytes32 sibling = _proof[i];
+            if (computed <= sibling) {
+                computed = keccak256(abi.encodePacked(bytes1(0x01), computed, sibling));
+            } else {
+                computed = keccak256(abi.encodePacked(bytes1(0x01), sibling, computed));
+            }
+        }
+        return computed == batches[_batchId].merkleRoot;
+    }
 }
\ No newline at end of file
@@ -0,0 +1,150 @@
+// SPDX-License-Identifier: MIT
+pragma solidity ^0.8.0;
+
+// Compact storage layout for MedicalRecord (see blockchain/record_codec.py for
+// the off-chain encoding). A record takes 4 storage slots: three bytes32 hashes
+// and one slot shared by the hospital, timestamp, disease and prediction. For
+// the values the app writes, a v1 record takes 11: one slot each for the short
+// patient id, disease, prediction, timestamp and hospital strings/values, and
+// three each for the 64-character data hash and 46-character image id
+// (a long string is a length slot plus ceil(length / 32) data slots).
+contract MedicalRecordV2 {
+    enum Disease { Unknown, Diabetes, HeartDisease }
+    enum Prediction { Unknown, Negative, Positive }
+
+    struct Record {
+        bytes32 patientHash;   // keccak256 of the (salted) patient id
+        bytes32 dataHash;      // sha256 of the submitted tabular data
+        bytes32 imageHash;     // content store hash of the uploaded image
+        address hospital;      // 20 bytes  \
+        uint40 timestamp;      //  5 bytes   | one slot
+        Disease disease;       //  1 byte    |
+        Prediction prediction; //  1 byte   /
+    }
+
+    struct Batch {
+        bytes32 merkleRoot;
+        address hospital;      // 20 bytes  \
+        uint40 timestamp;      //  5 bytes   | one slot
+        uint32 recordCount;    //  4 bytes  /
+    }
+
+    mapping(uint256 => Record) public records;
+    uint256 public recordCount;
+
+    mapping(uint256 => Batch) public batches;
+    uint256 public batchCount;
+
+    event RecordAdded(
+        uint256 indexed recordId,
+        bytes32 indexed patientHash,
+        Disease disease,
+        Prediction prediction,
+        uint40 timestamp
+    );
+
+    event BatchAnchored(
+        uint256 indexed batchId,
+        bytes32 merkleRoot,
+        uint256 recordCount,
+        uint256 timestamp
+    );
+
+    function addRecord(
+        bytes32 _patientHash,
+        Disease _disease,
+        Prediction _prediction,
+        bytes32 _dataHash,
+        bytes32 _imageHash
+    ) external returns (uint256) {
+        uint256 recordId = ++recordCount;
+        uint40 timestamp = uint40(block.timestamp);
+
+        records[recordId] = Record(
+            _patientHash,
+            _dataHash,
+            _imageHash,
+            msg.sender,
+            timestamp,
+            _disease,
+            _prediction
+        );
+
+        emit RecordAdded(recordId, _patientHash, _disease, _prediction, timestamp);
+
+        return recordId;
+    }
+
+    function getRecord(uint256 _recordId) external view returns (
+        bytes32 patientHash,
+        Disease disease,
+        Prediction prediction,
+        bytes32 dataHash,
+        bytes32 imageHash,
+        uint256 timestamp,
+        address hospital
+    ) {
+        Record storage record = records[_recordId];
+        return (
+            record.patientHash,
+            record.disease,
+            record.prediction,
+            record.dataHash,
+            record.imageHash,
+            record.timestamp,
+            record.hospital
+        );
+    }
+
+    // Same interface as MedicalRecord, so MerkleBatcher works with either contract
+    function anchorBatch(bytes32 _merkleRoot, uint256 _recordCount) external returns (uint256) {
+        require(_recordCount <= type(uint32).max, "batch too large");
+        uint256 batchId = ++batchCount;
+
+        batches[batchId] = Batch(
+            _merkleRoot,
+            msg.sender,
+            uint40(block.timestamp),
+            uint32(_recordCount)
+        );
+
+        emit BatchAnchored(batchId, _merkleRoot, _recordCount, block.timestamp);
+
+        return batchId;
+    }
+
+    function getBatch(uint256 _batchId) external view returns (
+        bytes32 merkleRoot,
+        uint256 recordCount,
+        uint256 timestamp,
+        address hospital
+    ) {
+        Batch storage batch = batches[_batchId];
+        return (
+            batch.merkleRoot,
+            batch.recordCount,
+            batch.timestamp,
+            batch.hospital
+        );
+    }
+
+    // Sorted-pair keccak256 Merkle proof, matching blockchain/merkle_batcher.py.
+    // Leaves are keccak256(0x00 || recordHash) and internal nodes
+    // keccak256(0x01 || a || b), so a node can never pass as a leaf.
+    function verifyRecord(
+        uint256 _batchId,
+        bytes32 _recordHash,
+        bytes32[] calldata _proof
+    ) external view returns (bool) {
+        bytes32 computed = keccak256(abi.encodePacked(bytes1(0x00), _recordHash));
+        for (uint256 i = 0; i < _proof.length; i++) {
+            bytes32 sibling = _proof[i];
+            if (computed <= sibling) {
+                computed = keccak256(abi.encodePacked(bytes1(0x01), computed, sibling));
+            } else {
+                computed = keccak256(abi.encodePacked(bytes1(0x01), sibling, computed));
+            }
+        }
+        return computed == batches[_batchId].merkleRoot;
+    }
+}
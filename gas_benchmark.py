@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Compare gas per record between MedicalRecord (v1) and MedicalRecordV2 (compact).
+
+Usage:
+    python gas_benchmark.py                          # 50 records per contract
+    python gas_benchmark.py --records 200 --output gas.json
+
+Both contracts are compiled (through the artifact cache) and deployed on an
+in-process eth-tester chain (pip install "eth-tester[py-evm]"). The same
+synthetic records, shaped like the app's (patient id, disease, prediction,
+SHA-256 data hash, content store image id), are then sent through
+ContractManager.send_record, so v2 uses the real off-chain encoding. The
+report has deployment gas, gas for the first record (which also initializes
+the record counter) and the mean for the records after it, anchorBatch gas,
+and the v2 saving. Each v2 record is read back and decoded to check the
+encoding round-trips.
+"""
+
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import statistics
+import sys
+import tempfile
+
+CONTRACTS = {
+    'v1': 'contracts/MedicalRecord.sol',
+    'v2': 'contracts/MedicalRecordV2.sol'
+}
+
+
+def synthetic_records(count):
+    records = []
+    for i in range(count):
+        data_hash = hashlib.sha256(f'tabular-{i}'.encode()).hexdigest()
+        image_hash = 'Qm' + hashlib.sha256(f'image-{i}'.encode()).hexdigest()[:44]
+        records.append((
+            f'PATIENT_{i:05d}',
+            'Diabetes' if i % 2 == 0 else 'Heart Disease',
+            'Positive' if i % 3 == 0 else 'Negative',
+            data_hash,
+            image_hash
+        ))
+    return records
+
+
+def deploy(contract_manager, artifact):
+    factory = contract_manager.w3.eth.contract(abi=artifact['abi'], bytecode=artifact['bytecode'])
+    transaction = factory.constructor().build_transaction(contract_manager._tx_params(5000000))
+    tx_hash = contract_manager._sign_and_send(transaction)
+    receipt = contract_manager.w3.eth.wait_for_transaction_receipt(tx_hash)
+    contract_manager.load_contract(receipt.contractAddress, artifact['abi'])
+    return receipt.gasUsed
+
+
+def measure(version, artifact, records, chain):
+    from blockchain.contract_manager import ContractManager
+
+    w3, account, private_key = chain
+    contract_manager = ContractManager(w3=w3, account=account, private_key=private_key)
+    deploy_gas = deploy(contract_manager, artifact)
+
+    record_gas = []
+    for record in records:
+        tx_hash = contract_manager.send_record(*record)
+        receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
+        if receipt.status != 1:
+            raise RuntimeError(f"{version} addRecord reverted")
+        record_gas.append(receipt.gasUsed)
+
+    batch_gas = []
+    for i in range(3):
+        tx_hash = contract_manager.send_batch_root(hashlib.sha256(f'root-{i}'.encode()).digest(), 256)
+        batch_gas.append(w3.eth.wait_for_transaction_receipt(tx_hash).gasUsed)
+
+    # Read every record back through the contract manager's decoding
+    for record_id, record in enumerate(records, start=1):
+        stored = contract_manager.get_record(record_id)
+        expected_patient = contract_manager.patient_key(record[0])
+        if (stored['patientId'], stored['diseaseType'], stored['prediction'], stored['dataHash'], stored['imageHash']) != \
+                (expected_patient, record[1], record[2], record[3], record[4]):
+            raise RuntimeError(f"{version} record {record_id} did not round-trip: {stored}")
+
+    steady = record_gas[1:] or record_gas
+    return {
+        'contract': artifact['contract'],
+        'deploy_gas': deploy_gas,
+        'add_record_gas': {
+            'first': record_gas[0],
+            'mean': round(statistics.mean(steady)),
+            'min': min(steady),
+            'max': max(steady)
+        },
+        'anchor_batch_gas': {
+            'first': batch_gas[0],
+            'mean': round(statistics.mean(batch_gas[1:]))
+        }
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gas per record for the v1 and v2 MedicalRecord contracts")
+    parser.add_argument('--records', type=int, default=50)
+    parser.add_argument('--output', help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    workdir = tempfile.mkdtemp(prefix='medblock-gas-')
+    # Never touch the configured node or deployment registry
+    os.environ.update({
+        'ALCHEMY_API_KEY': '',
+        'GANACHE_URL': 'http://127.0.0.1:9',
+        'DEPLOYMENT_REGISTRY': os.path.join(workdir, 'deployments.json')
+    })
+
+    with contextlib.redirect_stdout(sys.stderr):
+        import config
+        from blockchain.contract_artifacts import build_artifact
+        from benchmark import start_chain
+
+        chain = start_chain()
+        records = synthetic_records(args.records)
+        report = {'records': args.records}
+        for version, source in CONTRACTS.items():
+            artifact = build_artifact(source, config.CONTRACT_ARTIFACT_DIR)
+            report[version] = measure(version, artifact, records, chain)
+
+    v1, v2 = report['v1']['add_record_gas']['mean'], report['v2']['add_record_gas']['mean']
+    report['v2_saving'] = {
+        'gas_per_record': v1 - v2,
+        'percent': round((v1 - v2) / v1 * 100, 1)
+    }
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
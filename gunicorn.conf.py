@@ -0,0 +1,25 @@
+# Picked up automatically by gunicorn from the working directory.
+
+
+def post_worker_init(worker):
+    """Warm the models in each worker once it has loaded the app.
+
+    This runs after fork, so with --preload the master never runs a forward
+    pass (and never owns the warmup thread). Recycled workers warm up again
+    while /readyz keeps the load balancer away from them.
+    """
+    import app
+    app.start_warmup()
+
+
+def worker_exit(server, worker):
+    """Send the records this worker still has queued before it exits.
+
+    Workers are recycled every --max-requests, and records in the queue have
+    already been acknowledged to clients. Tickets still waiting for a receipt
+    stay in the shared ticket store and are confirmed by another worker.
+    """
+    import app
+    app.record_submitter.shutdown(timeout=worker.cfg.graceful_timeout)
+    app.record_indexer.release()
+    app.contract_manager.shutdown()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Report resident memory per worker process (Linux only).
+
+Usage:
+    python memory_report.py --pid <gunicorn master pid>      # inspect a running deployment
+    python memory_report.py --simulate --workers 4           # preload + fork 4 workers locally
+    python memory_report.py --simulate --workers 4 --no-mmap # same, with heap-loaded weights
+    python memory_report.py --simulate --workers 4 --image-backend compile
+
+RSS counts shared pages in every process that maps them, so the figure to
+budget with is PSS (proportional set size): shared pages are split between
+the processes sharing them, and the PSS values add up to the real total.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+FIELDS = ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty')
+
+
+def read_memory(pid):
+    """Return the smaps_rollup fields for pid in MB"""
+    usage = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if parts and parts[0].rstrip(':') in FIELDS:
+                usage[parts[0].rstrip(':').lower() + '_mb'] = round(int(parts[1]) / 1024, 1)
+    return usage
+
+
+def child_pids(pid):
+    children = []
+    for task in os.listdir(f'/proc/{pid}/task'):
+        with open(f'/proc/{pid}/task/{task}/children') as f:
+            children.extend(int(child) for child in f.read().split())
+    return children
+
+
+def report(master_pid, worker_pids):
+    processes = [{'role': 'master', 'pid': master_pid, **read_memory(master_pid)}]
+    processes.extend({'role': 'worker', 'pid': pid, **read_memory(pid)} for pid in worker_pids)
+    workers = [p for p in processes if p['role'] == 'worker']
+    return {
+        'processes': processes,
+        'workers': len(workers),
+        'total_rss_mb': round(sum(p['rss_mb'] for p in processes), 1),
+        'total_pss_mb': round(sum(p['pss_mb'] for p in processes), 1),
+        'pss_per_worker_mb': round(sum(p['pss_mb'] for p in workers) / len(workers), 1) if workers else None
+    }
+
+
+def simulate(worker_count, mmap_weights, model_dir, image_backend='eager'):
+    """Preload the image models like gunicorn --preload, fork workers, run one prediction each"""
+    import torch
+    from utils.model_loader import ModelLoader
+
+    model_loader = ModelLoader(model_dir=model_dir, mmap_weights=mmap_weights, image_backend=image_backend)
+    model_loader.preload_image_models()
+    dummy = torch.zeros(1, 3, 224, 224)
+
+    workers = []
+    for _ in range(worker_count):
+        pid = os.fork()
+        if pid == 0:
+            with torch.inference_mode():
+                model_loader.models['diabetes_retinal'](dummy)
+                model_loader.models['heart_ecg'](dummy)
+            time.sleep(3600)
+            os._exit(0)
+        workers.append(pid)
+
+    # Give every worker time to finish its forward passes before sampling
+    time.sleep(10)
+    try:
+        return report(os.getpid(), workers)
+    finally:
+        for pid in workers:
+            os.kill(pid, 9)
+            os.waitpid(pid, 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure RSS/PSS per gunicorn worker")
+    parser.add_argument('--pid', type=int, help="PID of a running gunicorn master")
+    parser.add_argument('--simulate', action='store_true', help="Preload models and fork workers locally")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--no-mmap', action='store_true', help="Load weights into the heap instead of mmap")
+    parser.add_argument('--model-dir', default='models')
+    parser.add_argument('--image-backend', default='eager', choices=['eager', 'optimized', 'compile'])
+    parser.add_argument('--output', help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    if args.pid:
+        result = report(args.pid, child_pids(args.pid))
+    elif args.simulate:
+        result = simulate(args.workers, not args.no_mmap, args.model_dir, args.image_backend)
+        result['mmap_weights'] = not args.no_mmap
+        result['image_backend'] = args.image_backend
+    else:
+        parser.error("pass --pid or --simulate")
+
+    print(f"{'role':<8}{'pid':>8}{'RSS MB':>10}{'PSS MB':>10}{'shared MB':>11}{'private MB':>12}", file=sys.stderr)
+    for p in result['processes']:
+        shared = p.get('shared_clean_mb', 0) + p.get('shared_dirty_mb', 0)
+        private = p.get('private_clean_mb', 0) + p.get('private_dirty_mb', 0)
+        print(f"{p['role']:<8}{p['pid']:>8}{p['rss_mb']:>10}{p['pss_mb']:>10}{shared:>11.1f}{private:>12.1f}", file=sys.stderr)
+    print(f"Total PSS: {result['total_pss_mb']} MB   PSS per worker: {result['pss_per_worker_mb']} MB", file=sys.stderr)
+
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Convert the FP32 image checkpoints into optimized CPU inference artifacts.
+
+Usage:
+    python optimize_models.py --eval-images "holdout/retina/*.png" --model diabetes_retinal
+    python optimize_models.py --model heart_ecg --quantize dynamic --eval-images "holdout/ecg/*.jpg"
+    python optimize_models.py --calibration-images "calib/*.jpg" --eval-images "holdout/*.jpg"
+
+For each model this writes models/<checkpoint>.optimized.pt, which ModelLoader
+loads when IMAGE_MODEL_BACKEND=optimized, and models/<checkpoint>.optimized.json
+with the latency against the FP32 baseline.
+
+Static INT8 is calibrated on --calibration-images (default: the sample images
+at the repo root, padded with flipped and noisy variants). Agreement with FP32
+is only measured on --eval-images, which must not overlap the calibration
+set: scoring the images the quantization ranges were fitted to overstates
+accuracy. Without --eval-images the report has no drift figures.
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+import torch
+import torch.nn as nn
+from utils.image_preprocessing import ImagePreprocessor
+from utils.model_loader import build_diabetes_retinal_model, build_heart_ecg_model
+
+MODELS = {
+    'diabetes_retinal': ('diabetes_retinal_model', build_diabetes_retinal_model),
+    'heart_ecg': ('heart_ecg_model', build_heart_ecg_model)
+}
+
+# Sample images shipped at the repo root, used for calibration when --calibration-images is not given
+DEFAULT_IMAGES = {
+    'diabetes_retinal': ['0024cdab0c1e.png', 'No.png', 'moderate.png'],
+    'heart_ecg': ['heart.jpg', 'Normal(1).jpg']
+}
+
+
+def expand(patterns):
+    paths = []
+    for pattern in patterns:
+        paths.extend(sorted(glob.glob(pattern)))
+    return paths
+
+
+def file_digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def load_calibration(paths, count):
+    """Decode the calibration images and pad the set with flipped / noisy variants up to count"""
+    preprocessor = ImagePreprocessor(size=224, fast_decode=False)
+
+    if paths:
+        base = preprocessor.batch(paths).contiguous().clone()
+    else:
+        print("  WARNING: no sample images found, using random inputs")
+        base = torch.randn(1, 3, 224, 224)
+
+    generator = torch.Generator().manual_seed(0)
+    variants = [base, torch.flip(base, dims=[3])]
+    while sum(len(v) for v in variants) < count:
+        variants.append(base + 0.1 * torch.randn(base.shape, generator=generator))
+    return torch.cat(variants)[:count]
+
+
+def load_evaluation(paths):
+    """Decode the held-out images as they are (no variants: each one is a real input)"""
+    return ImagePreprocessor(size=224, fast_decode=False).batch(paths).contiguous().clone()
+
+
+def quantize(model, mode, calibration):
+    if mode == 'none':
+        return model
+    if mode == 'dynamic':
+        return torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+
+    engine = 'x86' if 'x86' in torch.backends.quantized.supported_engines else 'fbgemm'
+    torch.backends.quantized.engine = engine
+    prepared = prepare_fx(model, get_default_qconfig_mapping(engine), example_inputs=(calibration[:1],))
+    with torch.no_grad():
+        for start in range(0, len(calibration), 8):
+            prepared(calibration[start:start + 8])
+    return convert_fx(prepared)
+
+
+def to_torchscript(model, example):
+    with torch.no_grad():
+        traced = torch.jit.trace(model, example)
+        frozen = torch.jit.freeze(traced)
+        try:
+            return torch.jit.optimize_for_inference(frozen)
+        except Exception as e:
+            print(f"  optimize_for_inference skipped: {e}")
+            return frozen
+
+
+def measure(model, samples, repeats=3):
+    """Return (probabilities, mean milliseconds per image)"""
+    with torch.inference_mode():
+        model(samples[:1])
+        start = time.perf_counter()
+        for _ in range(repeats):
+            logits = model(samples)
+        elapsed = (time.perf_counter() - start) / repeats
+    return torch.softmax(logits, dim=1), elapsed * 1000 / len(samples)
+
+
+def optimize(model_name, args):
+    checkpoint_name, builder = MODELS[model_name]
+    checkpoint_path = os.path.join(args.model_dir, f'{checkpoint_name}.pth')
+    output_path = os.path.join(args.model_dir, f'{checkpoint_name}.optimized.pt')
+    report_path = os.path.join(args.model_dir, f'{checkpoint_name}.optimized.json')
+
+    print(f"\nOptimizing {model_name} ({checkpoint_path})")
+    fp32 = builder()
+    fp32.load_state_dict(torch.load(checkpoint_path, map_location='cpu'))
+    fp32.eval()
+
+    calibration_paths = expand(args.calibration_images or DEFAULT_IMAGES[model_name])
+    eval_paths = expand(args.eval_images or [])
+    if args.eval_images and not eval_paths:
+        sys.exit(f"--eval-images matched no files for {model_name}")
+    shared = {file_digest(path) for path in calibration_paths} & {file_digest(path) for path in eval_paths}
+    if shared:
+        sys.exit(f"{len(shared)} evaluation image(s) are also calibration images; the evaluation set must be held out")
+
+    calibration = load_calibration(calibration_paths, args.samples)
+    calibration_cl = calibration.contiguous(memory_format=torch.channels_last)
+
+    optimized = builder()
+    optimized.load_state_dict(fp32.state_dict())
+    optimized.eval()
+    optimized = optimized.to(memory_format=torch.channels_last)
+    optimized = quantize(optimized, args.quantize, calibration_cl)
+    optimized = to_torchscript(optimized, calibration_cl[:1])
+    torch.jit.save(optimized, output_path)
+    optimized = torch.jit.load(output_path)
+
+    # Latency does not depend on the pixels, so it is measured on whichever set is larger
+    timing = load_evaluation(eval_paths) if len(eval_paths) > len(calibration) else calibration
+    _, fp32_ms = measure(fp32, timing)
+    _, opt_ms = measure(optimized, timing.contiguous(memory_format=torch.channels_last))
+
+    report = {
+        'model': model_name,
+        'quantize': args.quantize,
+        'calibration_samples': len(calibration),
+        'eval_samples': len(eval_paths),
+        'top1_agreement': None,
+        'max_abs_prob_diff': None,
+        'mean_abs_prob_diff': None,
+        'fp32_ms_per_image': round(fp32_ms, 3),
+        'optimized_ms_per_image': round(opt_ms, 3),
+        'speedup': round(fp32_ms / opt_ms, 2) if opt_ms else None,
+        'fp32_size_mb': round(os.path.getsize(checkpoint_path) / 1e6, 2),
+        'optimized_size_mb': round(os.path.getsize(output_path) / 1e6, 2)
+    }
+    if eval_paths:
+        held_out = load_evaluation(eval_paths)
+        fp32_probs, _ = measure(fp32, held_out, repeats=1)
+        opt_probs, _ = measure(optimized, held_out.contiguous(memory_format=torch.channels_last), repeats=1)
+        diff = (fp32_probs - opt_probs).abs()
+        report['top1_agreement'] = float((fp32_probs.argmax(1) == opt_probs.argmax(1)).float().mean())
+        report['max_abs_prob_diff'] = float(diff.max())
+        report['mean_abs_prob_diff'] = float(diff.mean())
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"✓ Saved {output_path}")
+    if eval_paths:
+        print(f"  Top-1 agreement with FP32: {report['top1_agreement'] * 100:.1f}% over {report['eval_samples']} held-out images")
+        print(f"  Max |Δprob|: {report['max_abs_prob_diff']:.4f}   mean |Δprob|: {report['mean_abs_prob_diff']:.4f}")
+    else:
+        print("  Accuracy drift not measured: pass --eval-images with held-out images before enabling this artifact")
+    print(f"  Latency: {report['fp32_ms_per_image']} ms -> {report['optimized_ms_per_image']} ms per image ({report['speedup']}x)")
+    print(f"  Size: {report['fp32_size_mb']} MB -> {report['optimized_size_mb']} MB")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build optimized CPU inference artifacts for the image models")
+    parser.add_argument('--model', choices=sorted(MODELS), action='append', help="Model to convert (default: all)")
+    parser.add_argument('--quantize', choices=['static', 'dynamic', 'none'], default='static')
+    parser.add_argument('--calibration-images', action='append', help="Glob of calibration images (repeatable; default: the repo's samples)")
+    parser.add_argument('--eval-images', action='append', help="Glob of held-out images to measure drift on (repeatable; never the calibration images)")
+    parser.add_argument('--samples', type=int, default=32, help="Number of calibration inputs")
+    parser.add_argument('--model-dir', default='models')
+    args = parser.parse_args()
+
+    torch.set_grad_enabled(False)
+    for model_name in args.model or sorted(MODELS):
+        optimize(model_name, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -96,7 +96,7 @@ function displayResults(data) {
         <div class="blockchain-info">
             <h4>Blockchain Verification</h4>
             <p><strong>Transaction Hash:</strong></p>
-            <code>${data.blockchain_tx}</code>
+            <code id="blockchainTx">${data.blockchain_tx || 'Pending (' + data.blockchain_status + ')'}</code>
             <p><strong>Data Hash:</strong></p>
             <code>${data.data_hash}</code>
             <p><strong>Image Hash (IPFS):</strong></p>
@@ -105,4 +105,35 @@ function displayResults(data) {
     `;
 
     resultContainer.style.display = 'block';
+
+    if (data.record_ticket) {
+        pollRecordStatus(data.record_ticket);
+    }
+}
+
+function pollRecordStatus(ticket, attempt = 0, lastStatus = 'queued') {
+    const txElement = document.getElementById('blockchainTx');
+    if (!txElement || attempt > 120) {
+        return;
+    }
+
+    // wait/status let the ASGI server hold the request until the ticket changes;
+    // the WSGI server ignores them and answers immediately
+    fetch(`/records/${ticket}/status?wait=25&status=${lastStatus}`)
+    .then(response => response.json())
+    .then(status => {
+        if (status.error) {
+            return;
+        }
+        if (status.status === 'failed') {
+            txElement.textContent = `Failed: ${status.error}`;
+        } else if (status.status === 'confirmed') {
+            txElement.textContent = `${status.tx_hash} (confirmed in block ${status.block_number})`;
+        } else {
+            txElement.textContent = status.tx_hash ? `${status.tx_hash} (awaiting confirmation)` : 'Pending (queued)';
+            const delay = status.status === lastStatus ? 3000 : 0;
+            setTimeout(() => pollRecordStatus(ticket, attempt + 1, status.status), delay);
+        }
+    })
+    .catch(() => setTimeout(() => pollRecordStatus(ticket, attempt + 1, lastStatus), 3000));
 }
\ No newline at end of file
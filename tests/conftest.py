@@ -0,0 +1,30 @@
+import importlib
+import os
+import tempfile
+
+import pytest
+
+# config.py reads the environment once, on first import (which some test modules
+# trigger at collection): point all of the app's state at a scratch directory first
+_workdir = tempfile.mkdtemp(prefix='medblock-tests-')
+os.environ.update({
+    'DATABASE_PATH': os.path.join(_workdir, 'users.db'),
+    'IPFS_STORE_DIR': os.path.join(_workdir, 'ipfs_store'),
+    'UPLOAD_FOLDER': os.path.join(_workdir, 'uploads'),
+    'PREDICTION_CACHE_DB': '',
+    'RECORD_TICKET_DB': os.path.join(_workdir, 'record_tickets.db'),
+    'RECORD_INDEX_DB': os.path.join(_workdir, 'record_index.db'),
+    'NONCE_DB': os.path.join(_workdir, 'nonces.db'),
+    'CONTRACT_ARTIFACT_DIR': os.path.join(_workdir, 'contracts'),
+    'DEPLOYMENT_REGISTRY': os.path.join(_workdir, 'deployments.json'),
+    'ALCHEMY_API_KEY': '',
+    'GANACHE_URL': 'http://127.0.0.1:9',
+    'CHAIN_WRITE_MODE': 'record',
+    'WARMUP_MODELS': 'none'
+})
+
+
+@pytest.fixture(scope='session')
+def app_module():
+    """The Flask app module, with no chain and its state in a scratch directory"""
+    return importlib.import_module('app')
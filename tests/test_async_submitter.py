@@ -0,0 +1,105 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+from blockchain.async_submitter import AsyncRecordSubmitter
+from blockchain.ticket_store import TicketStore
+from utils.prediction_cache import PredictionCache
+
+
+class FakeContractManager:
+    """send_record/get_receipt stand-in: each tx is mined on its second receipt lookup"""
+
+    def __init__(self, mined_after=2):
+        self.mined_after = mined_after
+        self.sent = []
+        self.lookups = {}
+        self.sender_threads = set()
+
+    def send_record(self, *record):
+        self.sender_threads.add(threading.current_thread().name)
+        if record[0] == 'BAD':
+            raise ValueError('nonce too low')
+        self.sent.append(record)
+        return '0x%064x' % len(self.sent)
+
+    def get_receipt(self, tx_hash):
+        self.lookups[tx_hash] = self.lookups.get(tx_hash, 0) + 1
+        if self.lookups[tx_hash] < self.mined_after:
+            return None
+        return SimpleNamespace(status=1, blockNumber=7, gasUsed=21000)
+
+
+def test_records_go_through_the_contract_manager_in_order(tmp_path):
+    manager = FakeContractManager()
+    submitter = AsyncRecordSubmitter(manager, TicketStore(str(tmp_path / 'tickets.db')), poll_interval=0.01)
+
+    async def run():
+        submitter.start(asyncio.get_running_loop())
+        tickets = [submitter.submit(f'P{i}', 'heart', 'Normal', 'a', 'b') for i in range(20)]
+        bad = submitter.submit('BAD', 'heart', 'Normal', 'a', 'b')
+        entries = [await submitter.wait(ticket, 5, status='queued') for ticket in tickets]
+        entries = [await submitter.wait(ticket, 5, status='submitted') for ticket in tickets]
+        failed = await submitter.wait(bad, 5, status='queued')
+        await submitter.aclose()
+        return entries, failed
+
+    entries, failed = asyncio.run(run())
+    assert [entry['status'] for entry in entries] == ['confirmed'] * 20
+    assert [record[0] for record in manager.sent] == [f'P{i}' for i in range(20)]
+    assert manager.sender_threads == {'record-sender_0'}
+    assert failed['status'] == 'failed' and failed['error'] == 'nonce too low'
+
+
+def test_tickets_are_shared_between_workers(tmp_path, app_module, monkeypatch):
+    db_path = str(tmp_path / 'tickets.db')
+    # Never mined, so the first worker exits with the ticket still awaiting its receipt
+    first = AsyncRecordSubmitter(FakeContractManager(mined_after=10 ** 6), TicketStore(db_path, lease=60), poll_interval=0.01)
+    second_manager = FakeContractManager(mined_after=1)
+    second = AsyncRecordSubmitter(second_manager, TicketStore(db_path, lease=60), poll_interval=0.01)
+    cache = PredictionCache()
+    monkeypatch.setattr(app_module, 'prediction_cache', cache)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        first.start(loop)
+        second.start(loop)
+        ticket = first.submit('PATIENT_001', 'Diabetes', 'Negative', 'abc', 'Qmdef')
+        submitted = await second.wait(ticket, 5, status='queued')
+
+        # A cache hit served by the other worker sees the ticket and does not write the record again
+        cache.put('key', {
+            'disease': 'Diabetes', 'prediction': 'Negative', 'data_hash': 'abc', 'image_hash': 'Qmdef',
+            'record_ticket': ticket, 'blockchain_tx': None, 'blockchain_status': 'queued'
+        })
+        monkeypatch.setattr(app_module, 'record_submitter', second)
+        hit = await loop.run_in_executor(None, app_module.cached_prediction, 'key', 'PATIENT_001')
+
+        # The first worker exits; the second adopts the unconfirmed ticket and confirms it
+        await first.aclose()
+        confirmed = await second.wait(ticket, 5, status='submitted')
+        await second.aclose()
+        return ticket, submitted, hit, confirmed
+
+    ticket, submitted, hit, confirmed = asyncio.run(run())
+    assert submitted['status'] == 'submitted'
+    assert hit['record_ticket'] == ticket
+    assert second_manager.sent == []
+    assert confirmed['status'] == 'confirmed'
+    assert confirmed['tx_hash'] == submitted['tx_hash']
+
+
+def test_queued_records_are_sent_before_exit(tmp_path):
+    store = TicketStore(str(tmp_path / 'tickets.db'))
+    manager = FakeContractManager()
+    submitter = AsyncRecordSubmitter(manager, store, poll_interval=0.01)
+
+    async def run():
+        submitter.start(asyncio.get_running_loop())
+        tickets = [submitter.submit(f'P{i}', 'heart', 'Normal', 'a', 'b') for i in range(10)]
+        await submitter.aclose()
+        return tickets
+
+    tickets = asyncio.run(run())
+    assert len(manager.sent) == 10
+    assert {store.get(ticket)['status'] for ticket in tickets} <= {'submitted', 'confirmed'}
@@ -0,0 +1,73 @@
+import multiprocessing
+import sqlite3
+import threading
+
+import pytest
+
+import auth
+import config
+from utils.password_hasher import PasswordHasher
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'DATABASE_PATH', str(tmp_path / 'users.db'))
+    monkeypatch.setattr(auth, 'hasher', PasswordHasher(rounds=4, workers=2, max_pending=8, timeout=10))
+    auth.init_db()
+    return config.DATABASE_PATH
+
+
+def test_each_thread_keeps_its_own_wal_connection(database):
+    conn = auth.get_connection()
+    assert auth.get_connection() is conn
+    assert conn.execute('PRAGMA journal_mode').fetchone() == ('wal',)
+    assert conn.execute('PRAGMA synchronous').fetchone() == (1,)
+
+    others = []
+    threads = [threading.Thread(target=lambda: others.append(auth.get_connection())) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(other) for other in others + [conn]}) == 4
+
+
+def test_switching_databases_opens_a_new_connection(database, tmp_path, monkeypatch):
+    conn = auth.get_connection()
+    monkeypatch.setattr(config, 'DATABASE_PATH', str(tmp_path / 'other.db'))
+    assert auth.get_connection() is not conn
+
+
+def _reuses_parent_connection(parent_id, result):
+    result.put(id(auth.get_connection()) == parent_id)
+
+
+def test_forked_worker_does_not_reuse_the_parent_connection(database):
+    conn = auth.get_connection()
+    context = multiprocessing.get_context('fork')
+    result = context.Queue()
+    worker = context.Process(target=_reuses_parent_connection, args=(id(conn), result))
+    worker.start()
+    worker.join(10)
+    assert worker.exitcode == 0
+    assert result.get(timeout=1) is False
+
+
+def test_users_written_on_one_thread_are_read_on_another(database):
+    assert auth.create_user('Ada', 'ada@example.com', 'secret')
+    assert not auth.create_user('Ada again', 'ada@example.com', 'other')
+
+    found = []
+    reader = threading.Thread(target=lambda: found.append(auth.verify_user('ada@example.com', 'secret')))
+    reader.start()
+    reader.join()
+    assert found[0]['name'] == 'Ada'
+    assert auth.get_user_by_id(found[0]['id'])['email'] == 'ada@example.com'
+    assert auth.verify_user('ada@example.com', 'wrong') is None
+
+
+def test_email_index_is_added_to_legacy_tables(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / 'legacy.db'))
+    conn.execute('CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, email TEXT, password TEXT)')
+    assert auth.ensure_email_index(conn) is False
+    assert auth.ensure_email_index(conn) is True
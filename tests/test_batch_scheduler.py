@@ -0,0 +1,127 @@
+import io
+import threading
+import time
+from concurrent.futures import Future
+
+import pytest
+
+from utils.batch_scheduler import BatchScheduler, wait_or_cancel
+
+
+class FakeModelLoader:
+    """Batch handlers that record every batch they are given.
+
+    Images are binary file objects; a batch fails if any of them reads b'bad'.
+    Set hold to block the handler until release is set.
+    """
+
+    def __init__(self):
+        self.batches = []
+        self.hold = False
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def predict_diabetes_image_batch(self, images):
+        contents = [image.read() for image in images]
+        self.batches.append(contents)
+        if self.hold:
+            self.entered.set()
+            self.release.wait(5)
+        if b'bad' in contents:
+            raise ValueError('cannot identify image file')
+        return [{'prediction': content.decode()} for content in contents]
+
+    predict_heart_image_batch = predict_diabetes_image_batch
+
+
+@pytest.fixture
+def loader():
+    return FakeModelLoader()
+
+
+def scheduler_for(loader, **kwargs):
+    scheduler = BatchScheduler(loader, **kwargs)
+    scheduler._ensure_worker('diabetes_retinal')
+    return scheduler
+
+
+def submit_all(scheduler, *contents):
+    return [scheduler.submit('diabetes_retinal', io.BytesIO(content)) for content in contents]
+
+
+def test_full_batch_flushes_without_waiting(loader):
+    scheduler = scheduler_for(loader, max_batch_size=3, max_wait_ms=10000)
+    started = time.monotonic()
+    futures = submit_all(scheduler, b'a', b'b', b'c')
+
+    assert [future.result(timeout=5)['prediction'] for future in futures] == ['a', 'b', 'c']
+    assert time.monotonic() - started < 5
+    assert loader.batches == [[b'a', b'b', b'c']]
+    scheduler.shutdown()
+
+
+def test_partial_batch_flushes_after_max_wait(loader):
+    scheduler = scheduler_for(loader, max_batch_size=8, max_wait_ms=50)
+    started = time.monotonic()
+    futures = submit_all(scheduler, b'a', b'b')
+
+    assert [future.result(timeout=5)['prediction'] for future in futures] == ['a', 'b']
+    assert time.monotonic() - started >= 0.05
+    assert loader.batches == [[b'a', b'b']]
+    scheduler.shutdown()
+
+
+def test_cancelled_requests_are_dropped_before_the_forward_pass(loader):
+    scheduler = scheduler_for(loader, max_batch_size=4, max_wait_ms=0)
+    loader.hold = True
+    first, = submit_all(scheduler, b'first')
+    assert loader.entered.wait(5)
+
+    # Queued behind the running batch; one caller gives up before it is picked up
+    gone, kept = submit_all(scheduler, b'gone', b'kept')
+    assert gone.cancel()
+    loader.release.set()
+
+    assert first.result(timeout=5)['prediction'] == 'first'
+    assert kept.result(timeout=5)['prediction'] == 'kept'
+    assert loader.batches == [[b'first'], [b'kept']]
+    scheduler.shutdown()
+
+
+def test_failed_batch_falls_back_to_one_image_at_a_time(loader):
+    scheduler = scheduler_for(loader, max_batch_size=3, max_wait_ms=10000)
+    good, bad, other = submit_all(scheduler, b'good', b'bad', b'other')
+
+    assert good.result(timeout=5)['prediction'] == 'good'
+    assert other.result(timeout=5)['prediction'] == 'other'
+    with pytest.raises(ValueError, match='cannot identify image file'):
+        bad.result(timeout=5)
+    # Every upload is rewound before it is read again on its own
+    assert loader.batches == [[b'good', b'bad', b'other'], [b'good'], [b'bad'], [b'other']]
+    scheduler.shutdown()
+
+
+def test_wait_or_cancel_cancels_on_timeout():
+    future = Future()
+    with pytest.raises(TimeoutError):
+        wait_or_cancel(future, 0.05)
+    assert future.cancelled()
+
+    done = Future()
+    done.set_result('ok')
+    assert wait_or_cancel(done, 0.05) == 'ok'
+
+
+def test_predict_times_out_and_frees_the_slot(loader):
+    scheduler = scheduler_for(loader, max_batch_size=4, max_wait_ms=0, request_timeout=0.05)
+    loader.hold = True
+    running, = submit_all(scheduler, b'running')
+    assert loader.entered.wait(5)
+
+    with pytest.raises(TimeoutError):
+        scheduler.predict_diabetes_image(io.BytesIO(b'late'))
+    loader.release.set()
+
+    assert running.result(timeout=5)['prediction'] == 'running'
+    scheduler.shutdown()
+    assert loader.batches == [[b'running']]
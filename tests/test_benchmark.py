@@ -0,0 +1,27 @@
+from types import SimpleNamespace
+
+from benchmark import drain_chain
+from blockchain.record_submitter import RecordSubmitter
+from blockchain.ticket_store import TicketStore
+
+
+class FakeContractManager:
+    def send_record(self, *record):
+        if record[0] == 'BAD':
+            raise ValueError('reverted')
+        return '0x01'
+
+    def get_receipt(self, tx_hash):
+        return SimpleNamespace(status=1, blockNumber=3, gasUsed=21000)
+
+
+def test_drain_counts_tickets_from_the_store(tmp_path):
+    submitter = RecordSubmitter(FakeContractManager(), TicketStore(str(tmp_path / 'tickets.db')), poll_interval=0.01)
+    for patient in ('P1', 'P2', 'BAD'):
+        submitter.submit(patient, 'heart', 'Normal', 'a', 'b')
+
+    phase = {}
+    drain_chain(SimpleNamespace(record_submitter=submitter), 5, phase)
+    submitter.shutdown(timeout=5)
+
+    assert phase == {'tickets': {'confirmed': 2, 'failed': 1}, 'pending': 0}
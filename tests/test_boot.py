@@ -0,0 +1,18 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_app_import_leaves_heavy_packages_unloaded():
+    # A fresh interpreter, with the scratch environment conftest set up
+    code = (
+        "import sys, app\n"
+        "heavy = sorted({'torch', 'pandas', 'solcx', 'web3'} & {name.split('.')[0] for name in sys.modules})\n"
+        "assert not heavy, heavy\n"
+        "app.contract_manager.rpc_stats()\n"
+        "assert 'web3' not in sys.modules\n"
+    )
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=dict(os.environ), capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr[-2000:]
@@ -0,0 +1,89 @@
+import csv
+import io
+
+import numpy as np
+import pytest
+
+from utils.bulk_scoring import FEATURE_COLUMNS, iter_feature_chunks, score_to_records, write_scores
+from utils.model_loader import ModelLoader
+
+
+class FakeScaler:
+    def __init__(self, mean, scale):
+        self.mean = mean
+        self.scale = scale
+        self.n_features_in_ = len(mean)
+
+    def transform(self, rows):
+        return (np.asarray(rows) - self.mean) / self.scale
+
+
+class FakeClassifier:
+    """Logistic model over the scaled features; remembers how many rows each call got"""
+
+    def __init__(self, weights):
+        self.weights = weights
+        self.calls = []
+
+    def predict_proba(self, rows):
+        self.calls.append(len(rows))
+        positive = 1 / (1 + np.exp(-(rows @ self.weights)))
+        return np.column_stack([1 - positive, positive])
+
+
+@pytest.fixture
+def loader(tmp_path):
+    loader = ModelLoader(model_dir=str(tmp_path), tabular_engine='sklearn')
+    loader._measure_footprint = lambda key: 0
+    features = len(FEATURE_COLUMNS['heart'])
+    rng = np.random.default_rng(0)
+    classifier = FakeClassifier(rng.normal(size=features))
+
+    def load():
+        loader.models['heart_xgb'] = classifier
+        loader.scalers['heart'] = FakeScaler(rng.normal(50, 10, features), rng.uniform(1, 20, features))
+
+    loader._loaders['heart_xgb'] = load
+    return loader
+
+
+def heart_csv(rows=103, seed=1):
+    rng = np.random.default_rng(seed)
+    # Shuffled columns, odd spacing and a label column, as exported files tend to have
+    header = list(reversed(FEATURE_COLUMNS['heart'])) + ['target']
+    lines = [[f' {name} ' for name in header]]
+    for _ in range(rows):
+        lines.append([f'{value:.3f}' for value in rng.normal(50, 25, len(header) - 1)] + ['1'])
+    output = io.StringIO()
+    csv.writer(output).writerows(lines)
+    return output.getvalue()
+
+
+def test_chunks_follow_the_header_order():
+    chunks = list(iter_feature_chunks(io.StringIO(heart_csv(rows=10)), 'heart', chunk_size=4))
+    assert [len(chunk) for chunk in chunks] == [4, 4, 2]
+    first = next(csv.reader(io.StringIO(heart_csv(rows=10)).readlines()[1:2]))
+    assert chunks[0][0].tolist() == [float(value) for value in reversed(first[:-1])]
+
+
+def test_chunked_scoring_matches_a_single_pass(loader):
+    text = heart_csv()
+    whole = io.StringIO()
+    assert write_scores(loader, 'heart', io.StringIO(text), whole, chunk_size=10 ** 6) == 103
+    chunked = io.StringIO()
+    assert write_scores(loader, 'heart', io.StringIO(text), chunked, chunk_size=10) == 103
+
+    assert chunked.getvalue() == whole.getvalue()
+    assert loader.models['heart_xgb'].calls == [103] + [10] * 10 + [3]
+
+    rows = list(csv.DictReader(io.StringIO(whole.getvalue())))
+    records = score_to_records(loader, 'heart', io.StringIO(text), chunk_size=7)
+    assert [str(record['row']) for record in records] == [row['row'] for row in rows]
+    assert [record['prediction'] for record in records] == [row['prediction'] for row in rows]
+    assert [record['confidence'] for record in records] == [float(row['confidence']) for row in rows]
+    assert [record['risk_level'] for record in records] == [row['risk_level'] for row in rows]
+
+
+def test_missing_feature_columns_are_reported():
+    with pytest.raises(ValueError, match='missing columns for heart: thal'):
+        list(iter_feature_chunks(io.StringIO(heart_csv(rows=1).replace('thal ', 'thallium ')), 'heart'))
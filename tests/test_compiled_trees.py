@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from utils.compiled_trees import CompiledForest, fold_threshold, probe_rows, verify
+
+
+@pytest.mark.parametrize('mean, scale', [(0.0, 1.0), (120.5, 31.7), (-3.25, 0.013)])
+def test_folded_threshold_is_the_exact_split_point(mean, scale):
+    rng = np.random.default_rng(0)
+    for threshold in rng.standard_normal(200).astype(np.float32) * 3:
+        raw = fold_threshold(threshold, mean, scale)
+        # XGBoost goes left when float32(scaled) < threshold: raw is the first value that goes right
+        assert np.float32((raw - mean) / scale) >= threshold
+        below = np.nextafter(raw, -np.inf)
+        assert np.float32((below - mean) / scale) < threshold
+
+
+def training_data(rows=400, features=6, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(loc=[100, 5, 0, 30, 1, 70][:features], scale=[20, 2, 1, 8, 0.5, 12][:features], size=(rows, features))
+    y = (X[:, 0] / 20 + X[:, 1] - X[:, 3] / 8 + rng.normal(0, 0.5, rows) > 2.0).astype(int)
+    # Missing values while training, so the trees learn default directions
+    X[rng.random(X.shape) < 0.05] = np.nan
+    return X, y
+
+
+@pytest.fixture(scope='module')
+def fitted():
+    xgboost = pytest.importorskip('xgboost')
+    preprocessing = pytest.importorskip('sklearn.preprocessing')
+    X, y = training_data()
+    scaler = preprocessing.StandardScaler().fit(X)
+    scaled = xgboost.XGBClassifier(n_estimators=40, max_depth=4, learning_rate=0.3, random_state=0)
+    scaled.fit(scaler.transform(X), y)
+    raw = xgboost.XGBClassifier(n_estimators=25, max_depth=5, random_state=1)
+    raw.fit(X, y)
+    return X, scaler, scaled, raw
+
+
+def test_matches_predict_proba_without_a_scaler(fitted):
+    X, _, _, model = fitted
+    forest = CompiledForest.from_xgb(model)
+    rows = np.vstack([X, probe_rows(forest)])
+    assert np.allclose(forest.predict_proba(rows), model.predict_proba(rows), rtol=0, atol=1e-6)
+
+
+def test_matches_predict_proba_with_the_scaler_folded_in(fitted):
+    X, scaler, model, _ = fitted
+    forest = CompiledForest.from_xgb(model, scaler)
+    rows = np.vstack([X, probe_rows(forest, scaler)])
+    assert np.allclose(forest.predict_proba(rows), model.predict_proba(scaler.transform(rows)), rtol=0, atol=1e-6)
+    summary = verify(forest, model, scaler, rows)
+    assert summary['labels_match']
+    assert summary['max_abs_diff'] <= 1e-6
+
+
+def test_missing_values_follow_the_default_branch(fitted):
+    X, scaler, model, _ = fitted
+    forest = CompiledForest.from_xgb(model, scaler)
+    rows = np.repeat(np.nanmean(X, axis=0)[None, :], X.shape[1] + 1, axis=0)
+    for feature in range(X.shape[1]):
+        rows[feature + 1, feature] = np.nan
+    # One row with every value missing, one missing per feature, and a complete row
+    rows = np.vstack([rows, np.full((1, X.shape[1]), np.nan)])
+    assert np.isnan(rows).any()
+    assert np.allclose(forest.predict_proba(rows), model.predict_proba(scaler.transform(rows)), rtol=0, atol=1e-6)
+    # A single row goes through the same path as a batch
+    assert np.allclose(forest.predict_proba(rows[1]), model.predict_proba(scaler.transform(rows[1:2])), rtol=0, atol=1e-6)
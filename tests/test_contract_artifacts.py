@@ -0,0 +1,109 @@
+import json
+import os
+import sys
+import types
+
+import pytest
+
+import config
+from blockchain.contract_artifacts import DeploymentRegistry, build_artifact, load_artifact, source_hash
+from blockchain.contract_manager import ContractManager
+
+SOURCE = 'pragma solidity ^0.8.0;\ncontract MedicalRecord { uint256 public count; }\n'
+ABI = [{'type': 'function', 'name': 'count', 'inputs': [], 'outputs': [{'type': 'uint256'}]}]
+
+
+@pytest.fixture
+def compiler(monkeypatch):
+    """Stands in for py-solc-x so a cache miss needs no compiler download"""
+    compiled = []
+
+    def compile_source(source, output_values, solc_version):
+        compiled.append(source)
+        return {'<stdin>:MedicalRecord': {'abi': ABI, 'bin': '6080%04x' % len(compiled)}}
+
+    solcx = types.ModuleType('solcx')
+    solcx.compile_source = compile_source
+    solcx.install_solc = lambda version, show_progress=False: None
+    solcx.set_solc_version = lambda version: None
+    monkeypatch.setitem(sys.modules, 'solcx', solcx)
+    return compiled
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / 'MedicalRecord.sol'
+    path.write_text(SOURCE)
+    return str(path)
+
+
+def test_artifact_is_compiled_once_per_source(compiler, source, tmp_path):
+    artifact_dir = str(tmp_path / 'artifacts')
+    assert load_artifact(source, artifact_dir) is None
+
+    built = build_artifact(source, artifact_dir)
+    assert built['contract'] == 'MedicalRecord'
+    assert built['source_hash'] == source_hash(source)
+    assert build_artifact(source, artifact_dir) == built
+    assert load_artifact(source, artifact_dir) == built
+    assert len(compiler) == 1
+
+    # A different compiler version is a different artifact
+    assert load_artifact(source, artifact_dir, solc_version='0.8.19') is None
+
+
+def test_changed_source_invalidates_the_artifact(compiler, source, tmp_path):
+    artifact_dir = str(tmp_path / 'artifacts')
+    first = build_artifact(source, artifact_dir)
+
+    with open(source, 'a') as f:
+        f.write('// audit fix\n')
+    assert load_artifact(source, artifact_dir) is None
+    second = build_artifact(source, artifact_dir)
+
+    assert len(compiler) == 2
+    assert second['source_hash'] != first['source_hash']
+    assert second['bytecode'] != first['bytecode']
+    assert sorted(os.listdir(artifact_dir)) == sorted(
+        f"MedicalRecord.{artifact['source_hash'][:16]}.json" for artifact in (first, second)
+    )
+
+
+def test_registry_round_trip(tmp_path):
+    path = str(tmp_path / 'deploy' / 'deployments.json')
+    registry = DeploymentRegistry(path)
+    assert registry.get('sepolia') is None
+
+    sepolia = {'address': '0x' + '11' * 20, 'abi': ABI, 'source_hash': 'abc', 'block': 7}
+    registry.record('sepolia', sepolia)
+    registry.record('ganache', dict(sepolia, address='0x' + '22' * 20))
+
+    reopened = DeploymentRegistry(path)
+    assert reopened.get('sepolia') == sepolia
+    assert reopened.get('ganache')['address'] == '0x' + '22' * 20
+    assert os.listdir(os.path.dirname(path)) == ['deployments.json']
+    with open(path) as f:
+        assert sorted(json.load(f)) == ['ganache', 'sepolia']
+
+
+def test_deployment_of_an_older_source_is_not_loaded(source, tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'CONTRACT_SOURCE', source)
+    monkeypatch.setattr(config, 'CONTRACT_ADDRESS', None)
+    monkeypatch.setattr(config, 'CONTRACT_ABI', None)
+    monkeypatch.setattr(config, 'BLOCKCHAIN_NETWORK', 'sepolia')
+    monkeypatch.setattr(config, 'DEPLOYMENT_REGISTRY', str(tmp_path / 'deployments.json'))
+    address = '0x' + '11' * 20
+    DeploymentRegistry(config.DEPLOYMENT_REGISTRY).record(
+        'sepolia', {'address': address, 'abi': ABI, 'source_hash': source_hash(source)}
+    )
+
+    contract_manager = ContractManager(nonce_db=str(tmp_path / 'nonces.db'))
+    assert contract_manager.load_deployment()
+    assert contract_manager.contract_address == address
+
+    # A fresh worker: nothing loaded into config yet
+    monkeypatch.setattr(config, 'CONTRACT_ADDRESS', None)
+    monkeypatch.setattr(config, 'CONTRACT_ABI', None)
+    with open(source, 'a') as f:
+        f.write('// audit fix\n')
+    assert not ContractManager(nonce_db=str(tmp_path / 'nonces.db')).load_deployment()
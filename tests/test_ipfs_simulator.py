@@ -0,0 +1,37 @@
+import multiprocessing
+
+from blockchain.ipfs_simulator import IPFSSimulator
+
+
+def _store_same_content(store_dir, count):
+    store = IPFSSimulator(store_dir=store_dir, max_bytes=None)
+    for i in range(count):
+        store.add_bytes(b'%d' % (i % 5) * 1000)
+
+
+def test_concurrent_workers_store_identical_content_once(tmp_path):
+    store_dir = str(tmp_path / 'store')
+    IPFSSimulator(store_dir=store_dir)
+    context = multiprocessing.get_context('fork')
+    workers = [context.Process(target=_store_same_content, args=(store_dir, 50)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(30)
+    assert [worker.exitcode for worker in workers] == [0, 0, 0, 0]
+
+    store = IPFSSimulator(store_dir=store_dir)
+    assert store.total_bytes() == 5 * 1000
+    assert store.get_file(store.add_bytes(b'0' * 1000)) is not None
+
+
+def test_eviction_counts_blobs_from_other_workers(tmp_path):
+    store_dir = str(tmp_path / 'store')
+    first = IPFSSimulator(store_dir=store_dir, max_bytes=2500)
+    second = IPFSSimulator(store_dir=store_dir, max_bytes=2500)
+    first.add_bytes(b'a' * 1000)
+    second.add_bytes(b'b' * 1000)
+    newest = first.add_bytes(b'c' * 1000)
+
+    assert first.total_bytes() == second.total_bytes() == 2000
+    assert second.get_file(newest) is not None
@@ -0,0 +1,152 @@
+import os
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from blockchain.merkle_batcher import (
+    MerkleBatcher,
+    MerkleTicketStore,
+    _hash_pair,
+    build_tree,
+    leaf_hash,
+    merkle_proof,
+    record_hash,
+    verify_proof,
+)
+
+
+def sample_records(count):
+    return [(f'P{i:04d}', 'heart', 'Normal', f'Qm{i:044d}', f'Qm{i + 1:044d}') for i in range(count)]
+
+
+@pytest.mark.parametrize('count', [1, 2, 3, 5, 8, 13])
+def test_every_proof_verifies(count):
+    hashes = [record_hash(*record) for record in sample_records(count)]
+    levels = build_tree([leaf_hash(h) for h in hashes])
+    root = levels[-1][0]
+    for index, h in enumerate(hashes):
+        assert verify_proof(h, merkle_proof(levels, index), root)
+
+
+def test_internal_node_is_not_a_leaf():
+    hashes = [record_hash(*record) for record in sample_records(4)]
+    levels = build_tree([leaf_hash(h) for h in hashes])
+    root = levels[-1][0]
+    # The parent of leaves 0 and 1, presented as a record with the remaining path
+    node = levels[1][0]
+    assert _hash_pair(levels[0][0], levels[0][1]) == node
+    assert not verify_proof(node, [levels[1][1]], root)
+    # A leaf is not a record hash either
+    assert not verify_proof(levels[0][0], merkle_proof(levels, 0), root)
+
+
+def test_wrong_record_fails():
+    hashes = [record_hash(*record) for record in sample_records(3)]
+    levels = build_tree([leaf_hash(h) for h in hashes])
+    assert not verify_proof(record_hash('P9999', 'heart', 'Normal', 'Qm', 'Qm'), merkle_proof(levels, 0), levels[-1][0])
+
+
+class FakeChain:
+    """send_batch_root/get_receipt stand-in that confirms every root on the next poll"""
+
+    def __init__(self):
+        self.roots = []
+
+    def send_batch_root(self, root, count):
+        self.roots.append(root)
+        return '0x%064x' % len(self.roots)
+
+    def get_receipt(self, tx_hash):
+        return SimpleNamespace(status=1, blockNumber=10, gasUsed=50000, tx_hash=tx_hash)
+
+    def batch_id_from_receipt(self, receipt):
+        return int(receipt.tx_hash, 16) - 1
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_proofs_are_persisted_with_batch_id(tmp_path):
+    db_path = str(tmp_path / 'tickets.db')
+    chain = FakeChain()
+    batcher = MerkleBatcher(chain, MerkleTicketStore(db_path), max_batch_size=3, max_wait=60, poll_interval=0.05)
+    records = sample_records(3)
+    tickets = [batcher.submit(*record) for record in records]
+    assert wait_for(lambda: all(batcher.status(t)['status'] == 'confirmed' for t in tickets))
+    batcher.shutdown(timeout=5)
+
+    # A fresh store (another worker) sees the same proofs
+    store = MerkleTicketStore(db_path)
+    root = chain.roots[0]
+    for ticket, record in zip(tickets, records):
+        h = record_hash(*record)
+        entry = store.get_proof(ticket)
+        assert entry['batch_id'] == 0
+        assert entry['merkle_root'] == '0x' + root.hex()
+        assert verify_proof(h, [bytes.fromhex(node[2:]) for node in entry['proof']], root)
+        assert store.find_proof('0x' + h.hex())['batch_id'] == 0
+
+    # Trimming finished tickets keeps the proofs
+    store.trim(0)
+    assert store.get(tickets[0]) is None
+    assert store.get_proof(tickets[0])['batch_id'] == 0
+
+
+def test_queued_records_are_adopted(tmp_path):
+    db_path = str(tmp_path / 'tickets.db')
+    orphaned = MerkleTicketStore(db_path, lease=0.1)
+    orphaned.heartbeat()
+    orphaned.create('dead-worker-ticket', sample_records(1)[0])
+
+    time.sleep(0.2)
+    chain = FakeChain()
+    batcher = MerkleBatcher(chain, MerkleTicketStore(db_path, lease=0.1), max_batch_size=1, poll_interval=0.05)
+    batcher.start()
+    assert wait_for(lambda: batcher.status('dead-worker-ticket')['status'] == 'confirmed')
+    assert batcher.status('dead-worker-ticket')['proof'] == []
+    batcher.shutdown(timeout=5)
+
+
+@pytest.fixture(scope='module')
+def deployed(tmp_path_factory):
+    """MedicalRecord on an in-process eth-tester chain (skipped when solc is unavailable)"""
+    pytest.importorskip('eth_tester')
+    from blockchain.contract_artifacts import build_artifact
+    from blockchain.contract_manager import ContractManager
+    from benchmark import start_chain
+    from gas_benchmark import deploy
+
+    contracts = {}
+    for source in ('contracts/MedicalRecord.sol', 'contracts/MedicalRecordV2.sol'):
+        try:
+            artifact = build_artifact(source, str(tmp_path_factory.mktemp('artifacts')))
+        except Exception as e:
+            pytest.skip(f"Cannot compile {source}: {e}")
+        w3, account, private_key = start_chain()
+        contract_manager = ContractManager(w3=w3, account=account, private_key=private_key)
+        deploy(contract_manager, artifact)
+        contracts[os.path.basename(source)] = contract_manager
+    return contracts
+
+
+@pytest.mark.parametrize('contract', ['MedicalRecord.sol', 'MedicalRecordV2.sol'])
+def test_contract_accepts_python_proofs(deployed, contract):
+    contract_manager = deployed[contract]
+    hashes = [record_hash(*record) for record in sample_records(5)]
+    levels = build_tree([leaf_hash(h) for h in hashes])
+    tx_hash = contract_manager.send_batch_root(levels[-1][0], len(hashes))
+    receipt = contract_manager.w3.eth.wait_for_transaction_receipt(tx_hash)
+    batch_id = contract_manager.batch_id_from_receipt(receipt)
+
+    for index, h in enumerate(hashes):
+        assert contract_manager.verify_record(batch_id, h, merkle_proof(levels, index))
+    # Leaves and internal nodes are not valid record hashes
+    assert not contract_manager.verify_record(batch_id, levels[0][0], merkle_proof(levels, 0))
+    assert not contract_manager.verify_record(batch_id, levels[1][0], [levels[1][1], levels[2][1]])
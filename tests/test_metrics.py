@@ -0,0 +1,64 @@
+import threading
+
+from utils import metrics
+from utils.metrics import Registry, server_timing
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    latency = registry.histogram('request_seconds', 'Request latency', ('route',), buckets=(0.5, 0.1, 1.0))
+    for value in (0.05, 0.1, 0.3, 2.0):
+        latency.observe(value, route='/predict')
+
+    assert registry.render() == '\n'.join([
+        '# HELP request_seconds Request latency',
+        '# TYPE request_seconds histogram',
+        'request_seconds_bucket{route="/predict",le="0.1"} 2',
+        'request_seconds_bucket{route="/predict",le="0.5"} 3',
+        'request_seconds_bucket{route="/predict",le="1.0"} 3',
+        'request_seconds_bucket{route="/predict",le="+Inf"} 4',
+        'request_seconds_sum{route="/predict"} 2.45',
+        'request_seconds_count{route="/predict"} 4',
+    ]) + '\n'
+
+
+def test_label_values_are_escaped():
+    registry = Registry()
+    errors = registry.counter('errors_total', 'Errors', ('message', 'kind'))
+    errors.inc(message='bad "nonce"\\n\nretry', kind='rpc')
+    errors.inc(2)
+
+    samples = registry.render().splitlines()[2:]
+    assert samples == [
+        'errors_total{message="bad \\"nonce\\"\\\\n\\nretry",kind="rpc"} 1.0',
+        'errors_total{message="",kind=""} 2.0',
+    ]
+
+
+def test_registering_a_name_twice_returns_the_same_metric():
+    registry = Registry()
+    assert registry.gauge('queue_depth', 'Depth') is registry.gauge('queue_depth', 'Depth')
+    registry.gauge('queue_depth', 'Depth').set(3)
+    assert registry.render().splitlines()[2] == 'queue_depth 3.0'
+
+
+def test_server_timing_sums_repeated_stages():
+    spans = [('decode', 0.0012), ('forward', 0.020), ('decode', 0.0008), ('ipfs', float('nan'))]
+    assert server_timing(spans, total=0.0305) == 'decode;dur=2.0, forward;dur=20.0, total;dur=30.5'
+    assert server_timing([]) == ''
+
+
+def test_spans_follow_the_request_into_bound_threads():
+    spans = metrics.start_request()
+    with metrics.span('parse'):
+        pass
+    worker = threading.Thread(target=metrics.bind(lambda: metrics.record_span('xgboost', 0.25)))
+    worker.start()
+    worker.join()
+    # A thread that was not bound records into no request
+    stray = threading.Thread(target=lambda: metrics.record_span('stray', 1.0))
+    stray.start()
+    stray.join()
+
+    assert [stage for stage, _ in spans] == ['parse', 'xgboost']
+    assert spans[1] == ('xgboost', 0.25)
@@ -0,0 +1,173 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+import weakref
+
+import numpy as np
+import pytest
+
+from utils.image_preprocessing import ImagePreprocessor
+from utils.model_loader import ModelLoader
+
+
+@pytest.fixture
+def loader(tmp_path):
+    loader = ModelLoader(model_dir=str(tmp_path))
+    loader._measure_footprint = lambda key: 0
+    return loader
+
+
+def test_cold_load_does_not_block_resident_models(loader):
+    loading = threading.Event()
+    finish = threading.Event()
+
+    def slow_load():
+        loading.set()
+        finish.wait(5)
+        loader.models['heart_ecg'] = 'ecg model'
+        loader.preprocessors['heart_ecg'] = 'ecg preprocessor'
+
+    loader._loaders['heart_ecg'] = slow_load
+    loader._loaders['heart_xgb'] = lambda: loader.models.update(heart_xgb='xgb model')
+    loader._acquire('heart_xgb')
+
+    cold = threading.Thread(target=loader._acquire, args=('heart_ecg',))
+    cold.start()
+    assert loading.wait(5)
+
+    resident = []
+    warm = threading.Thread(target=lambda: resident.append(loader._acquire('heart_xgb')))
+    warm.start()
+    warm.join(1)
+    assert resident == ['xgb model']
+
+    finish.set()
+    cold.join(5)
+    model, preprocessor = loader._acquire('heart_ecg', companions=lambda: loader.preprocessors['heart_ecg'])
+    assert (model, preprocessor) == ('ecg model', 'ecg preprocessor')
+
+
+def test_concurrent_requests_load_a_model_once(loader):
+    calls = []
+    started = threading.Event()
+
+    def load():
+        calls.append(1)
+        started.wait(0.2)
+        loader.models['diabetes_xgb'] = 'model'
+
+    loader._loaders['diabetes_xgb'] = load
+    threads = [threading.Thread(target=loader._acquire, args=('diabetes_xgb',)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    started.set()
+    for thread in threads:
+        thread.join(5)
+    assert calls == [1]
+    assert loader.model_states['diabetes_xgb'] == 'loaded'
+
+
+def test_failed_load_is_retried_from_scratch(loader):
+    attempts = []
+
+    def load():
+        attempts.append(1)
+        loader.models['diabetes_xgb'] = 'partial'
+        if len(attempts) == 1:
+            raise OSError('scaler missing')
+
+    loader._loaders['diabetes_xgb'] = load
+    with pytest.raises(OSError):
+        loader._acquire('diabetes_xgb')
+    assert 'diabetes_xgb' not in loader.models
+    assert loader._acquire('diabetes_xgb') == 'partial'
+    assert len(attempts) == 2
+
+
+def test_evicted_image_model_takes_its_preprocessor_along(tmp_path):
+    loader = ModelLoader(model_dir=str(tmp_path), memory_budget_mb=1)
+    loader._estimate_footprint = lambda key: 600 * 1024
+    loader._measure_footprint = lambda key: 600 * 1024
+
+    def image_loader(key):
+        def load():
+            loader.models[key] = object()
+            loader.preprocessors[key] = ImagePreprocessor(size=8, workers=2)
+        return load
+
+    for key in ('heart_ecg', 'diabetes_retinal'):
+        loader._loaders[key] = image_loader(key)
+    loader._acquire('heart_ecg')
+    preprocessor = weakref.ref(loader.preprocessors['heart_ecg'])
+
+    # Both do not fit in the budget, so loading the second evicts the first
+    loader._acquire('diabetes_retinal')
+    assert loader.model_states['heart_ecg'] == 'evicted'
+    assert set(loader.preprocessors) == {'diabetes_retinal'}
+    assert preprocessor() is None
+
+    _, reloaded = loader._acquire('heart_ecg', companions=lambda: loader.preprocessors['heart_ecg'])
+    assert isinstance(reloaded, ImagePreprocessor)
+    assert set(loader.preprocessors) == {'heart_ecg'}
+
+
+class ZeroScaler:
+    n_features_in_ = 13
+
+    def transform(self, rows):
+        return rows
+
+
+class ConstantModel:
+    def predict_proba(self, rows):
+        return np.tile([0.9, 0.1], (len(rows), 1))
+
+
+def test_failed_warmup_is_retried_until_ready(loader, app_module, monkeypatch):
+    attempts = []
+    checked = threading.Event()
+
+    def load():
+        attempts.append(time.monotonic())
+        if len(attempts) < 3:
+            raise OSError('heart_xgboost_model.pkl is still syncing')
+        # Hold the successful attempt until the test has seen the worker unready
+        checked.wait(5)
+        loader.models['heart_xgb'] = ConstantModel()
+        loader.scalers['heart'] = ZeroScaler()
+
+    loader._loaders['heart_xgb'] = load
+    monkeypatch.setattr(app_module, 'model_loader', loader)
+    client = app_module.app.test_client()
+
+    thread = loader.start_warmup(['heart_xgb'], retry_delay=0.05, max_retry_delay=0.1)
+    while len(attempts) < 3:
+        time.sleep(0.01)
+    response = client.get('/readyz')
+    assert response.status_code == 503
+    assert response.get_json()['errors'] == {'heart_xgb': 'heart_xgboost_model.pkl is still syncing'}
+    checked.set()
+    thread.join(5)
+
+    assert not thread.is_alive()
+    assert len(attempts) == 3
+    # Backoff doubles between attempts
+    assert attempts[2] - attempts[1] >= 0.1 > attempts[1] - attempts[0] >= 0.05
+    response = client.get('/readyz')
+    assert response.status_code == 200
+    assert response.get_json() == {'ready': True, 'models': {'heart_xgb': 'ready'}, 'errors': {}}
+
+
+def test_start_warmup_rejects_unknown_keys(loader):
+    with pytest.raises(ValueError, match='heart_cnn'):
+        loader.start_warmup(['heart_xgb', 'heart_cnn'])
+    assert loader.warmup_targets == []
+
+
+def test_config_rejects_unknown_warmup_models():
+    env = dict(os.environ, WARMUP_MODELS='heart_xgb,heart_cnn')
+    result = subprocess.run([sys.executable, '-c', 'import config'], env=env, capture_output=True, text=True)
+    assert result.returncode != 0
+    assert 'WARMUP_MODELS has unknown model keys heart_cnn' in result.stderr
@@ -0,0 +1,124 @@
+import json
+import multiprocessing
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import rlp
+from eth_account import Account
+from web3 import Web3
+
+from blockchain.contract_manager import ContractManager
+from blockchain.rpc_provider import PooledHTTPProvider
+
+TRANSACTION = {'to': '0x' + '22' * 20, 'value': 0, 'gas': 21000, 'gasPrice': 10 ** 9, 'chainId': 1337}
+
+
+class StrictNode:
+    """JSON-RPC endpoint that only accepts each account's next nonce, like a node with an empty queue"""
+
+    def __init__(self, send_delay=0.005):
+        self.accepted = []
+        self.rejected = []
+        self._lock = threading.Lock()
+        node = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                call = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                payload = json.dumps(dict(node.answer(call['method'], call['params']), jsonrpc='2.0', id=call['id'])).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.send_delay = send_delay
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+
+    def answer(self, method, params):
+        if method == 'eth_getTransactionCount':
+            with self._lock:
+                return {'result': hex(len(self.accepted))}
+        if method == 'eth_getTransactionByHash':
+            return {'result': None}
+        if method == 'eth_sendRawTransaction':
+            raw = bytes.fromhex(params[0][2:])
+            nonce = int.from_bytes(rlp.decode(raw)[0], 'big')
+            # Widen the window between reading the count and sending
+            time.sleep(self.send_delay)
+            with self._lock:
+                if nonce != len(self.accepted):
+                    self.rejected.append(nonce)
+                    message = 'nonce too low' if nonce < len(self.accepted) else 'nonce too high'
+                    return {'error': {'code': -32000, 'message': message}}
+                self.accepted.append(nonce)
+            return {'result': Web3.to_hex(Web3.keccak(raw))}
+        return {'error': {'code': -32601, 'message': 'Method not found'}}
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def node():
+    node = StrictNode()
+    yield node
+    node.close()
+
+
+def _send_many(url, private_key, nonce_db, count):
+    account = Account.from_key(private_key)
+    contract_manager = ContractManager(
+        w3=Web3(PooledHTTPProvider([url], retries=1)),
+        account=account.address,
+        private_key=private_key,
+        nonce_db=nonce_db
+    )
+    for _ in range(count):
+        contract_manager._sign_and_send(TRANSACTION)
+
+
+def test_workers_sharing_a_nonce_db_never_reuse_a_nonce(node, tmp_path):
+    account = Account.create()
+    nonce_db = str(tmp_path / 'nonces.db')
+    context = multiprocessing.get_context('fork')
+    workers = [
+        context.Process(target=_send_many, args=(node.url, account.key.hex(), nonce_db, 15))
+        for _ in range(2)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(60)
+
+    assert [worker.exitcode for worker in workers] == [0, 0]
+    assert node.rejected == []
+    assert node.accepted == list(range(30))
+
+
+def test_failed_send_resyncs_the_shared_counter(node, tmp_path):
+    account = Account.create()
+    contract_manager = ContractManager(
+        w3=Web3(PooledHTTPProvider([node.url], retries=1)),
+        account=account.address,
+        private_key=account.key.hex(),
+        nonce_db=str(tmp_path / 'nonces.db')
+    )
+    contract_manager._sign_and_send(TRANSACTION)
+    # Another sender used nonce 1 behind our back
+    node.accepted.append(1)
+    with pytest.raises(Exception, match='nonce too low'):
+        contract_manager._sign_and_send(TRANSACTION)
+    assert contract_manager.nonces.next_nonce is None
+
+    contract_manager._sign_and_send(TRANSACTION)
+    assert node.accepted == [0, 1, 2]
+    assert contract_manager.nonces.next_nonce == 3
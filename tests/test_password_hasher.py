@@ -0,0 +1,29 @@
+import threading
+
+import pytest
+
+from utils.password_hasher import HasherBusy, PasswordHasher
+
+
+def test_timeout_raises_hasher_busy_and_frees_the_slot():
+    hasher = PasswordHasher(rounds=4, workers=1, max_pending=1, timeout=0.05)
+    release = threading.Event()
+    ran = []
+
+    def block():
+        with pytest.raises(HasherBusy):
+            hasher._run(release.wait)
+
+    blocker = threading.Thread(target=block)
+    blocker.start()
+
+    # Queued behind the blocked worker, so it times out and is cancelled
+    with pytest.raises(HasherBusy):
+        hasher._run(lambda: ran.append(True))
+    release.set()
+    blocker.join()
+
+    assert ran == []
+    assert hasher.stats()['timed_out'] == 2
+    # The single worker is free again once the blocked hash returns
+    assert hasher.check('secret', hasher.hash('secret'))
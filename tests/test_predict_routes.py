@@ -0,0 +1,59 @@
+import io
+import time
+from concurrent.futures import Future
+
+import pytest
+
+DIABETES_FORM = {
+    'patient_id': 'PATIENT_TIMEOUT',
+    'pregnancies': '1', 'glucose': '120', 'blood_pressure': '70', 'skin_thickness': '20',
+    'insulin': '80', 'bmi': '25.5', 'diabetes_pedigree': '0.4', 'age': '40'
+}
+
+
+class StalledScheduler:
+    """Image scheduler whose predictions never finish"""
+
+    request_timeout = 0.05
+
+    def __init__(self):
+        self.futures = []
+
+    def submit(self, model_key, image):
+        future = Future()
+        self.futures.append(future)
+        return future
+
+
+@pytest.fixture
+def client(app_module):
+    client = app_module.app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+    return client
+
+
+def test_image_timeout_is_a_504_and_the_upload_outlives_its_readers(app_module, client, monkeypatch):
+    scheduler = StalledScheduler()
+    reads = []
+
+    def slow_add_upload(upload):
+        time.sleep(0.2)
+        with upload.open() as source:
+            reads.append(source.read())
+        return 'Qm' + upload.sha256[:44]
+
+    monkeypatch.setattr(app_module, 'image_scheduler', scheduler)
+    monkeypatch.setattr(app_module.ipfs_simulator, 'add_upload', slow_add_upload)
+    monkeypatch.setattr(app_module.model_loader, 'predict_diabetes_tabular', lambda data: {'prediction': 'Negative', 'confidence': 90.0})
+
+    response = client.post(
+        '/predict/diabetes',
+        data=dict(DIABETES_FORM, image_file=(io.BytesIO(b'not really a jpeg'), 'eye.jpg')),
+        content_type='multipart/form-data'
+    )
+
+    assert response.status_code == 504
+    assert 'did not finish within 0.05s' in response.get_json()['error']
+    assert scheduler.futures[0].cancelled()
+    assert reads == [b'not really a jpeg']
@@ -0,0 +1,65 @@
+import pytest
+
+from utils.model_loader import ModelLoader
+from utils.prediction_cache import PredictionCache
+
+
+@pytest.mark.parametrize('settings', [
+    {'image_backend': 'optimized'},
+    {'tabular_engine': 'sklearn'},
+    {'fast_decode': True},
+])
+def test_model_version_changes_with_inference_settings(tmp_path, settings):
+    baseline = ModelLoader(model_dir=str(tmp_path)).model_version
+    assert ModelLoader(model_dir=str(tmp_path), **settings).model_version != baseline
+    assert ModelLoader(model_dir=str(tmp_path)).model_version == baseline
+
+
+class FakeSubmitter:
+    def __init__(self, statuses):
+        self.statuses = statuses
+        self.submitted = []
+
+    def submit(self, *record):
+        self.submitted.append(record)
+        return f'ticket-{len(self.submitted)}'
+
+    def status(self, ticket):
+        return self.statuses.get(ticket)
+
+
+def cached_result(status):
+    return {
+        'disease': 'Diabetes',
+        'prediction': 'Negative',
+        'data_hash': 'abc',
+        'image_hash': 'Qmdef',
+        'record_ticket': 'old-ticket',
+        'blockchain_tx': None,
+        'blockchain_status': status
+    }
+
+
+@pytest.mark.parametrize('ticket_status, cached_status, resubmitted', [
+    ({'status': 'failed', 'tx_hash': None}, 'submitted', True),
+    (None, 'queued', True),
+    (None, 'confirmed', False),
+    ({'status': 'confirmed', 'tx_hash': '0x01'}, 'submitted', False),
+])
+def test_cache_hit_resubmits_lost_records(app_module, monkeypatch, ticket_status, cached_status, resubmitted):
+    submitter = FakeSubmitter({'old-ticket': ticket_status} if ticket_status else {})
+    cache = PredictionCache()
+    cache.put('key', cached_result(cached_status))
+    monkeypatch.setattr(app_module, 'record_submitter', submitter)
+    monkeypatch.setattr(app_module, 'prediction_cache', cache)
+
+    result = app_module.cached_prediction('key', 'PATIENT_001')
+
+    if resubmitted:
+        assert submitter.submitted == [('PATIENT_001', 'Diabetes', 'Negative', 'abc', 'Qmdef')]
+        assert result['record_ticket'] == 'ticket-1'
+        assert result['blockchain_status'] == 'queued'
+        assert cache.get('key')['record_ticket'] == 'ticket-1'
+    else:
+        assert submitter.submitted == []
+        assert result['record_ticket'] == 'old-ticket'
@@ -0,0 +1,67 @@
+import re
+
+import pytest
+from eth_abi import decode, encode
+
+from blockchain import record_codec
+from gas_benchmark import CONTRACTS, synthetic_records
+
+HOSPITAL = '0x' + '11' * 20
+
+
+def solidity_types(source, function, returns=False):
+    """ABI types of a function's parameters (or return values) as declared in the contract source"""
+    with open(source) as f:
+        text = f.read()
+    enums = re.findall(r'enum (\w+)', text)
+    header = re.search(rf'function {function}\((.*?)\)(.*?)\{{', text, re.S)
+    params = re.search(r'returns \((.*?)\)', header.group(2), re.S).group(1) if returns else header.group(1)
+    types = [param.split()[0] for param in params.split(',') if param.strip()]
+    return ['uint8' if name in enums else name for name in types]
+
+
+def test_add_record_arguments_match_the_v2_signature():
+    types = solidity_types(CONTRACTS['v2'], 'addRecord')
+    assert types == ['bytes32', 'uint8', 'uint8', 'bytes32', 'bytes32']
+    for record in synthetic_records(20):
+        args = record_codec.encode_record(*record)
+        assert decode(types, encode(types, args)) == args
+
+
+def test_get_record_output_decodes_back_to_the_record():
+    types = solidity_types(CONTRACTS['v2'], 'getRecord', returns=True)
+    assert types == ['bytes32', 'uint8', 'uint8', 'bytes32', 'bytes32', 'uint256', 'address']
+    for record in synthetic_records(20):
+        patient, disease, prediction, data_hash, image_hash = record_codec.encode_record(*record)
+        # What the node returns for getRecord(), as web3 would decode it
+        output = decode(types, encode(types, (patient, disease, prediction, data_hash, image_hash, 1700000000, HOSPITAL)))
+        decoded = record_codec.decode_record(output)
+        assert decoded['patientId'] == '0x' + record_codec.patient_hash(record[0]).hex()
+        assert (decoded['diseaseType'], decoded['prediction'], decoded['dataHash'], decoded['imageHash']) == record[1:]
+        assert decoded['timestamp'] == 1700000000
+
+
+@pytest.mark.parametrize('value', ['0x' + 'ab' * 32, 'Qm' + '0f' * 22, 'not-a-hash'])
+def test_to_bytes32_fits_any_hash(value):
+    assert len(record_codec.to_bytes32(value)) == 32
+
+
+def test_v2_uses_less_gas_per_record():
+    """Full gas benchmark on eth-tester (skipped when solc is unavailable)"""
+    pytest.importorskip('eth_tester')
+    import config
+    from blockchain.contract_artifacts import build_artifact
+    from benchmark import start_chain
+    from gas_benchmark import measure
+
+    artifacts = {}
+    for version, source in CONTRACTS.items():
+        try:
+            artifacts[version] = build_artifact(source, config.CONTRACT_ARTIFACT_DIR)
+        except Exception as e:
+            pytest.skip(f"Cannot compile {source}: {e}")
+    chain = start_chain()
+    records = synthetic_records(10)
+    # measure() also reads every record back and raises if one does not round-trip
+    report = {version: measure(version, artifact, records, chain) for version, artifact in artifacts.items()}
+    assert report['v2']['add_record_gas']['mean'] < report['v1']['add_record_gas']['mean']
@@ -0,0 +1,169 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from blockchain.record_indexer import RecordIndexer
+
+ADDRESS = '0x' + '11' * 20
+
+
+class FakeChain:
+    """Just enough of ContractManager, web3 and the contract for the indexer.
+
+    The contract has code from deploy_block on; add() emits a RecordAdded
+    log. Every RPC checks that the indexer's lock is free at the time.
+    """
+
+    def __init__(self, deploy_block, head):
+        self.deploy_block = deploy_block
+        self.head = head
+        self.logs = []
+        self.code_calls = []
+        self.log_ranges = []
+        self.rpc_under_lock = 0
+        self.indexers = []
+        self.contract = SimpleNamespace(address=ADDRESS, events=SimpleNamespace(RecordAdded=lambda: self))
+        self.w3 = SimpleNamespace(eth=self)
+
+    def add(self, record_id, timestamp, block, patient='P1', disease='heart'):
+        self.logs.append({
+            'args': {'recordId': record_id, 'patientId': patient, 'diseaseType': disease, 'prediction': 'Normal', 'timestamp': timestamp},
+            'blockNumber': block,
+            'transactionHash': bytes([record_id]) * 32,
+            'logIndex': 0
+        })
+
+    def _rpc(self):
+        self.rpc_under_lock += sum(indexer._lock.locked() for indexer in self.indexers)
+
+    @property
+    def block_number(self):
+        self._rpc()
+        return self.head
+
+    def get_code(self, address, block):
+        self._rpc()
+        self.code_calls.append(block)
+        return b'\x60' if block >= self.deploy_block else b''
+
+    def get_logs(self, fromBlock, toBlock):
+        self._rpc()
+        self.log_ranges.append((fromBlock, toBlock))
+        return [log for log in self.logs if fromBlock <= log['blockNumber'] <= toBlock]
+
+    def record_event(self, args):
+        return dict(args)
+
+    def patient_key(self, patient_id):
+        return patient_id
+
+
+def indexer_for(chain, tmp_path, **kwargs):
+    indexer = RecordIndexer(chain, db_path=str(tmp_path / 'index.db'), chunk_size=20, **kwargs)
+    chain.indexers.append(indexer)
+    return indexer
+
+
+def test_initial_sync_starts_at_the_deployment_block(tmp_path):
+    chain = FakeChain(deploy_block=100, head=150)
+    for record_id, block in enumerate((100, 121, 150)):
+        chain.add(record_id, 1000 + record_id, block)
+    indexer = indexer_for(chain, tmp_path)
+
+    assert indexer.sync() == 3
+    assert chain.log_ranges == [(100, 119), (120, 139), (140, 150)]
+    assert indexer.stats()['last_block'] == 150
+    assert chain.rpc_under_lock == 0
+
+
+def test_sync_resumes_from_the_stored_block(tmp_path):
+    chain = FakeChain(deploy_block=100, head=150)
+    chain.add(0, 1000, 110)
+    indexer_for(chain, tmp_path).sync()
+
+    chain.head = 165
+    chain.add(1, 1001, 160)
+    chain.code_calls.clear()
+    chain.log_ranges.clear()
+    restarted = indexer_for(chain, tmp_path)
+
+    assert restarted.sync() == 1
+    assert chain.code_calls == []
+    assert chain.log_ranges == [(151, 165)]
+    assert [record['recordId'] for record in restarted.query()['records']] == [1, 0]
+
+
+def test_queries_do_not_wait_for_the_deployment_search(tmp_path):
+    chain = FakeChain(deploy_block=100, head=150)
+    indexer = indexer_for(chain, tmp_path)
+    searching = threading.Event()
+    release = threading.Event()
+    get_code = chain.get_code
+
+    def slow_get_code(address, block):
+        searching.set()
+        release.wait(5)
+        return get_code(address, block)
+
+    chain.get_code = slow_get_code
+    syncing = threading.Thread(target=indexer.sync)
+    syncing.start()
+    assert searching.wait(5)
+    started = time.monotonic()
+    indexer.query()
+    assert time.monotonic() - started < 1
+    release.set()
+    syncing.join(5)
+
+
+def test_cursor_pages_through_equal_timestamps(tmp_path):
+    chain = FakeChain(deploy_block=1, head=10)
+    # Several records per timestamp, and a page boundary inside each run of equal timestamps
+    timestamps = [500, 500, 500, 400, 400, 400, 400, 300, 200, 200]
+    for record_id, timestamp in enumerate(timestamps):
+        chain.add(record_id, timestamp, 1 + record_id % 10)
+    indexer = indexer_for(chain, tmp_path)
+    indexer.sync()
+
+    expected = sorted(range(len(timestamps)), key=lambda i: (timestamps[i], i), reverse=True)
+    for limit in (1, 2, 3, 4):
+        seen, cursor = [], None
+        while True:
+            page = indexer.query(limit=limit, cursor=cursor)
+            seen.extend(record['recordId'] for record in page['records'])
+            cursor = page['next_cursor']
+            if cursor is None:
+                break
+            last = page['records'][-1]
+            assert cursor == f"{last['timestamp']}:{last['recordId']}"
+        assert seen == expected
+
+    page = indexer.query(limit=3, since=300, until=400)
+    assert [record['recordId'] for record in page['records']] == [6, 5, 4]
+    assert [record['recordId'] for record in indexer.query(limit=3, since=300, until=400, cursor=page['next_cursor'])['records']] == [3, 7]
+
+
+def test_one_worker_tails_at_a_time(tmp_path):
+    chain = FakeChain(deploy_block=1, head=10)
+    chain.add(0, 100, 5)
+    first = indexer_for(chain, tmp_path, lease=0.2)
+    second = indexer_for(chain, tmp_path, lease=0.2)
+
+    assert first.poll() == 1
+    chain.log_ranges.clear()
+    assert second.poll() == 0
+    assert chain.log_ranges == []
+    assert second.stats()['tailing'] is False
+    # Both serve the same index
+    assert second.get(0)['recordId'] == 0
+
+    # The holder stops renewing: the other worker takes over
+    time.sleep(0.3)
+    chain.head = 12
+    chain.add(1, 101, 12)
+    assert second.poll() == 1
+    assert first.poll() == 0
+
+    second.release()
+    assert first.poll() == 0
+    assert first.tailing
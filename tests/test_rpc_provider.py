@@ -0,0 +1,175 @@
+import json
+import socket
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from eth_account import Account
+from web3 import Web3
+
+from blockchain.rpc_provider import PooledHTTPProvider
+
+ANSWERS = {
+    'eth_chainId': '0x539',
+    'eth_gasPrice': hex(20 * 10 ** 9),
+    'eth_getTransactionCount': '0x7',
+    'eth_sendRawTransaction': '0x' + 'ab' * 32
+}
+
+
+class MockNode:
+    """Local JSON-RPC endpoint that counts calls per method.
+
+    mode: 'ok' answers from ANSWERS (unknown methods get a JSON-RPC error),
+    an int answers every request with that HTTP status, and 'drop' reads the
+    request and closes the connection without replying. errors maps a method
+    to a JSON-RPC error message to return instead of its answer.
+    """
+
+    def __init__(self, mode='ok', errors=None):
+        self.mode = mode
+        self.errors = errors or {}
+        self.calls = Counter()
+        node = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                for call in request if isinstance(request, list) else [request]:
+                    node.calls[call['method']] += 1
+                if node.mode == 'drop':
+                    self.close_connection = True
+                    self.connection.shutdown(socket.SHUT_RDWR)
+                    return
+                if isinstance(node.mode, int):
+                    self.send_response(node.mode)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                payload = json.dumps([node.answer(call) for call in request] if isinstance(request, list) else node.answer(request)).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+
+    def answer(self, call):
+        if call['method'] in self.errors:
+            return {'jsonrpc': '2.0', 'id': call['id'], 'error': {'code': -32000, 'message': self.errors[call['method']]}}
+        if call['method'] not in ANSWERS:
+            return {'jsonrpc': '2.0', 'id': call['id'], 'error': {'code': -32601, 'message': 'Method not found'}}
+        return {'jsonrpc': '2.0', 'id': call['id'], 'result': ANSWERS[call['method']]}
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def nodes():
+    started = []
+
+    def start(*args, **kwargs):
+        node = MockNode(*args, **kwargs)
+        started.append(node)
+        return node
+
+    yield start
+    for node in started:
+        node.close()
+
+
+def closed_port_url():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return f'http://127.0.0.1:{sock.getsockname()[1]}'
+
+
+def provider(*urls, **kwargs):
+    kwargs.setdefault('retries', 2)
+    kwargs.setdefault('backoff', 0.001)
+    return PooledHTTPProvider(list(urls), **kwargs)
+
+
+def test_reads_fail_over_to_the_next_endpoint(nodes):
+    down, up = nodes(503), nodes()
+    rpc = provider(down.url, up.url, failure_threshold=1, cooldown=60)
+    w3 = Web3(rpc)
+
+    assert w3.eth.chain_id == 1337
+    assert w3.eth.chain_id == 1337
+    # Marked down after the first failure, so the second call goes straight to the healthy node
+    assert down.calls['eth_chainId'] == 1
+    assert up.calls['eth_chainId'] == 2
+    stats = rpc.stats()
+    assert [entry['healthy'] for entry in stats.values()] == [False, True]
+
+
+def test_all_endpoints_failing_raises_connection_error(nodes):
+    rpc = provider(nodes(502).url, nodes(503).url, retries=3)
+    with pytest.raises(ConnectionError, match='All RPC attempts failed'):
+        Web3(rpc).eth.chain_id
+
+
+def test_json_rpc_errors_are_answers_not_failures(nodes):
+    node, spare = nodes(), nodes()
+    rpc = provider(node.url, spare.url)
+    assert rpc.make_request('eth_notAMethod', [])['error']['message'] == 'Method not found'
+    assert node.calls['eth_notAMethod'] == 1
+    assert spare.calls['eth_notAMethod'] == 0
+    assert rpc.stats()[next(iter(rpc.stats()))]['failures'] == 0
+
+
+def test_batch_returns_results_in_order(nodes):
+    node = nodes()
+    rpc = provider(node.url)
+    assert rpc.batch([('eth_gasPrice', []), ('eth_chainId', []), ('eth_getTransactionCount', ['0x' + '00' * 20, 'pending'])]) == [
+        ANSWERS['eth_gasPrice'], ANSWERS['eth_chainId'], ANSWERS['eth_getTransactionCount']
+    ]
+    with pytest.raises(ValueError, match='eth_notAMethod failed'):
+        rpc.batch([('eth_chainId', []), ('eth_notAMethod', [])])
+
+
+@pytest.mark.parametrize('mode', [503, 'drop'])
+def test_raw_transactions_are_not_retried_once_sent(nodes, mode):
+    first, second = nodes(mode), nodes()
+    rpc = provider(first.url, second.url, retries=3)
+    with pytest.raises(ConnectionError, match='may have been received'):
+        rpc.make_request('eth_sendRawTransaction', ['0x00'])
+    assert first.calls['eth_sendRawTransaction'] == 1
+    assert second.calls['eth_sendRawTransaction'] == 0
+
+
+@pytest.mark.parametrize('mode', [429, None])
+def test_raw_transactions_fail_over_when_never_sent(nodes, mode):
+    first = nodes(mode).url if mode else closed_port_url()
+    second = nodes()
+    rpc = provider(first, second.url)
+    assert rpc.make_request('eth_sendRawTransaction', ['0x00'])['result'] == ANSWERS['eth_sendRawTransaction']
+    assert second.calls['eth_sendRawTransaction'] == 1
+
+
+def test_already_known_transaction_counts_as_sent(nodes):
+    from blockchain.contract_manager import ContractManager
+
+    node = nodes(errors={'eth_sendRawTransaction': 'already known'})
+    account = Account.create()
+    contract_manager = ContractManager(w3=Web3(provider(node.url)), account=account.address, private_key=account.key.hex())
+    transaction = {'to': '0x' + '22' * 20, 'value': 0, 'gas': 21000, 'gasPrice': 10 ** 9, 'chainId': 1337}
+
+    tx_hash = contract_manager._sign_and_send(transaction)
+
+    signed = Account.sign_transaction(dict(transaction, nonce=7), account.key)
+    assert tx_hash == signed.hash
+    # No resync: the nonce was used
+    assert contract_manager.nonces.next_nonce == 8
@@ -0,0 +1,62 @@
+import hashlib
+import io
+import os
+
+import pytest
+
+from utils import upload_buffer
+from utils.upload_buffer import UploadBuffer
+
+PAYLOAD = bytes(range(256)) * 40
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    # Several reads per upload, so the switch to disk happens mid-stream
+    monkeypatch.setattr(upload_buffer, 'CHUNK_SIZE', 1000)
+
+
+def test_upload_at_the_threshold_stays_in_memory(tmp_path):
+    with UploadBuffer(io.BytesIO(PAYLOAD), str(tmp_path), max_memory_bytes=len(PAYLOAD)) as upload:
+        assert upload.in_memory
+        assert upload.path is None
+        assert os.listdir(tmp_path) == []
+        assert upload.size == len(PAYLOAD)
+        assert upload.sha256 == hashlib.sha256(PAYLOAD).hexdigest()
+        assert upload.open().read() == PAYLOAD
+
+
+def test_larger_upload_spills_to_disk(tmp_path):
+    upload = UploadBuffer(io.BytesIO(PAYLOAD), str(tmp_path), max_memory_bytes=len(PAYLOAD) - 1)
+    assert not upload.in_memory
+    assert os.path.dirname(upload.path) == str(tmp_path)
+    assert upload.size == len(PAYLOAD)
+    assert upload.sha256 == hashlib.sha256(PAYLOAD).hexdigest()
+
+    # Independent readers over the same spooled bytes
+    with upload.open() as first, upload.open() as second:
+        assert first.read(10) == PAYLOAD[:10]
+        assert second.read() == PAYLOAD
+        assert first.read() == PAYLOAD[10:]
+
+    path = upload.path
+    upload.close()
+    assert not os.path.exists(path)
+    assert os.listdir(tmp_path) == []
+
+
+class BrokenStream:
+    def __init__(self, data, fail_after):
+        self.data = io.BytesIO(data)
+        self.fail_after = fail_after
+
+    def read(self, size):
+        if self.data.tell() >= self.fail_after:
+            raise ConnectionResetError('client went away')
+        return self.data.read(size)
+
+
+def test_interrupted_upload_leaves_no_spool_file(tmp_path):
+    with pytest.raises(ConnectionResetError):
+        UploadBuffer(BrokenStream(PAYLOAD, 5000), str(tmp_path), max_memory_bytes=2000)
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,160 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from utils import metrics
+
+
+def wait_or_cancel(future, timeout):
+    """future.result(timeout), cancelling the future if the wait times out.
+
+    A cancelled request is dropped by the worker before the forward pass,
+    so a caller that gave up does not still cost a slot in the next batch.
+    """
+    try:
+        return future.result(timeout=timeout)
+    except TimeoutError:
+        future.cancel()
+        raise
+
+
+class BatchScheduler:
+    """Collects concurrent image predictions for the same model into batches.
+
+    Each image model gets its own queue and worker thread. A worker blocks
+    until a request arrives, then keeps collecting requests for that model
+    until either max_batch_size is reached or max_wait_ms has passed since
+    the first request of the batch was queued. The whole batch goes through
+    one forward pass and every caller gets its own result dict back.
+    """
+
+    def __init__(self, model_loader, max_batch_size=8, max_wait_ms=10, request_timeout=None):
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.request_timeout = request_timeout
+        self.handlers = {
+            'diabetes_retinal': model_loader.predict_diabetes_image_batch,
+            'heart_ecg': model_loader.predict_heart_image_batch
+        }
+        self.queues = {model_key: queue.Queue() for model_key in self.handlers}
+        self.workers = {}
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._stopped = False
+
+    def submit(self, model_key, image):
+        """Queue an image (path or binary file object) for model_key and return a Future for its result dict"""
+        if model_key not in self.handlers:
+            raise ValueError(f"Unknown image model: {model_key}")
+        if self._stopped:
+            raise RuntimeError("BatchScheduler has been shut down")
+
+        self._ensure_worker(model_key)
+        future = Future()
+        self.queues[model_key].put((time.monotonic(), image, future, metrics.current_spans()))
+        return future
+
+    def predict(self, model_key, image):
+        """Blocking helper used by the request handlers"""
+        return wait_or_cancel(self.submit(model_key, image), self.request_timeout)
+
+    def predict_diabetes_image(self, image):
+        return self.predict('diabetes_retinal', image)
+
+    def predict_heart_image(self, image):
+        return self.predict('heart_ecg', image)
+
+    def shutdown(self, wait=True):
+        self._stopped = True
+        for model_key in self.workers:
+            self.queues[model_key].put(None)
+        if wait:
+            for worker in self.workers.values():
+                worker.join()
+
+    def _ensure_worker(self, model_key):
+        if self._pid != os.getpid():
+            # Forked after workers were started: their threads did not come along
+            self._pid = os.getpid()
+            self._lock = threading.Lock()
+            self.queues = {key: queue.Queue() for key in self.handlers}
+            self.workers = {}
+        if model_key in self.workers:
+            return
+        with self._lock:
+            if model_key not in self.workers:
+                worker = threading.Thread(
+                    target=self._run,
+                    args=(model_key,),
+                    name=f"batch-{model_key}",
+                    daemon=True
+                )
+                worker.start()
+                self.workers[model_key] = worker
+
+    def _collect(self, model_key, first):
+        batch = [first]
+        deadline = first[0] + self.max_wait
+        pending = self.queues[model_key]
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = pending.get(timeout=remaining) if remaining > 0 else pending.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Put the sentinel back so the outer loop exits after this batch
+                pending.put(None)
+                break
+            batch.append(item)
+
+        return batch
+
+    def _run(self, model_key):
+        handler = self.handlers[model_key]
+        pending = self.queues[model_key]
+
+        while True:
+            first = pending.get()
+            if first is None:
+                break
+
+            batch = self._collect(model_key, first)
+            # Skip requests whose callers already gave up waiting
+            batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            started = time.monotonic()
+            for queued_at, _, _, spans in batch:
+                metrics.record_span('batch_wait', started - queued_at, spans)
+
+            # Stage spans of the shared forward pass are credited to every caller in the batch
+            batch_spans = []
+            try:
+                with metrics.collecting(batch_spans):
+                    results = handler([image for _, image, _, _ in batch])
+            except Exception as e:
+                if len(batch) == 1:
+                    batch[0][2].set_exception(e)
+                else:
+                    # One unreadable upload must not fail everyone it was batched with
+                    self._run_individually(handler, batch)
+                continue
+
+            for (_, _, future, spans), result in zip(batch, results):
+                if spans is not None:
+                    spans.extend(batch_spans)
+                future.set_result(result)
+
+    def _run_individually(self, handler, batch):
+        for _, image, future, spans in batch:
+            try:
+                if hasattr(image, 'seek'):
+                    image.seek(0)
+                with metrics.collecting(spans):
+                    future.set_result(handler([image])[0])
+            except Exception as e:
+                future.set_exception(e)
@@ -0,0 +1,123 @@
+"""Bulk tabular scoring for diabetes/heart CSV files.
+
+Usage:
+    python -m utils.bulk_scoring diabetes diabetes.csv
+    python -m utils.bulk_scoring heart heart.csv --output heart_scores.csv --chunk-size 100000
+
+Rows are read and scored in fixed-size chunks, so memory stays flat even for
+files with millions of rows.
+"""
+import argparse
+import contextlib
+import csv
+import sys
+import numpy as np
+
+from utils.model_loader import ModelLoader, TABULAR_LABELS
+
+FEATURE_COLUMNS = {
+    'diabetes': ['Pregnancies', 'Glucose', 'BloodPressure', 'SkinThickness', 'Insulin', 'BMI', 'DiabetesPedigreeFunction', 'Age'],
+    'heart': ['age', 'sex', 'cp', 'trestbps', 'chol', 'fbs', 'restecg', 'thalach', 'exang', 'oldpeak', 'slope', 'ca', 'thal']
+}
+
+DEFAULT_CHUNK_SIZE = 50000
+
+
+def _column_indexes(disease, header):
+    lookup = {name.strip().lower(): i for i, name in enumerate(header)}
+    missing = [name for name in FEATURE_COLUMNS[disease] if name.lower() not in lookup]
+    if missing:
+        raise ValueError(f"CSV is missing columns for {disease}: {', '.join(missing)}")
+    return [lookup[name.lower()] for name in FEATURE_COLUMNS[disease]]
+
+
+def iter_feature_chunks(text_stream, disease, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield float64 feature matrices of at most chunk_size rows from a CSV stream.
+
+    Columns are matched by header name, so label columns such as Outcome or
+    target in diabetes.csv / heart.csv are ignored.
+    """
+    if disease not in FEATURE_COLUMNS:
+        raise ValueError(f"Unknown disease: {disease}")
+
+    reader = csv.reader(text_stream)
+    header = next(reader, None)
+    if header is None:
+        return
+    indexes = _column_indexes(disease, header)
+
+    chunk = []
+    for row in reader:
+        if not row:
+            continue
+        chunk.append([row[i] for i in indexes])
+        if len(chunk) >= chunk_size:
+            yield np.array(chunk, dtype=np.float64)
+            chunk = []
+    if chunk:
+        yield np.array(chunk, dtype=np.float64)
+
+
+def score_stream(model_loader, disease, text_stream, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield (predictions, confidences, risk_levels) arrays for each chunk of the CSV"""
+    for features in iter_feature_chunks(text_stream, disease, chunk_size):
+        yield model_loader.score_tabular(disease, features)
+
+
+def score_to_records(model_loader, disease, text_stream, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Score a CSV stream and return one result dict per row"""
+    positive_label, negative_label = TABULAR_LABELS[disease]
+    records = []
+    for predictions, confidences, risk_levels in score_stream(model_loader, disease, text_stream, chunk_size):
+        labels = np.where(predictions == 1, positive_label, negative_label)
+        for label, confidence, risk_level in zip(labels.tolist(), (confidences * 100).tolist(), risk_levels.tolist()):
+            records.append({
+                'row': len(records) + 1,
+                'prediction': label,
+                'confidence': round(confidence, 2),
+                'risk_level': risk_level
+            })
+    return records
+
+
+def write_scores(model_loader, disease, text_stream, output, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Stream scored rows to a CSV writer chunk by chunk and return the row count"""
+    positive_label, negative_label = TABULAR_LABELS[disease]
+    writer = csv.writer(output)
+    writer.writerow(['row', 'prediction', 'confidence', 'risk_level'])
+
+    row_count = 0
+    for predictions, confidences, risk_levels in score_stream(model_loader, disease, text_stream, chunk_size):
+        labels = np.where(predictions == 1, positive_label, negative_label)
+        rows = np.arange(row_count + 1, row_count + len(labels) + 1)
+        writer.writerows(zip(rows.tolist(), labels.tolist(), np.round(confidences * 100, 2).tolist(), risk_levels.tolist()))
+        row_count += len(labels)
+    return row_count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a diabetes/heart CSV with the tabular XGBoost models")
+    parser.add_argument('disease', choices=sorted(FEATURE_COLUMNS))
+    parser.add_argument('csv_path')
+    parser.add_argument('--output', '-o', help="Output CSV path (defaults to stdout)")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--model-dir', default='models')
+    args = parser.parse_args(argv)
+
+    # ModelLoader reports progress with print(); keep it off stdout when stdout carries the CSV
+    stdout = sys.stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        model_loader = ModelLoader(model_dir=args.model_dir)
+
+        with open(args.csv_path, 'r', newline='') as source:
+            if args.output:
+                with open(args.output, 'w', newline='') as output:
+                    row_count = write_scores(model_loader, args.disease, source, output, args.chunk_size)
+            else:
+                row_count = write_scores(model_loader, args.disease, source, stdout, args.chunk_size)
+
+    print(f"✓ Scored {row_count} rows", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
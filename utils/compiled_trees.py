@@ -0,0 +1,301 @@
+"""Compiled inference for the tabular XGBoost models.
+
+Usage:
+    python -m utils.compiled_trees
+    python -m utils.compiled_trees --disease heart --repeats 5000
+
+Checks the compiled trees against the pickled models on diabetes.csv /
+heart.csv plus boundary probes, and reports max |difference| along with
+single-row and batch latency for both paths as JSON.
+"""
+import argparse
+import json
+import struct
+import sys
+import time
+import numpy as np
+
+SUPPORTED_OBJECTIVES = ('binary:logistic', 'reg:logistic')
+BLOCK_ROWS = 4096
+_SIGN = 1 << 63
+_MAGNITUDE = _SIGN - 1
+
+
+def _ordered(x):
+    """Map a float64 to an int with the same ordering"""
+    bits = struct.unpack('<q', struct.pack('<d', x))[0]
+    return bits if bits >= 0 else -(bits & _MAGNITUDE)
+
+
+def _from_ordered(i):
+    if i >= 0:
+        return struct.unpack('<d', struct.pack('<q', i))[0]
+    return struct.unpack('<d', struct.pack('<Q', -i | _SIGN))[0]
+
+
+def fold_threshold(threshold, mean=0.0, scale=1.0):
+    """Smallest float64 x with float32((x - mean) / scale) >= threshold.
+
+    XGBoost goes left when float32(scaled value) < threshold. Scaling and the
+    float32 cast are both monotonic, so that is exactly x < fold_threshold(...)
+    on the raw float64 input: the scaler disappears and the comparison matches
+    the original bit for bit. Found by binary search over float64 values.
+    """
+    threshold = np.float32(threshold)
+    mean, scale = np.float64(mean), np.float64(scale)
+
+    def reaches(i):
+        with np.errstate(over='ignore', invalid='ignore'):
+            return np.float32((np.float64(_from_ordered(i)) - mean) / scale) >= threshold
+
+    low = _ordered(-np.finfo(np.float64).max)
+    high = _ordered(np.finfo(np.float64).max)
+    if not reaches(high):
+        return np.inf
+    if reaches(low):
+        return -np.inf
+    while high - low > 1:
+        middle = (low + high) // 2
+        if reaches(middle):
+            high = middle
+        else:
+            low = middle
+    return _from_ordered(high)
+
+
+class CompiledForest:
+    """Array-backed copy of a binary XGBoost classifier with its scaler folded in.
+
+    All trees live in flat node arrays (feature, threshold, left, right,
+    default_left, value); leaves point at themselves, so every tree is walked
+    with the same max_depth vectorized steps over a (rows, trees) node matrix.
+    Leaf values are summed tree by tree in float32 from the base margin, as
+    XGBoost's CPU predictor does, and the result goes through the same float32
+    sigmoid, so predict_proba matches the pickled model on raw, unscaled rows.
+    """
+
+    def __init__(self, feature, threshold, left, right, default_left, value, roots, depth, base_margin, n_features):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.default_left = default_left
+        self.value = value
+        self.roots = roots
+        self.depth = depth
+        self.base_margin = base_margin
+        self.n_features = n_features
+
+    @classmethod
+    def from_xgb(cls, model, scaler=None):
+        """Compile an XGBClassifier (and optionally the StandardScaler fitted before it)"""
+        booster = model.get_booster()
+        learner = json.loads(booster.save_raw(raw_format='json'))['learner']
+
+        objective = learner['objective']['name']
+        if objective not in SUPPORTED_OBJECTIVES:
+            raise ValueError(f"Unsupported objective for compiled trees: {objective}")
+        gradient_booster = learner['gradient_booster']
+        if gradient_booster['name'] != 'gbtree':
+            raise ValueError(f"Unsupported booster for compiled trees: {gradient_booster['name']}")
+
+        trees = gradient_booster['model']['trees']
+        # predict_proba stops at best_iteration when early stopping was used
+        try:
+            best_iteration = model.best_iteration
+        except AttributeError:
+            best_iteration = None
+        if best_iteration is not None:
+            per_round = int(gradient_booster['model']['gbtree_model_param'].get('num_parallel_tree', 1))
+            trees = trees[:(best_iteration + 1) * per_round]
+
+        n_features = int(learner['learner_model_param']['num_feature'])
+        if scaler is not None:
+            means = np.asarray(scaler.mean_ if scaler.with_mean else np.zeros(n_features), dtype=np.float64)
+            scales = np.asarray(scaler.scale_ if scaler.with_std else np.ones(n_features), dtype=np.float64)
+        else:
+            means, scales = np.zeros(n_features), np.ones(n_features)
+
+        # logistic ProbToMargin in float32: -log(1 / base_score - 1)
+        base_score = np.float32(float(str(learner['learner_model_param']['base_score']).strip('[]')))
+        with np.errstate(divide='ignore'):
+            base_margin = np.float32(-np.log(np.float32(1.0) / base_score - np.float32(1.0)))
+
+        folded = {}
+        features, thresholds, lefts, rights, defaults, values, roots = [], [], [], [], [], [], []
+        offset = 0
+        depth = 0
+        for tree in trees:
+            if any(int(t) != 0 for t in tree.get('split_type', [])):
+                raise ValueError("Categorical splits are not supported by compiled trees")
+            left = np.asarray(tree['left_children'], dtype=np.int64)
+            right = np.asarray(tree['right_children'], dtype=np.int64)
+            split_index = np.asarray(tree['split_indices'], dtype=np.int64)
+            condition = np.asarray(tree['split_conditions'], dtype=np.float64)
+            is_leaf = left == -1
+            index = np.arange(len(left))
+
+            tree_threshold = np.full(len(left), np.inf)
+            for node in np.flatnonzero(~is_leaf):
+                key = (int(split_index[node]), float(np.float32(condition[node])))
+                if key not in folded:
+                    folded[key] = fold_threshold(key[1], means[key[0]], scales[key[0]])
+                tree_threshold[node] = folded[key]
+
+            features.append(np.where(is_leaf, 0, split_index))
+            thresholds.append(tree_threshold)
+            lefts.append(np.where(is_leaf, index, left) + offset)
+            rights.append(np.where(is_leaf, index, right) + offset)
+            defaults.append(np.asarray(tree['default_left'], dtype=bool))
+            values.append(np.where(is_leaf, condition, 0.0).astype(np.float32))
+            roots.append(offset)
+            depth = max(depth, _tree_depth(left, right))
+            offset += len(left)
+
+        return cls(
+            feature=np.concatenate(features).astype(np.intp),
+            threshold=np.concatenate(thresholds),
+            left=np.concatenate(lefts).astype(np.intp),
+            right=np.concatenate(rights).astype(np.intp),
+            default_left=np.concatenate(defaults),
+            value=np.concatenate(values),
+            roots=np.asarray(roots, dtype=np.intp),
+            depth=depth,
+            base_margin=base_margin,
+            n_features=n_features
+        )
+
+    def margin(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[None, :]
+        if X.shape[0] <= BLOCK_ROWS:
+            return self._margin_block(X)
+        return np.concatenate([self._margin_block(X[i:i + BLOCK_ROWS]) for i in range(0, X.shape[0], BLOCK_ROWS)])
+
+    def predict_proba(self, X):
+        """(n, 2) float32 class probabilities for raw (unscaled) feature rows"""
+        margin = self.margin(X)
+        # float32 sigmoid like XGBoost: 1 / (1 + expf(-margin))
+        exp = np.exp(-margin.astype(np.float64)).astype(np.float32)
+        positive = np.float32(1.0) / (np.float32(1.0) + exp)
+        return np.column_stack([np.float32(1.0) - positive, positive])
+
+    def _margin_block(self, X):
+        rows = X.shape[0]
+        node = np.broadcast_to(self.roots, (rows, len(self.roots))).copy()
+        row_index = np.arange(rows)[:, None]
+        has_missing = np.isnan(X).any()
+        for _ in range(self.depth):
+            x = X[row_index, self.feature[node]]
+            go_left = x < self.threshold[node]
+            if has_missing:
+                go_left = np.where(np.isnan(x), self.default_left[node], go_left)
+            node = np.where(go_left, self.left[node], self.right[node])
+
+        contributions = np.empty((rows, len(self.roots) + 1), dtype=np.float32)
+        contributions[:, 0] = self.base_margin
+        contributions[:, 1:] = self.value[node]
+        # cumsum accumulates sequentially, matching XGBoost's per-tree float32 additions
+        return np.cumsum(contributions, axis=1, dtype=np.float32)[:, -1]
+
+
+def _tree_depth(left, right):
+    depth, frontier = 0, [0]
+    while True:
+        children = [child for node in frontier for child in (left[node], right[node]) if child != -1]
+        if not children:
+            return depth
+        depth += 1
+        frontier = children
+
+
+def probe_rows(forest, scaler=None, count=512, seed=0):
+    """Rows around the training distribution plus rows sitting exactly on split boundaries"""
+    rng = np.random.default_rng(seed)
+    rows = rng.standard_normal((count, forest.n_features)) * 2
+    if scaler is not None and scaler.scale_ is not None:
+        rows *= scaler.scale_
+    if scaler is not None and scaler.mean_ is not None:
+        rows += scaler.mean_
+    edges = []
+    for node in np.flatnonzero(np.isfinite(forest.threshold)):
+        row = rows[node % count].copy()
+        row[forest.feature[node]] = forest.threshold[node]
+        edges.append(row)
+        below = row.copy()
+        below[forest.feature[node]] = np.nextafter(forest.threshold[node], -np.inf)
+        edges.append(below)
+    return np.vstack([rows] + ([np.asarray(edges)] if edges else []))
+
+
+def verify(forest, model, scaler, rows):
+    """Compare against the pickled model's predict_proba; returns a summary dict"""
+    expected = model.predict_proba(scaler.transform(rows) if scaler is not None else rows)
+    actual = forest.predict_proba(rows)
+    diff = np.abs(expected.astype(np.float64) - actual.astype(np.float64))
+    return {
+        'rows': int(len(rows)),
+        'identical_fraction': float(np.mean(np.all(expected == actual, axis=1))),
+        'max_abs_diff': float(diff.max()) if diff.size else 0.0,
+        'labels_match': bool(np.array_equal(np.argmax(expected, axis=1), np.argmax(actual, axis=1)))
+    }
+
+
+def _time_per_call(fn, repeats):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify and time the compiled tabular models against the pickled ones")
+    parser.add_argument('--disease', choices=['diabetes', 'heart'], action='append', help="Model to check (default: both)")
+    parser.add_argument('--model-dir', default='models')
+    parser.add_argument('--repeats', type=int, default=2000)
+    parser.add_argument('--batch-size', type=int, default=4096)
+    args = parser.parse_args()
+
+    import contextlib
+    from utils.model_loader import ModelLoader
+    from utils.bulk_scoring import iter_feature_chunks
+
+    report = {}
+    with contextlib.redirect_stdout(sys.stderr):
+        loader = ModelLoader(model_dir=args.model_dir, tabular_engine='sklearn')
+    for disease in args.disease or ['diabetes', 'heart']:
+        with contextlib.redirect_stdout(sys.stderr):
+            model = loader._acquire(f'{disease}_xgb', record=False)
+        scaler = loader.scalers[disease]
+        started = time.perf_counter()
+        forest = CompiledForest.from_xgb(model, scaler)
+        compile_ms = (time.perf_counter() - started) * 1000
+
+        with open(f'{disease}.csv', newline='') as f:
+            dataset = np.vstack(list(iter_feature_chunks(f, disease)))
+        rows = np.vstack([dataset, probe_rows(forest, scaler)])
+        single = dataset[:1]
+        batch = dataset[np.arange(args.batch_size) % len(dataset)]
+
+        report[disease] = {
+            'trees': int(len(forest.roots)),
+            'nodes': int(len(forest.feature)),
+            'max_depth': int(forest.depth),
+            'compile_ms': round(compile_ms, 1),
+            'verification': verify(forest, model, scaler, rows),
+            'single_row_us': {
+                'sklearn': round(_time_per_call(lambda: model.predict_proba(scaler.transform(single)), args.repeats), 1),
+                'compiled': round(_time_per_call(lambda: forest.predict_proba(single), args.repeats), 1)
+            },
+            'batch_us_per_row': {
+                'sklearn': round(_time_per_call(lambda: model.predict_proba(scaler.transform(batch)), 20) / len(batch), 3),
+                'compiled': round(_time_per_call(lambda: forest.predict_proba(batch), 20) / len(batch), 3)
+            }
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
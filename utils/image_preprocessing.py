@@ -0,0 +1,123 @@
+import argparse
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from PIL import Image
+
+IMAGENET_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+IMAGENET_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+
+class ImagePreprocessor:
+    """Decode, resize and normalize images straight into a reusable batch buffer.
+
+    Equivalent to Resize((size, size)) -> ToTensor() -> Normalize(mean, std),
+    but built once per model instead of per call. With fast_decode, JPEGs are
+    decoded at a reduced DCT scale via PIL draft mode and other formats use
+    reduce-on-resize, so large photos are never fully decoded. ToTensor and
+    Normalize are fused into one multiply-add written into a per-thread
+    preallocated NHWC float32 buffer, which the model sees as a channels_last
+    NCHW tensor without a copy.
+    """
+
+    def __init__(self, size=224, fast_decode=False, workers=0, mean=IMAGENET_MEAN, std=IMAGENET_STD):
+        self.size = size
+        self.fast_decode = fast_decode
+        # x / 255 then (x - mean) / std, folded into x * scale + shift
+        self.scale = (1.0 / (255.0 * std)).astype(np.float32)
+        self.shift = (-mean / std).astype(np.float32)
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image-decode') if workers > 1 else None
+        self._local = threading.local()
+
+    def load(self, image):
+        """Decode one image (path or binary file object) to a size x size uint8 RGB array"""
+        img = Image.open(image)
+        if self.fast_decode and img.format == 'JPEG':
+            img.draft('RGB', (self.size, self.size))
+        img = img.convert('RGB')
+        if self.fast_decode:
+            img = img.resize((self.size, self.size), Image.BILINEAR, reducing_gap=3.0)
+        else:
+            img = img.resize((self.size, self.size), Image.BILINEAR)
+        return np.asarray(img)
+
+    def batch(self, images):
+        """Return an (N, 3, size, size) float32 tensor for a list of images"""
+        if self.pool is not None and len(images) > 1:
+            decoded = list(self.pool.map(self.load, images))
+        else:
+            decoded = [self.load(image) for image in images]
+
+        buffer = self._buffer(len(decoded))
+        for i, pixels in enumerate(decoded):
+            np.multiply(pixels, self.scale, out=buffer[i])
+            np.add(buffer[i], self.shift, out=buffer[i])
+
+        import torch
+        return torch.from_numpy(buffer).permute(0, 3, 1, 2)
+
+    def _buffer(self, count):
+        # The batch tensor aliases this buffer, so it is per thread and only
+        # reused by the next batch from the same thread
+        cached = getattr(self._local, 'buffer', None)
+        if cached is None or cached.shape[0] < count:
+            cached = np.empty((count, self.size, self.size, 3), dtype=np.float32)
+            self._local.buffer = cached
+        return cached[:count]
+
+
+def check_drift(paths, model_key=None, model_dir='models', size=224):
+    """Compare fast and full decoding of the same images.
+
+    Reports the per-pixel difference of the normalized inputs and, when
+    model_key is given, how far each prediction's confidence moves and how
+    many labels flip.
+    """
+    full, fast = ImagePreprocessor(size=size), ImagePreprocessor(size=size, fast_decode=True)
+    pixel_diffs = [
+        np.abs(full.load(path).astype(np.float32) - fast.load(path).astype(np.float32)) * full.scale
+        for path in paths
+    ]
+    report = {
+        'images': len(paths),
+        'pixel_mean_abs_diff': round(float(np.mean([d.mean() for d in pixel_diffs])), 4),
+        'pixel_max_abs_diff': round(float(max(d.max() for d in pixel_diffs)), 4)
+    }
+    if model_key:
+        from utils.model_loader import ModelLoader
+        results = {}
+        for fast_decode in (False, True):
+            loader = ModelLoader(model_dir=model_dir, fast_decode=fast_decode)
+            predict = getattr(loader, {'diabetes_retinal': 'predict_diabetes_image', 'heart_ecg': 'predict_heart_image'}[model_key])
+            results[fast_decode] = [predict(path) for path in paths]
+        deltas = [abs(a['confidence'] - b['confidence']) for a, b in zip(results[False], results[True])]
+        report['confidence_max_delta'] = round(max(deltas), 3)
+        report['label_flips'] = sum(a['prediction'] != b['prediction'] for a, b in zip(results[False], results[True]))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check how much IMAGE_FAST_DECODE changes inputs and predictions")
+    parser.add_argument('image_dir')
+    parser.add_argument('--model', choices=['diabetes_retinal', 'heart_ecg'], help="Also compare this model's predictions")
+    parser.add_argument('--model-dir', default='models')
+    parser.add_argument('--max-confidence-delta', type=float, default=1.0, help="Percentage points allowed before failing")
+    args = parser.parse_args()
+
+    paths = sorted(
+        os.path.join(args.image_dir, name) for name in os.listdir(args.image_dir)
+        if name.lower().endswith(('.jpg', '.jpeg', '.png'))
+    )
+    if not paths:
+        parser.error(f"No images in {args.image_dir}")
+    report = check_drift(paths, args.model, args.model_dir)
+    print(json.dumps(report, indent=2))
+    if report.get('label_flips') or report.get('confidence_max_delta', 0) > args.max_confidence_delta:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+import contextvars
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def _labels(self, key, extra=None):
+        pairs = list(zip(self.labelnames, key))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ''
+        escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+        return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            lines.extend(self._samples())
+        return lines
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def _samples(self):
+        return [f'{self.name}{self._labels(key)} {value}' for key, value in self.values.items()]
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        with self._lock:
+            self.values[self._key(labels)] = float(value)
+
+    def _samples(self):
+        return [f'{self.name}{self._labels(key)} {value}' for key, value in self.values.items()]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self.values.get(key)
+            if series is None:
+                series = self.values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][i] += 1
+                    break
+            series['sum'] += value
+            series['count'] += 1
+
+    def _samples(self):
+        lines = []
+        for key, series in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, series['counts']):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{self._labels(key, ("le", repr(bound)))} {cumulative}')
+            lines.append(f'{self.name}_bucket{self._labels(key, ("le", "+Inf"))} {series["count"]}')
+            lines.append(f'{self.name}_sum{self._labels(key)} {series["sum"]}')
+            lines.append(f'{self.name}_count{self._labels(key)} {series["count"]}')
+        return lines
+
+
+class Registry:
+    """In-process metrics rendered in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self.metrics = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter, name, help_text, labelnames)
+
+    def gauge(self, name, help_text, labelnames=()):
+        return self._register(Gauge, name, help_text, labelnames)
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, help_text, labelnames, buckets=buckets)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def _register(self, cls, name, help_text, labelnames, **kwargs):
+        with self._lock:
+            if name not in self.metrics:
+                self.metrics[name] = cls(name, help_text, labelnames, **kwargs)
+            return self.metrics[name]
+
+
+registry = Registry()
+
+STAGE_SECONDS = registry.histogram(
+    'medblock_stage_duration_seconds',
+    'Time spent in each stage of a prediction or blockchain write',
+    ('stage',)
+)
+
+# Spans recorded while handling the current request, for the Server-Timing header.
+# Work handed to other threads carries the list along via bind() or collecting().
+_spans = contextvars.ContextVar('medblock_spans', default=None)
+
+# Callables given (stage, seconds) for every span, e.g. to keep raw samples in a benchmark
+listeners = []
+
+
+def start_request():
+    spans = []
+    _spans.set(spans)
+    return spans
+
+
+def current_spans():
+    return _spans.get()
+
+
+@contextmanager
+def collecting(spans):
+    """Record spans into the given list for the duration of the block"""
+    token = _spans.set(spans)
+    try:
+        yield spans
+    finally:
+        _spans.reset(token)
+
+
+def bind(fn):
+    """Wrap fn to run in a copy of the caller's context, so spans it records reach the caller's request"""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(fn, *args, **kwargs)
+
+
+def record_span(stage, seconds, spans=None):
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    for listener in listeners:
+        listener(stage, seconds)
+    if spans is None:
+        spans = _spans.get()
+    if spans is not None:
+        spans.append((stage, seconds))
+
+
+@contextmanager
+def span(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(stage, time.perf_counter() - start)
+
+
+def server_timing(spans, total=None):
+    """Format spans as a Server-Timing header value, summing repeated stages"""
+    durations = {}
+    for stage, seconds in spans:
+        durations[stage] = durations.get(stage, 0.0) + seconds
+    if total is not None:
+        durations['total'] = total
+    return ', '.join(f'{stage};dur={seconds * 1000:.1f}' for stage, seconds in durations.items() if math.isfinite(seconds))
+
+
+def summarize(samples):
+    """count/mean/p50/p95/max of a window of millisecond samples, for JSON status endpoints"""
+    if not samples:
+        return {'count': 0}
+    ordered = sorted(samples)
+    return {
+        'count': len(ordered),
+        'mean': round(sum(ordered) / len(ordered), 2),
+        'p50': round(ordered[len(ordered) // 2], 2),
+        'p95': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+        'max': round(ordered[-1], 2)
+    }
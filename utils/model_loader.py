@@ -1,20 +1,140 @@
-import torch
+import gc
+import hashlib
+import os
+import threading
+import time
 import pickle
 import numpy as np
-from torchvision import models
-import torch.nn as nn
-from PIL import Image
-from torchvision import transforms
+from utils.image_preprocessing import ImagePreprocessor
+from utils.model_residency import ModelResidency
+from utils.compiled_trees import CompiledForest, probe_rows, verify
+from utils import metrics
 
-device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+# torch/torchvision take seconds to import, so they are imported by the first
+# image model load (or builder call); booting and tabular scoring never pay for them
+torch = None
+nn = None
+models = None
+device = None
+_import_lock = threading.Lock()
+
+def import_torch():
+    """Import torch/torchvision once, on first use"""
+    global torch, nn, models, device
+    with _import_lock:
+        if torch is None:
+            import torch as torch_module
+            import torch.nn as nn_module
+            from torchvision import models as models_module
+            nn, models = nn_module, models_module
+            device = torch_module.device('cuda' if torch_module.cuda.is_available() else 'cpu')
+            torch = torch_module
+
+TABULAR_LABELS = {
+    'diabetes': ('Positive', 'Negative'),
+    'heart': ('Heart Disease Detected', 'No Heart Disease')
+}
+
+IMAGE_BACKENDS = ('eager', 'optimized', 'compile')
+TABULAR_ENGINES = ('compiled', 'sklearn')
+
+MODEL_LOADS = metrics.registry.counter('medblock_model_loads_total', 'Model load attempts', ('model', 'outcome'))
+MODEL_LOAD_SECONDS = metrics.registry.histogram('medblock_model_load_seconds', 'Time to load a model', ('model',))
+MODEL_EVICTIONS = metrics.registry.counter('medblock_model_evictions_total', 'Models evicted to stay within the memory budget', ('model',))
+
+# Files each model loads, used to estimate its footprint before loading it
+MODEL_FILES = {
+    'diabetes_xgb': ['diabetes_xgboost_model.pkl', 'diabetes_scaler.pkl'],
+    'diabetes_retinal': ['diabetes_retinal_model.pth'],
+    'heart_xgb': ['heart_xgboost_model.pkl', 'heart_scaler.pkl'],
+    'heart_ecg': ['heart_ecg_model.pth']
+}
+
+def build_diabetes_retinal_model():
+    """EfficientNet-B0 with the two-class retinal head used in training"""
+    import_torch()
+    model_retinal = models.efficientnet_b0(weights=None)
+    num_features = model_retinal.classifier[1].in_features
+    model_retinal.classifier = nn.Sequential(
+        nn.Dropout(0.3),
+        nn.Linear(num_features, 128),
+        nn.ReLU(),
+        nn.Dropout(0.2),
+        nn.Linear(128, 2)
+    )
+    return model_retinal
+
+def build_heart_ecg_model():
+    """ResNet50 with the two-class ECG head used in training"""
+    import_torch()
+    model_ecg = models.resnet50(weights=None)
+    num_features_ecg = model_ecg.fc.in_features
+    model_ecg.fc = nn.Sequential(
+        nn.Dropout(0.3),
+        nn.Linear(num_features_ecg, 128),
+        nn.ReLU(),
+        nn.Dropout(0.2),
+        nn.Linear(128, 2)
+    )
+    return model_ecg
 
 class ModelLoader:
-    def __init__(self, model_dir='models'):
+    def __init__(self, model_dir='models', fast_decode=False, decode_workers=0, image_backend='eager', mmap_weights=True,
+                 memory_budget_mb=0, prewarm=False, prewarm_interval=30.0, tabular_engine='compiled'):
+        if image_backend not in IMAGE_BACKENDS:
+            raise ValueError(f"Unknown image backend: {image_backend}")
+        if tabular_engine not in TABULAR_ENGINES:
+            raise ValueError(f"Unknown tabular engine: {tabular_engine}")
         self.model_dir = model_dir
+        self.image_backend = image_backend
+        self.mmap_weights = mmap_weights
+        self.tabular_engine = tabular_engine
         self.models = {}
         self.scalers = {}
+        self.compiled = {}
+        self.preprocessors = {}
+        self.fast_decode = fast_decode
+        self.decode_workers = decode_workers
+        self.model_version = self._fingerprint_models()
+        # _lock guards the model tables and residency bookkeeping and is never held
+        # while a model loads; each model has its own load lock instead
+        self._lock = threading.RLock()
+        self._loaders = {
+            'diabetes_xgb': self._load_diabetes_tabular_model,
+            'diabetes_retinal': self._load_diabetes_image_model,
+            'heart_xgb': self._load_heart_tabular_model,
+            'heart_ecg': self._load_heart_image_model
+        }
+        self._load_locks = {key: threading.Lock() for key in self._loaders}
+        self._loaded = set()
+        self.residency = ModelResidency(
+            budget_bytes=memory_budget_mb * 1024 * 1024 if memory_budget_mb else None,
+            evict=self._evict_model,
+            prewarm=self.prewarm_model if prewarm else None,
+            prewarm_interval=prewarm_interval
+        )
+        # unloaded -> loading -> loaded -> ready (after its first inference), or failed / evicted
+        self.model_states = {key: 'unloaded' for key in self._loaders}
+        self.model_errors = {}
+        self.warmup_targets = []
         print("ModelLoader initialized with lazy loading (models load on first use)")
 
+    def _fingerprint_models(self):
+        """Short fingerprint of the model files and the settings that change their output.
+
+        Cached predictions go stale when a model changes, and also when the
+        image backend (INT8 artifacts), tabular engine or JPEG fast decode is
+        switched, since each can move a confidence score.
+        """
+        digest = hashlib.sha256()
+        digest.update(f'{self.image_backend}:{self.tabular_engine}:{int(bool(self.fast_decode))};'.encode())
+        if os.path.isdir(self.model_dir):
+            for name in sorted(os.listdir(self.model_dir)):
+                if name.endswith(('.pkl', '.pth', '.pt')):
+                    stat = os.stat(os.path.join(self.model_dir, name))
+                    digest.update(f'{name}:{stat.st_size}:{stat.st_mtime_ns}'.encode())
+        return digest.hexdigest()[:16]
+
     def _load_diabetes_tabular_model(self):
         """Lazy load diabetes XGBoost model and scaler"""
         if 'diabetes_xgb' not in self.models:
@@ -23,27 +143,225 @@ class ModelLoader:
                 self.models['diabetes_xgb'] = pickle.load(f)
             with open(f'{self.model_dir}/diabetes_scaler.pkl', 'rb') as f:
                 self.scalers['diabetes'] = pickle.load(f)
+            self._compile_tabular('diabetes')
             print("✓ Diabetes tabular model loaded")
 
     def _load_diabetes_image_model(self):
         """Lazy load diabetes retinal image model"""
         if 'diabetes_retinal' not in self.models:
             print("Loading diabetes image model...")
-            model_retinal = models.efficientnet_b0(weights=None)
-            num_features = model_retinal.classifier[1].in_features
-            model_retinal.classifier = nn.Sequential(
-                nn.Dropout(0.3),
-                nn.Linear(num_features, 128),
-                nn.ReLU(),
-                nn.Dropout(0.2),
-                nn.Linear(128, 2)
+            self.models['diabetes_retinal'] = self._load_image_model('diabetes_retinal_model', build_diabetes_retinal_model)
+            self.preprocessors['diabetes_retinal'] = ImagePreprocessor(
+                size=224,
+                fast_decode=self.fast_decode,
+                workers=self.decode_workers
             )
-            model_retinal.load_state_dict(torch.load(f'{self.model_dir}/diabetes_retinal_model.pth', map_location=device))
-            model_retinal.to(device)
-            model_retinal.eval()
-            self.models['diabetes_retinal'] = model_retinal
             print("✓ Diabetes image model loaded")
 
+    def _load_image_model(self, checkpoint_name, builder):
+        """Load an image model for the configured backend.
+
+        'optimized' loads the TorchScript artifact written by optimize_models.py
+        (INT8 quantized and/or frozen, channels_last), falling back to eager FP32
+        when no artifact exists. 'compile' wraps the eager model in torch.compile,
+        converting it to channels_last unless the weights are memory-mapped: the
+        conversion copies every conv weight into private memory in each worker,
+        which would undo the sharing that mmap_weights is there for.
+        """
+        import_torch()
+        optimized_path = f'{self.model_dir}/{checkpoint_name}.optimized.pt'
+        if self.image_backend == 'optimized':
+            if os.path.exists(optimized_path):
+                model = torch.jit.load(optimized_path, map_location=device)
+                model.eval()
+                print(f"  Using optimized artifact {optimized_path}")
+                return model
+            print(f"WARNING: {optimized_path} not found, using eager FP32 model")
+
+        model = self._load_weights(f'{self.model_dir}/{checkpoint_name}.pth', builder)
+        model.to(device)
+        model.eval()
+        if self.image_backend == 'compile':
+            if self._weights_shared():
+                print("  Keeping memory-mapped weights in their stored layout (no channels_last copy)")
+            else:
+                model = model.to(memory_format=torch.channels_last)
+            model = torch.compile(model)
+        return model
+
+    def _weights_shared(self):
+        return self.mmap_weights and device.type == 'cpu'
+
+    def _load_weights(self, checkpoint_path, builder):
+        """Build a model and load its checkpoint, memory-mapped when possible.
+
+        With mmap_weights the architecture is built on the meta device and the
+        parameters are assigned straight from torch.load(mmap=True), so they alias
+        the file's page cache pages instead of a private heap copy. Workers forked
+        from a preloading gunicorn master (or loading the same file) then share one
+        read-only copy of the weights.
+        """
+        if self._weights_shared():
+            try:
+                state_dict = torch.load(checkpoint_path, map_location='cpu', mmap=True, weights_only=True)
+            except RuntimeError as e:
+                print(f"WARNING: cannot memory-map {checkpoint_path} ({e}), loading into memory")
+            else:
+                with torch.device('meta'):
+                    model = builder()
+                model.load_state_dict(state_dict, assign=True)
+                return model
+
+        model = builder()
+        model.load_state_dict(torch.load(checkpoint_path, map_location=device))
+        return model
+
+    def preload_image_models(self):
+        """Load both image models now, e.g. in a gunicorn --preload master before fork"""
+        self._acquire('diabetes_retinal', record=False)
+        self._acquire('heart_ecg', record=False)
+
+    def _acquire(self, key, record=True, companions=None):
+        """Return a loaded model, loading it (and evicting LRU models over budget) if needed.
+
+        Only the model's own load lock is held while it loads, so a cold load
+        never blocks requests for models that are already resident. With
+        companions, returns (model, companions()) read under the same lock
+        check as the model, so an eviction cannot split a model from its
+        scaler or preprocessor.
+        """
+        if record:
+            self.residency.record_request(key)
+        while True:
+            with self._lock:
+                if key in self._loaded:
+                    self.residency.touch(key)
+                    model = self.models[key]
+                    return (model, companions()) if companions else model
+
+            with self._load_locks[key]:
+                with self._lock:
+                    if key in self._loaded:
+                        # Loaded by another thread while this one waited
+                        continue
+                    self.residency.make_room(key, self._estimate_footprint(key))
+                    self.model_states[key] = 'loading'
+                started = time.perf_counter()
+                try:
+                    self._loaders[key]()
+                except Exception as e:
+                    with self._lock:
+                        # Drop a half-loaded model so the next attempt loads everything again
+                        self.models.pop(key, None)
+                        self.model_states[key] = 'failed'
+                        self.model_errors[key] = str(e)
+                    MODEL_LOADS.inc(model=key, outcome='failed')
+                    raise
+                MODEL_LOAD_SECONDS.observe(time.perf_counter() - started, model=key)
+                MODEL_LOADS.inc(model=key, outcome='loaded')
+                with self._lock:
+                    self.model_states[key] = 'loaded'
+                    self._loaded.add(key)
+                    self.residency.admit(key, self._measure_footprint(key))
+
+    def warmup(self, keys=None, retry_delay=0, max_retry_delay=60.0):
+        """Load each model and run one dummy inference so real requests skip the cold start.
+
+        With a retry_delay, models that fail are tried again after retry_delay
+        seconds, doubling up to max_retry_delay, until all of them are warm:
+        is_ready() waits for every target, so one transient failure would
+        otherwise keep the worker unready until it restarts.
+        """
+        pending = list(keys or self._loaders)
+        delay = retry_delay
+        while True:
+            pending = [key for key in pending if not self._warm(key)]
+            if not pending or not retry_delay:
+                return
+            print(f"Retrying warmup for {', '.join(pending)} in {delay:g}s")
+            time.sleep(delay)
+            delay = min(delay * 2, max_retry_delay)
+
+    def _warm(self, key):
+        if self.model_states.get(key) in ('ready', 'evicted'):
+            # Served requests (and possibly left under the memory budget) while this attempt backed off
+            return True
+        try:
+            model = self._acquire(key, record=False)
+            if key.endswith('_xgb'):
+                disease = key[:-len('_xgb')]
+                self.score_tabular(disease, np.zeros((1, self.scalers[disease].n_features_in_)))
+            else:
+                with torch.inference_mode():
+                    model(torch.zeros(1, 3, 224, 224, device=device))
+        except Exception as e:
+            self.model_states[key] = 'failed'
+            self.model_errors[key] = str(e)
+            print(f"Warmup failed for {key}: {e}")
+            return False
+        self.model_states[key] = 'ready'
+        self.model_errors.pop(key, None)
+        print(f"✓ Warmed up {key}")
+        return True
+
+    def start_warmup(self, keys=None, retry_delay=1.0, max_retry_delay=60.0):
+        """Warm models in a background thread, retrying failures; call it in each worker, after fork"""
+        unknown = sorted(set(keys or ()) - set(self._loaders))
+        if unknown:
+            raise ValueError(f"Unknown model keys: {', '.join(unknown)} (known: {', '.join(self._loaders)})")
+        self.warmup_targets = list(keys or self._loaders)
+        thread = threading.Thread(
+            target=self.warmup,
+            args=(self.warmup_targets, retry_delay, max_retry_delay),
+            name="model-warmup",
+            daemon=True
+        )
+        thread.start()
+        return thread
+
+    def is_ready(self):
+        # An evicted model was warm once; it is out because of the memory budget, not a cold start
+        return all(self.model_states.get(key) in ('ready', 'evicted') for key in self.warmup_targets)
+
+    def prewarm_model(self, key):
+        """Load a model ahead of traffic, but only if it fits without evicting anything"""
+        with self._lock:
+            if key in self._loaded or not self.residency.fits(self._estimate_footprint(key)):
+                return False
+        self._acquire(key, record=False)
+        return True
+
+    def _evict_model(self, key):
+        MODEL_EVICTIONS.inc(model=key)
+        self._loaded.discard(key)
+        self.models.pop(key, None)
+        # The preprocessor's batch buffers and decode pool go with the model it feeds
+        self.preprocessors.pop(key, None)
+        self.model_states[key] = 'evicted'
+        if key.endswith('_xgb'):
+            self.scalers.pop(key[:-len('_xgb')], None)
+            self.compiled.pop(key[:-len('_xgb')], None)
+        gc.collect()
+
+    def _estimate_footprint(self, key):
+        names = list(MODEL_FILES[key])
+        if self.image_backend == 'optimized' and names[0].endswith('.pth'):
+            optimized = names[0][:-len('.pth')] + '.optimized.pt'
+            if os.path.exists(os.path.join(self.model_dir, optimized)):
+                names = [optimized]
+        paths = [os.path.join(self.model_dir, name) for name in names]
+        return sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+
+    def _measure_footprint(self, key):
+        model = self.models[key]
+        if nn is not None and isinstance(model, nn.Module):
+            tensors = list(model.parameters()) + list(model.buffers())
+            size = sum(t.numel() * t.element_size() for t in tensors)
+            if size:
+                return size
+        # XGBoost/scaler pickles and frozen TorchScript (weights stored as constants)
+        return self._estimate_footprint(key)
+
     def _load_heart_tabular_model(self):
         """Lazy load heart XGBoost model and scaler"""
         if 'heart_xgb' not in self.models:
@@ -52,100 +370,139 @@ class ModelLoader:
                 self.models['heart_xgb'] = pickle.load(f)
             with open(f'{self.model_dir}/heart_scaler.pkl', 'rb') as f:
                 self.scalers['heart'] = pickle.load(f)
+            self._compile_tabular('heart')
             print("✓ Heart tabular model loaded")
 
+    def _compile_tabular(self, disease):
+        """Compile the XGBoost trees with the scaler folded in, keeping them only if they match predict_proba"""
+        if self.tabular_engine != 'compiled':
+            return
+        model = self.models[f'{disease}_xgb']
+        scaler = self.scalers[disease]
+        try:
+            forest = CompiledForest.from_xgb(model, scaler)
+            check = verify(forest, model, scaler, probe_rows(forest, scaler))
+        except Exception as e:
+            print(f"Warning: compiled {disease} trees unavailable, using predict_proba ({e})")
+            return
+        if not check['labels_match'] or check['max_abs_diff'] > 1e-6:
+            print(f"Warning: compiled {disease} trees disagree with predict_proba ({check}), using predict_proba")
+            return
+        self.compiled[disease] = forest
+
     def _load_heart_image_model(self):
         """Lazy load heart ECG image model"""
         if 'heart_ecg' not in self.models:
             print("Loading heart image model...")
-            model_ecg = models.resnet50(weights=None)
-            num_features_ecg = model_ecg.fc.in_features
-            model_ecg.fc = nn.Sequential(
-                nn.Dropout(0.3),
-                nn.Linear(num_features_ecg, 128),
-                nn.ReLU(),
-                nn.Dropout(0.2),
-                nn.Linear(128, 2)
+            self.models['heart_ecg'] = self._load_image_model('heart_ecg_model', build_heart_ecg_model)
+            self.preprocessors['heart_ecg'] = ImagePreprocessor(
+                size=224,
+                fast_decode=self.fast_decode,
+                workers=self.decode_workers
             )
-            model_ecg.load_state_dict(torch.load(f'{self.model_dir}/heart_ecg_model.pth', map_location=device))
-            model_ecg.to(device)
-            model_ecg.eval()
-            self.models['heart_ecg'] = model_ecg
             print("✓ Heart image model loaded")
     
     def predict_diabetes_tabular(self, data):
-        self._load_diabetes_tabular_model()
-        data_scaled = self.scalers['diabetes'].transform([data])
-        prediction = self.models['diabetes_xgb'].predict(data_scaled)[0]
-        proba = self.models['diabetes_xgb'].predict_proba(data_scaled)[0]
-
-        return {
-            'prediction': 'Positive' if prediction == 1 else 'Negative',
-            'confidence': float(max(proba) * 100),
-            'risk_level': self.get_risk_level(max(proba))
-        }
-    
-    def predict_diabetes_image(self, image_path):
-        self._load_diabetes_image_model()
-        transform = transforms.Compose([
-            transforms.Resize((224, 224)),
-            transforms.ToTensor(),
-            transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225])
-        ])
-
-        image = Image.open(image_path).convert('RGB')
-        image_tensor = transform(image).unsqueeze(0).to(device)
-
-        with torch.no_grad():
-            output = self.models['diabetes_retinal'](image_tensor)
-            probs = torch.softmax(output, dim=1)
-            confidence, predicted = torch.max(probs, 1)
+        return self.predict_diabetes_tabular_batch([data])[0]
 
-        prediction = predicted.item()
-        confidence_score = confidence.item() * 100
+    def predict_diabetes_tabular_batch(self, rows):
+        return self._results_from_scores(self.score_tabular('diabetes', rows), 'diabetes')
+    
+    def predict_diabetes_image(self, image):
+        return self.predict_diabetes_image_batch([image])[0]
 
-        return {
-            'prediction': 'Has Diabetic Retinopathy' if prediction == 1 else 'No Diabetic Retinopathy',
-            'confidence': float(confidence_score),
-            'risk_level': self.get_risk_level(confidence.item())
-        }
+    def predict_diabetes_image_batch(self, images):
+        """Run the retinal model over several images (paths or binary file objects) in one forward pass"""
+        return self._predict_image_batch(
+            'diabetes_retinal',
+            images,
+            'Has Diabetic Retinopathy',
+            'No Diabetic Retinopathy'
+        )
     
     def predict_heart_tabular(self, data):
-        self._load_heart_tabular_model()
-        data_scaled = self.scalers['heart'].transform([data])
-        prediction = self.models['heart_xgb'].predict(data_scaled)[0]
-        proba = self.models['heart_xgb'].predict_proba(data_scaled)[0]
-
-        return {
-            'prediction': 'Heart Disease Detected' if prediction == 1 else 'No Heart Disease',
-            'confidence': float(max(proba) * 100),
-            'risk_level': self.get_risk_level(max(proba))
-        }
+        return self.predict_heart_tabular_batch([data])[0]
+
+    def predict_heart_tabular_batch(self, rows):
+        return self._results_from_scores(self.score_tabular('heart', rows), 'heart')
+
+    def score_tabular(self, disease, rows):
+        """Score a whole feature matrix with one scaler call and one predict_proba pass.
+
+        Returns NumPy arrays (predictions, confidences, risk_levels) so bulk
+        callers can stream results without building a dict per row.
+        """
+        if disease not in TABULAR_LABELS:
+            raise ValueError(f"Unknown disease: {disease}")
+        model, (scaler, forest) = self._acquire(
+            f'{disease}_xgb',
+            companions=lambda: (self.scalers[disease], self.compiled.get(disease))
+        )
+
+        if forest is not None:
+            # The scaler is folded into the compiled thresholds
+            with metrics.span('xgboost'):
+                proba = forest.predict_proba(rows)
+        else:
+            with metrics.span('scaler_transform'):
+                data_scaled = scaler.transform(np.asarray(rows, dtype=np.float64))
+            with metrics.span('xgboost'):
+                proba = model.predict_proba(data_scaled)
+        self.model_states[f'{disease}_xgb'] = 'ready'
+
+        # argmax over two classes matches XGBClassifier.predict (positive only when p > 0.5)
+        predictions = np.argmax(proba, axis=1)
+        confidences = np.max(proba, axis=1)
+        risk_levels = np.where(
+            confidences >= 0.8, 'High',
+            np.where(confidences >= 0.5, 'Medium', 'Low')
+        )
+        return predictions, confidences, risk_levels
+
+    def _results_from_scores(self, scores, disease):
+        positive_label, negative_label = TABULAR_LABELS[disease]
+        predictions, confidences, risk_levels = scores
+        return [
+            {
+                'prediction': positive_label if prediction == 1 else negative_label,
+                'confidence': float(confidence * 100),
+                'risk_level': str(risk_level)
+            }
+            for prediction, confidence, risk_level in zip(predictions, confidences, risk_levels)
+        ]
     
-    def predict_heart_image(self, image_path):
-        self._load_heart_image_model()
-        transform = transforms.Compose([
-            transforms.Resize((224, 224)),
-            transforms.ToTensor(),
-            transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225])
-        ])
-
-        image = Image.open(image_path).convert('RGB')
-        image_tensor = transform(image).unsqueeze(0).to(device)
-
-        with torch.no_grad():
-            output = self.models['heart_ecg'](image_tensor)
-            probs = torch.softmax(output, dim=1)
-            confidence, predicted = torch.max(probs, 1)
+    def predict_heart_image(self, image):
+        return self.predict_heart_image_batch([image])[0]
 
-        prediction = predicted.item()
-        confidence_score = confidence.item() * 100
+    def predict_heart_image_batch(self, images):
+        """Run the ECG model over several images (paths or binary file objects) in one forward pass"""
+        return self._predict_image_batch(
+            'heart_ecg',
+            images,
+            'Heart Disease Detected',
+            'Normal ECG'
+        )
 
-        return {
-            'prediction': 'Heart Disease Detected' if prediction == 1 else 'Normal ECG',
-            'confidence': float(confidence_score),
-            'risk_level': self.get_risk_level(confidence.item())
-        }
+    def _predict_image_batch(self, model_key, images, positive_label, negative_label):
+        model, preprocessor = self._acquire(model_key, companions=lambda: self.preprocessors[model_key])
+
+        with metrics.span('cnn_preprocess'):
+            image_tensor = preprocessor.batch(images).to(device)
+
+        with metrics.span('cnn_forward'), torch.inference_mode():
+            output = model(image_tensor)
+            probs = torch.softmax(output, dim=1)
+            confidences, predicted = torch.max(probs, 1)
+        self.model_states[model_key] = 'ready'
+
+        results = []
+        for prediction, confidence in zip(predicted.tolist(), confidences.tolist()):
+            results.append({
+                'prediction': positive_label if prediction == 1 else negative_label,
+                'confidence': float(confidence * 100),
+                'risk_level': self.get_risk_level(confidence)
+            })
+        return results
     
     def get_risk_level(self, confidence):
         if confidence >= 0.8:
@@ -0,0 +1,114 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class ModelResidency:
+    """Tracks which models are resident and what they cost, within a memory budget.
+
+    ModelLoader reports each model's footprint when it loads it and touches it
+    on every use. When admitting a model would push the total past
+    budget_bytes, the least recently used residents are evicted through the
+    evict callback. Request counts decay over time, so the traffic mix reflects
+    recent load; an optional prewarm thread uses it to load hot models that
+    fit in the remaining budget before they are requested.
+    """
+
+    def __init__(self, budget_bytes=None, evict=None, prewarm=None, prewarm_interval=30.0, prewarm_share=0.2, decay=0.5):
+        self.budget_bytes = budget_bytes
+        self.evict = evict
+        self.prewarm = prewarm
+        self.prewarm_interval = prewarm_interval
+        self.prewarm_share = prewarm_share
+        self.decay = decay
+        self.footprints = OrderedDict()
+        self.traffic = {}
+        self.evictions = 0
+        self._lock = threading.RLock()
+        self._prewarm_pid = None
+
+    @property
+    def resident_bytes(self):
+        return sum(self.footprints.values())
+
+    def record_request(self, key):
+        with self._lock:
+            self.traffic[key] = self.traffic.get(key, 0.0) + 1.0
+        self._ensure_prewarmer()
+
+    def touch(self, key):
+        with self._lock:
+            if key in self.footprints:
+                self.footprints.move_to_end(key)
+
+    def make_room(self, key, size):
+        """Evict least recently used models until size more bytes fit the budget"""
+        with self._lock:
+            if not self.budget_bytes:
+                return
+            for victim in list(self.footprints):
+                if self.resident_bytes + size <= self.budget_bytes:
+                    break
+                if victim == key:
+                    continue
+                print(f"Evicting {victim} ({self.footprints[victim] / 1e6:.0f} MB) to fit {key}")
+                self.footprints.pop(victim)
+                self.evictions += 1
+                if self.evict is not None:
+                    self.evict(victim)
+
+    def admit(self, key, size):
+        with self._lock:
+            self.make_room(key, size)
+            self.footprints[key] = size
+            self.footprints.move_to_end(key)
+
+    def forget(self, key):
+        with self._lock:
+            self.footprints.pop(key, None)
+
+    def fits(self, size):
+        return not self.budget_bytes or self.resident_bytes + size <= self.budget_bytes
+
+    def hot_models(self):
+        """Models whose share of recent requests is at least prewarm_share, hottest first"""
+        with self._lock:
+            total = sum(self.traffic.values())
+            if not total:
+                return []
+            ranked = sorted(self.traffic.items(), key=lambda item: item[1], reverse=True)
+            return [key for key, count in ranked if count / total >= self.prewarm_share]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'budget_bytes': self.budget_bytes,
+                'resident_bytes': self.resident_bytes,
+                'resident': dict(self.footprints),
+                'traffic': {key: round(count, 2) for key, count in self.traffic.items()},
+                'evictions': self.evictions
+            }
+
+    def _ensure_prewarmer(self):
+        # Started per process, so a gunicorn --preload master does not own it
+        if self.prewarm is None or self._prewarm_pid == os.getpid():
+            return
+        with self._lock:
+            if self._prewarm_pid != os.getpid():
+                self._prewarm_pid = os.getpid()
+                threading.Thread(target=self._prewarm_loop, name="model-prewarm", daemon=True).start()
+
+    def _prewarm_loop(self):
+        while True:
+            time.sleep(self.prewarm_interval)
+            for key in self.hot_models():
+                if key in self.footprints:
+                    continue
+                try:
+                    self.prewarm(key)
+                except Exception as e:
+                    print(f"Prewarming {key} failed: {e}")
+            with self._lock:
+                for key in self.traffic:
+                    self.traffic[key] *= self.decay
@@ -0,0 +1,106 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import bcrypt
+from utils import metrics
+
+
+class HasherBusy(Exception):
+    """Raised when the hashing queue is full or a hash waited past the timeout; callers should answer 429"""
+
+
+class PasswordHasher:
+    """Runs bcrypt on a small dedicated thread pool with a bounded queue.
+
+    bcrypt releases the GIL, so hashing on these threads leaves the request
+    threads free to serve predictions. At most workers + max_pending
+    operations are admitted; beyond that calls raise HasherBusy immediately
+    instead of piling up behind a login burst. Queue wait and hash time are
+    recorded separately for the last few hundred operations.
+    """
+
+    def __init__(self, rounds=12, workers=2, max_pending=16, timeout=10.0, window=512):
+        self.rounds = rounds
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pool_pid = None
+        self.queue_ms = deque(maxlen=window)
+        self.hash_ms = deque(maxlen=window)
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.in_flight = 0
+
+    def hash(self, password):
+        return self._run(lambda: bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=self.rounds)))
+
+    def check(self, password, hashed):
+        return self._run(lambda: bcrypt.checkpw(password.encode('utf-8'), hashed))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'rounds': self.rounds,
+                'workers': self.workers,
+                'in_flight': self.in_flight,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'timed_out': self.timed_out,
+                'queue_ms': metrics.summarize(self.queue_ms),
+                'hash_ms': metrics.summarize(self.hash_ms)
+            }
+
+    def _run(self, fn):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise HasherBusy("Too many authentication requests in progress")
+
+        with self._lock:
+            self.in_flight += 1
+        submitted = time.perf_counter()
+
+        def timed():
+            started = time.perf_counter()
+            try:
+                return fn()
+            finally:
+                finished = time.perf_counter()
+                with self._lock:
+                    self.queue_ms.append((started - submitted) * 1000)
+                    self.hash_ms.append((finished - started) * 1000)
+                    self.completed += 1
+
+        def release(_):
+            with self._lock:
+                self.in_flight -= 1
+            self._slots.release()
+
+        try:
+            future = self._executor().submit(timed)
+        except Exception:
+            release(None)
+            raise
+        future.add_done_callback(release)
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            # Still queued: drop it so it does not hash for a client that is gone
+            future.cancel()
+            with self._lock:
+                self.timed_out += 1
+            raise HasherBusy(f"Authentication did not complete within {self.timeout:g}s")
+
+    def _executor(self):
+        # Created per process, so a gunicorn --preload master does not own the threads
+        if self._pool_pid != os.getpid():
+            with self._lock:
+                if self._pool_pid != os.getpid():
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='bcrypt')
+                    self._pool_pid = os.getpid()
+        return self._pool
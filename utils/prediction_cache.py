@@ -0,0 +1,115 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from utils import metrics
+
+CACHE_LOOKUPS = metrics.registry.counter('medblock_prediction_cache_lookups_total', 'Prediction cache lookups', ('result',))
+
+
+class PredictionCache:
+    """Bounded LRU + TTL cache of prediction results keyed by input content.
+
+    Entries live in an in-process OrderedDict. When db_path is set they are
+    also written to SQLite, so results survive gunicorn recycling the worker
+    (--max-requests) and a fresh process can answer repeat submissions
+    without rerunning the models or sending another transaction.
+    """
+
+    def __init__(self, max_entries=1024, ttl=3600, db_path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self.db_path = db_path
+        self._db_conn = self._connect() if db_path else None
+        self._db_pid = os.getpid()
+
+    @property
+    def db(self):
+        # SQLite connections must not cross fork (gunicorn --preload): each process opens its own
+        if self.db_path and self._db_pid != os.getpid():
+            self._db_conn = self._connect()
+            self._db_pid = os.getpid()
+        return self._db_conn
+
+    def _connect(self):
+        db = sqlite3.connect(self.db_path, check_same_thread=False)
+        db.execute('''
+            CREATE TABLE IF NOT EXISTS predictions (
+                cache_key TEXT PRIMARY KEY,
+                result TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        ''')
+        db.execute('DELETE FROM predictions WHERE expires_at <= ?', (time.time(),))
+        db.commit()
+        return db
+
+    @staticmethod
+    def make_key(disease, patient_id, data_hash, image_hash, model_version):
+        return '|'.join([disease, patient_id, data_hash, image_hash, model_version])
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                result, expires_at = entry
+                if expires_at > now:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    CACHE_LOOKUPS.inc(result='hit')
+                    return dict(result)
+                del self.entries[key]
+
+            if self.db is not None:
+                row = self.db.execute(
+                    'SELECT result, expires_at FROM predictions WHERE cache_key = ? AND expires_at > ?',
+                    (key, now)
+                ).fetchone()
+                if row is not None:
+                    result = json.loads(row[0])
+                    self._remember(key, result, row[1])
+                    self.hits += 1
+                    CACHE_LOOKUPS.inc(result='hit')
+                    return dict(result)
+
+            self.misses += 1
+            CACHE_LOOKUPS.inc(result='miss')
+            return None
+
+    def put(self, key, result):
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, dict(result), expires_at)
+            if self.db is not None:
+                self.db.execute(
+                    'INSERT OR REPLACE INTO predictions (cache_key, result, expires_at) VALUES (?, ?, ?)',
+                    (key, json.dumps(result), expires_at)
+                )
+                self._writes += 1
+                if self._writes % 100 == 0:
+                    self.db.execute('DELETE FROM predictions WHERE expires_at <= ?', (time.time(),))
+                self.db.commit()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+    def _remember(self, key, result, expires_at):
+        self.entries[key] = (result, expires_at)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
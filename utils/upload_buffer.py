@@ -0,0 +1,65 @@
+import hashlib
+import io
+import os
+import tempfile
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class UploadBuffer:
+    """Reads an uploaded file stream exactly once, hashing it on the way in.
+
+    Uploads up to max_memory_bytes stay in memory and never touch the disk;
+    larger ones spill into a temporary file under spool_dir. open() returns an
+    independent binary reader each time, so the image model and the content
+    store can both consume the upload without re-reading it from the request.
+    """
+
+    def __init__(self, stream, spool_dir, max_memory_bytes=4 * 1024 * 1024):
+        hasher = hashlib.sha256()
+        buffer = io.BytesIO()
+        spool = None
+        self.size = 0
+        self.path = None
+
+        try:
+            for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                hasher.update(chunk)
+                self.size += len(chunk)
+                if spool is None and self.size > max_memory_bytes:
+                    fd, self.path = tempfile.mkstemp(dir=spool_dir, suffix='.upload')
+                    spool = os.fdopen(fd, 'wb')
+                    spool.write(buffer.getbuffer())
+                    buffer = None
+                (spool or buffer).write(chunk)
+        except BaseException:
+            if spool is not None:
+                spool.close()
+            self.close()
+            raise
+        if spool is not None:
+            spool.close()
+
+        self.sha256 = hasher.hexdigest()
+        self.data = buffer.getvalue() if buffer is not None else None
+
+    @property
+    def in_memory(self):
+        return self.data is not None
+
+    def open(self):
+        if self.data is not None:
+            return io.BytesIO(self.data)
+        return open(self.path, 'rb')
+
+    def close(self):
+        self.data = None
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+        self.path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()